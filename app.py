@@ -2,6 +2,7 @@
 import os
 import sys
 import json
+import threading
 from typing import Dict
 from pathlib import Path
 
@@ -20,7 +21,9 @@ from langchain_pinecone import Pinecone
 
 # Internal modules
 from excel_query.excel_query import ExcelQueryHandler
-from data_processing.pipeline import process_pdf_question
+from data_processing.pipeline import process_pdf_question, prewarm_static_translations
+from data_processing.answer_cache import get_answer_cache
+from data_processing.embedding_cache import wrap_embeddings
 from law_db_query.handler import handle_law_article_query
 from law_db_query.router import route_message
 from mst.router import is_mst_query
@@ -69,11 +72,28 @@ lang_llm = ChatOpenAI(
     temperature=0
 )
 
+# Dịch sẵn lời chào / thông báo ngoài phạm vi cho mọi ngôn ngữ (chạy nền, không chặn khởi động).
+# Đã có trong translation cache trên đĩa thì không gọi LLM.
+def _prewarm_translations():
+    try:
+        n = prewarm_static_translations(lang_llm)
+        print(f"✅ Translation cache sẵn sàng ({n} bản dịch)")
+    except Exception as e:
+        print(f"⚠️ Không pre-warm được translation cache: {e}")
+
+
+if os.getenv("TRANSLATION_CACHE_PREWARM", "1").strip().lower() not in {"0", "false", "no", "off"}:
+    threading.Thread(target=_prewarm_translations, name="translation-prewarm", daemon=True).start()
+
 # ===================== INIT EMBEDDING =====================
-emb = OpenAIEmbeddings(
+# Bọc cache embedding câu hỏi: mỗi câu hỏi chỉ embed một lần, dùng chung cho mọi index Pinecone
+emb = wrap_embeddings(OpenAIEmbeddings(
     api_key=OPENAI__API_KEY,
     model=OPENAI__EMBEDDING_MODEL
-)
+))
+
+# Cache câu trả lời theo ngữ nghĩa (chỉ cho câu hỏi NEW_TOPIC), None nếu tắt
+answer_cache = get_answer_cache(emb)
 
 # ===================== INIT PINECONE =====================
 if not PINECONE_API_KEY:
@@ -173,6 +193,12 @@ def pdf_dispatch(i: Dict):
 
     if retriever is None:
         load_vectordb()
+    elif retriever_vsic_2018 is None:
+        # Retriever VSIC 2018 được cache + kiểm tra nền -> gọi lại không tốn round trip
+        try:
+            retriever_vsic_2018 = load_vsic_2018_retriever(emb)
+        except Exception:
+            pass
 
     # ===============================
     # ✅ EXCEL KCN/CCN (BẢNG + TỌA ĐỘ) - ƯU TIÊN TRƯỚC LLM
@@ -181,7 +207,7 @@ def pdf_dispatch(i: Dict):
         if excel_handler is not None:
             msg = i.get("message", "")
             handled, excel_payload = excel_handler.process_query(msg, return_json=True)
-            # excel_payload là JSON string (đã gồm data[].coordinates + not_found_coordinates)
+            # excel_payload là JSON string gọn (data[] ghép từ JSON tính sẵn của từng dòng, đã gồm coordinates)
             if handled and excel_payload:
                 return excel_payload
     except Exception as e:
@@ -195,7 +221,8 @@ def pdf_dispatch(i: Dict):
         lang_llm=lang_llm,
         retriever=retriever,
         retriever_vsic_2018=retriever_vsic_2018,
-        excel_handler=excel_handler
+        excel_handler=excel_handler,
+        answer_cache=answer_cache
     )
 
     if isinstance(result, str) and result.strip():
@@ -208,7 +235,8 @@ def pdf_dispatch(i: Dict):
         lang_llm=lang_llm,
         retriever=retriever,
         retriever_vsic_2018=retriever_vsic_2018,
-        excel_handler=excel_handler
+        excel_handler=excel_handler,
+        answer_cache=answer_cache
     )
 
 
@@ -337,12 +365,11 @@ if __name__ == "__main__":
 
             # ================= EXCEL KCN/CCN (BẢNG + TỌA ĐỘ) =================
             if excel_handler is not None:
-                handled, excel_payload = excel_handler.process_query(message, return_json=True)
+                handled, excel_payload = excel_handler.process_query(message, return_json=True, as_string=False)
                 if handled and excel_payload:
                     # CLI in ra JSON (có coordinates)
                     try:
-                        obj = json.loads(excel_payload) if isinstance(excel_payload, str) else excel_payload
-                        print("\n Bot (excel_query JSON):\n" + json.dumps(obj, ensure_ascii=False, indent=2) + "\n")
+                        print("\n Bot (excel_query JSON):\n" + json.dumps(excel_payload, ensure_ascii=False, indent=2) + "\n")
                     except Exception:
                         print(f"\n Bot (excel_query JSON raw):\n{excel_payload}\n")
                     print("-" * 80)
@@ -0,0 +1,379 @@
+# data_processing/answer_cache.py
+"""
+Cache câu trả lời theo NGỮ NGHĨA cho process_pdf_question.
+
+Key là embedding của câu hỏi đã làm sạch: câu hỏi mới có cosine similarity
+>= threshold với một câu đã trả lời (cùng ngôn ngữ, chưa hết TTL) thì trả lại
+câu trả lời cũ, bỏ qua retrieval + llm.invoke. Hai câu hỏi chỉ khác nhau ở
+con số (số điều, năm, mã ngành...) có embedding gần như trùng nhau, nên ngoài
+ngôn ngữ, dãy số trong câu hỏi cũng phải khớp chính xác.
+
+Chỉ dùng cho lượt NEW_TOPIC (CASE B) — câu trả lời không phụ thuộc history.
+
+Store có thể thay:
+  - InMemoryAnswerStore : RAM, một worker
+  - SQLiteAnswerStore   : thêm file SQLite (vector lưu dạng float32 blob),
+                          load lại vào RAM khi khởi động
+
+ENV (tuỳ chọn):
+  - ANSWER_CACHE_ENABLED     : 1/0 bật tắt (mặc định 0 — phải bật tường minh)
+  - ANSWER_CACHE_BACKEND     : memory | sqlite (mặc định memory)
+  - ANSWER_CACHE_PATH        : file SQLite (mặc định <thư mục project>/.cache/answers.sqlite3)
+  - ANSWER_CACHE_THRESHOLD   : cosine similarity tối thiểu (mặc định 0.95)
+  - ANSWER_CACHE_TTL         : số giây một câu trả lời còn hiệu lực (mặc định 86400)
+  - ANSWER_CACHE_MAX_ENTRIES : số câu trả lời tối đa (mặc định 5000)
+  - ANSWER_CACHE_PURGE_INTERVAL : số giây giữa hai lần dọn entry hết hạn (mặc định 60)
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_NUMBER_RE = re.compile(r"\d+")
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "answers.sqlite3"
+
+
+@dataclass
+class CachedAnswer:
+    id: int
+    lang: str
+    question: str
+    answer: str
+    created_at: float
+    # Thời gian retrieval + LLM đã tốn để tạo câu trả lời (để tính latency tiết kiệm)
+    cost_seconds: float
+    vector: np.ndarray
+    # Dãy số trong câu hỏi, tính MỘT lần khi tạo (phần key phải khớp chính xác)
+    numbers: Optional[Tuple[str, ...]] = None
+
+    def __post_init__(self):
+        if self.numbers is None:
+            self.numbers = question_numbers(self.question)
+
+
+def question_numbers(question: str) -> Tuple[str, ...]:
+    """Dãy số trong câu hỏi (bỏ số 0 đứng đầu) — phần key phải khớp chính xác."""
+    return tuple(n.lstrip("0") or "0" for n in _NUMBER_RE.findall(question or ""))
+
+
+def _normalize(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+BucketKey = Tuple[str, Tuple[str, ...]]  # (lang, dãy số trong câu hỏi)
+
+
+class _Bucket:
+    """
+    Các câu trả lời cùng (lang, dãy số): vector xếp sẵn trong một ma trận cấp phát
+    trước (tăng gấp đôi khi đầy), search chỉ là một phép nhân ma trận-vector.
+    Xoá = chuyển dòng cuối vào chỗ trống.
+    """
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.created_at = np.empty(capacity, dtype=np.float64)
+        self.ids: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, entry: CachedAnswer) -> int:
+        row = len(self.ids)
+        if row == len(self.matrix):
+            self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+            self.created_at = np.concatenate([self.created_at, np.empty_like(self.created_at)])
+        self.matrix[row] = entry.vector
+        self.created_at[row] = entry.created_at
+        self.ids.append(entry.id)
+        return row
+
+    def remove(self, row: int) -> Optional[int]:
+        """Xoá dòng row; trả về id của entry bị chuyển vào dòng đó (nếu có)."""
+        last = len(self.ids) - 1
+        moved = None
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.created_at[row] = self.created_at[last]
+            self.ids[row] = moved = self.ids[last]
+        self.ids.pop()
+        return moved
+
+    def search(self, vector: np.ndarray, cutoff: float) -> Tuple[Optional[int], float]:
+        n = len(self.ids)
+        scores = self.matrix[:n] @ vector
+        # Entry hết hạn chưa được dọn -> không được chọn
+        scores[self.created_at[:n] < cutoff] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            return None, 0.0
+        return self.ids[best], float(scores[best])
+
+
+class InMemoryAnswerStore:
+    """
+    LRU + TTL trong RAM; vector đã chuẩn hoá được gom theo (lang, dãy số trong câu
+    hỏi), tìm kiếm chỉ nhân ma trận của đúng nhóm đó với vector câu hỏi.
+
+    Entry hết hạn bị bỏ qua khi tìm kiếm và được dọn theo lô, tối đa một lần
+    mỗi purge_interval giây (không quét + xoá từng dòng ở mỗi lần search).
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl: float = 86400.0, purge_interval: float = 60.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.purge_interval = max(0.0, purge_interval)
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._buckets: Dict[BucketKey, _Bucket] = {}
+        # id -> dòng của entry trong bucket
+        self._rows: Dict[int, int] = {}
+        self._next_id = 1
+        self._last_purge = time.time()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def search(
+        self,
+        vector: np.ndarray,
+        lang: str,
+        numbers: Tuple[str, ...] = (),
+    ) -> Tuple[Optional[CachedAnswer], float]:
+        now = time.time()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self._purge_expired(now - self.ttl)
+
+        bucket = self._buckets.get((lang, numbers))
+        if not bucket or bucket.matrix.shape[1] != len(vector):
+            return None, 0.0
+
+        entry_id, score = bucket.search(vector, now - self.ttl)
+        if entry_id is None:
+            return None, 0.0
+        self._entries.move_to_end(entry_id)
+        return self._entries[entry_id], score
+
+    def add(self, lang: str, question: str, answer: str, cost_seconds: float, vector: np.ndarray) -> CachedAnswer:
+        entry = CachedAnswer(
+            id=self._next_id,
+            lang=lang,
+            question=question,
+            answer=answer,
+            created_at=time.time(),
+            cost_seconds=cost_seconds,
+            vector=vector,
+        )
+        self._next_id += 1
+        self._insert(entry)
+        return entry
+
+    def _insert(self, entry: CachedAnswer) -> None:
+        if entry.id in self._entries:
+            self._discard(entry.id)
+        key = (entry.lang, entry.numbers)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.matrix.shape[1] != len(entry.vector):
+            # Nhóm mới, hoặc đổi model embedding (khác số chiều) -> bỏ vector cũ của nhóm
+            for entry_id in list(bucket.ids) if bucket is not None else ():
+                self._remove(entry_id)
+            bucket = self._buckets[key] = _Bucket(len(entry.vector))
+        self._rows[entry.id] = bucket.add(entry)
+        self._entries[entry.id] = entry
+        self._entries.move_to_end(entry.id)
+        self._next_id = max(self._next_id, entry.id + 1)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _discard(self, entry_id: int) -> None:
+        """Bỏ entry khỏi RAM (dict + bucket)."""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        key = (entry.lang, entry.numbers)
+        bucket = self._buckets[key]
+        row = self._rows.pop(entry_id)
+        moved = bucket.remove(row)
+        if moved is not None:
+            self._rows[moved] = row
+        if not bucket:
+            del self._buckets[key]
+
+    def _remove(self, entry_id: int) -> None:
+        self._discard(entry_id)
+
+    def _purge_expired(self, cutoff: float) -> None:
+        expired = [e.id for e in self._entries.values() if e.created_at < cutoff]
+        for entry_id in expired:
+            self._discard(entry_id)
+
+
+class SQLiteAnswerStore(InMemoryAnswerStore):
+    """Như InMemoryAnswerStore nhưng ghi xuống SQLite để giữ cache qua các lần restart."""
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 86400.0, purge_interval: float = 60.0):
+        super().__init__(max_entries=max_entries, ttl=ttl, purge_interval=purge_interval)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id           INTEGER PRIMARY KEY,
+                lang         TEXT NOT NULL,
+                question     TEXT NOT NULL,
+                answer       TEXT NOT NULL,
+                created_at   REAL NOT NULL,
+                cost_seconds REAL NOT NULL,
+                vector       BLOB NOT NULL
+            )
+        """)
+        self._db.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - ttl,))
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT id, lang, question, answer, created_at, cost_seconds, vector "
+            "FROM answers ORDER BY created_at"
+        ).fetchall()
+        for row in rows:
+            super()._insert(CachedAnswer(*row[:6], vector=np.frombuffer(row[6], dtype=np.float32)))
+
+    def add(self, lang: str, question: str, answer: str, cost_seconds: float, vector: np.ndarray) -> CachedAnswer:
+        entry = super().add(lang, question, answer, cost_seconds, vector)
+        self._db.execute(
+            "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry.id, entry.lang, entry.question, entry.answer,
+             entry.created_at, entry.cost_seconds, entry.vector.astype(np.float32).tobytes()),
+        )
+        self._db.commit()
+        return entry
+
+    def _remove(self, entry_id: int) -> None:
+        super()._remove(entry_id)
+        self._db.execute("DELETE FROM answers WHERE id = ?", (entry_id,))
+        self._db.commit()
+
+    def _purge_expired(self, cutoff: float) -> None:
+        super()._purge_expired(cutoff)
+        # Một câu DELETE + một commit cho cả lô
+        self._db.execute("DELETE FROM answers WHERE created_at < ?", (cutoff,))
+        self._db.commit()
+
+
+class SemanticAnswerCache:
+    def __init__(self, embedding, store: InMemoryAnswerStore, threshold: float = 0.95):
+        self.embedding = embedding
+        self.store = store
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.saved_seconds = 0.0
+
+    def embed(self, question: str) -> Optional[np.ndarray]:
+        try:
+            return _normalize(self.embedding.embed_query(question))
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Answer cache không embed được câu hỏi (bỏ qua cache): {e}")
+            return None
+
+    def lookup(self, vector: Optional[np.ndarray], lang: str, question: str = "") -> Optional[str]:
+        if vector is None:
+            return None
+        with self._lock:
+            entry, score = self.store.search(vector, lang, question_numbers(question))
+            if entry is None or score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry.cost_seconds
+            return entry.answer
+
+    def store_answer(
+        self,
+        vector: Optional[np.ndarray],
+        lang: str,
+        question: str,
+        answer: str,
+        cost_seconds: float,
+    ) -> None:
+        if vector is None or not answer:
+            return
+        with self._lock:
+            try:
+                self.store.add(lang, question, answer, cost_seconds, vector)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Answer cache ghi lỗi: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.store),
+                "backend": type(self.store).__name__,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache(embedding) -> Optional[SemanticAnswerCache]:
+    """Trả về cache dùng chung, hoặc None nếu chưa bật bằng ANSWER_CACHE_ENABLED=1."""
+    global _cache
+    if os.getenv("ANSWER_CACHE_ENABLED", "0").strip().lower() in {"", "0", "false", "no", "off"}:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+                ttl = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+                purge_interval = float(os.getenv("ANSWER_CACHE_PURGE_INTERVAL", "60"))
+                backend = os.getenv("ANSWER_CACHE_BACKEND", "memory").strip().lower()
+
+                store: InMemoryAnswerStore
+                if backend == "sqlite":
+                    try:
+                        store = SQLiteAnswerStore(
+                            os.getenv("ANSWER_CACHE_PATH", str(_DEFAULT_PATH)),
+                            max_entries=max_entries,
+                            ttl=ttl,
+                            purge_interval=purge_interval,
+                        )
+                    except Exception as e:
+                        print(f"⚠️ Không mở được answer cache SQLite, dùng RAM: {e}")
+                        store = InMemoryAnswerStore(max_entries=max_entries, ttl=ttl, purge_interval=purge_interval)
+                else:
+                    store = InMemoryAnswerStore(max_entries=max_entries, ttl=ttl, purge_interval=purge_interval)
+
+                _cache = SemanticAnswerCache(
+                    embedding,
+                    store,
+                    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+                )
+    return _cache
+
+
+def get_answer_cache_stats() -> Dict[str, float]:
+    return _cache.stats() if _cache is not None else {}
@@ -0,0 +1,169 @@
+# data_processing/embedding_cache.py
+"""
+Cache embedding của CÂU HỎI, bọc quanh app.emb.
+
+Trong một request, cùng một câu hỏi được embed lại ở nhiều chỗ
+(retriever VSIC 2025, VSIC 2018, MST, answer cache...). CachingEmbeddings
+chỉ gọi OpenAI một lần cho mỗi câu hỏi (đã chuẩn hoá) rồi dùng lại cho
+mọi index Pinecone; câu hỏi phổ biến cũng được dùng lại giữa các request.
+
+- embed_query: LRU trong RAM (+ SQLite nếu có EMBEDDING_CACHE_PATH).
+  Nhiều thread embed cùng một câu -> chỉ MỘT thread gọi API, các thread khác chờ.
+- embed_documents: gọi thẳng model gốc (dùng khi ingest, không cache).
+
+ENV (tuỳ chọn):
+  - EMBEDDING_CACHE_ENABLED     : 1/0 bật tắt (mặc định 1)
+  - EMBEDDING_CACHE_MAX_ENTRIES : số câu hỏi tối đa trong RAM (mặc định 5000)
+  - EMBEDDING_CACHE_PATH        : file SQLite để giữ cache qua các lần restart (mặc định: không)
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_query_text(text: str) -> str:
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+class CachingEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings, max_entries: int = 5000, path: Optional[str] = None):
+        self.inner = inner
+        self.max_entries = max(1, max_entries)
+        # Embedding của model khác không dùng lẫn được -> đưa tên model vào key
+        self._namespace = str(getattr(inner, "model", "") or type(inner).__name__)
+
+        self._data: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> Event của lần gọi API đang chạy (single-flight)
+        self._inflight: Dict[str, threading.Event] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"⚠️ Không mở được embedding cache trên đĩa ({path}), chỉ dùng RAM: {e}")
+                self._db = None
+
+    def _key(self, text: str) -> str:
+        raw = f"{self._namespace}\n{normalize_query_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        # Gọi khi đang giữ lock
+        self._data[key] = vector
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[List[float]]:
+        # Gọi khi đang giữ lock
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+        except Exception as e:
+            print(f"⚠️ Embedding cache đọc đĩa lỗi: {e}")
+            return None
+        return array("f", row[0]).tolist() if row else None
+
+    def _write_disk(self, key: str, vector: List[float]) -> None:
+        # Gọi khi đang giữ lock
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)",
+                (key, array("f", vector).tobytes()),
+            )
+            self._db.commit()
+        except Exception as e:
+            print(f"⚠️ Embedding cache ghi đĩa lỗi: {e}")
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+
+        while True:
+            with self._lock:
+                vector = self._data.get(key)
+                if vector is not None:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return vector
+
+                vector = self._read_disk(key)
+                if vector is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    done = self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+
+            # Thread khác đang embed đúng câu này -> chờ rồi đọc lại cache
+            # (nếu thread đó lỗi thì vòng lặp sẽ tự gọi API)
+            waiting.wait()
+
+        try:
+            vector = list(self.inner.embed_query(text))
+            with self._lock:
+                self._remember(key, vector)
+                self._write_disk(key, vector)
+            return vector
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            }
+
+
+def wrap_embeddings(inner: Embeddings) -> Embeddings:
+    """Bọc model embedding bằng CachingEmbeddings, trừ khi EMBEDDING_CACHE_ENABLED=0."""
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return inner
+    return CachingEmbeddings(
+        inner,
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "5000")),
+        path=os.getenv("EMBEDDING_CACHE_PATH", "").strip() or None,
+    )
+
+
+def get_embedding_cache_stats(embedding) -> Dict[str, float]:
+    return embedding.stats() if isinstance(embedding, CachingEmbeddings) else {}
@@ -14,6 +14,10 @@ def is_vsic_code_query(text: str) -> bool:
     if re.search(r"\b\d{5}\b", t):
         return True
 
+    # Tra theo tiền tố mã: "0111*"
+    if re.search(r"\b\d{1,5}\*", t):
+        return True
+
     # 2️⃣ Từ khóa đặc trưng
     keywords = [
         "mã ngành",
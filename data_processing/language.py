@@ -1,6 +1,136 @@
 # data_processing/language.py
+import os
+import re
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from data_processing.translation_cache import get_translation_cache
+
+# langdetect (có trong requirements). Nếu không có sẽ chỉ dùng heuristic chữ viết.
+try:
+    from langdetect import DetectorFactory, detect_langs
+    DetectorFactory.seed = 0  # langdetect mặc định ngẫu nhiên -> cố định để kết quả ổn định
+except Exception:
+    detect_langs = None
+
+SUPPORTED_LANGS = ("vi", "en", "ja", "ko", "zh", "fr", "es")
+
+# Độ tin cậy tối thiểu để KHÔNG gọi LLM
+LANG_DETECT_MIN_CONFIDENCE = float(os.getenv("LANG_DETECT_MIN_CONFIDENCE", "0.90"))
+# Câu Latin quá ngắn thì langdetect không đáng tin -> để LLM quyết định
+LANG_DETECT_MIN_LETTERS = int(os.getenv("LANG_DETECT_MIN_LETTERS", "12"))
+# Tỉ lệ tối thiểu số từ có dấu tiếng Việt (không tính từ viết hoa chữ đầu như địa danh
+# "Đà Nẵng", "Bắc Ninh") trên tổng số từ để kết luận là tiếng Việt
+LANG_DETECT_VI_WORD_RATIO = float(os.getenv("LANG_DETECT_VI_WORD_RATIO", "0.2"))
+
+_HANGUL_RE = re.compile(r"[\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]")
+_KANA_RE = re.compile(r"[\u3040-\u30ff\u31f0-\u31ff]")
+_HAN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]")
+
+# Chữ cái có dấu CHỈ có trong tiếng Việt (đã loại các chữ dùng chung với Pháp/Tây Ban Nha
+# như à, â, é, è, ê, ô, ù, ú, á, í, ó...)
+_VI_ONLY_CHARS = set(
+    "ăđơư"
+    "ạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịĩọỏốồổỗộớờởỡợụủũứừửữựỳỵỷỹ"
+    "ãõ"
+)
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+_LANGDETECT_ALIASES = {"zh-cn": "zh", "zh-tw": "zh"}
+
+_stats_lock = threading.Lock()
+_LANG_DETECT_STATS: Dict[str, int] = {}
+
+
+def _record(source: str, lang: str) -> None:
+    with _stats_lock:
+        for key in (f"source:{source}", f"lang:{lang}"):
+            _LANG_DETECT_STATS[key] = _LANG_DETECT_STATS.get(key, 0) + 1
+
+
+def get_language_detection_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_LANG_DETECT_STATS)
+
+
+def detect_language_local(text: str) -> Tuple[Optional[str], float, str]:
+    """
+    Nhận diện ngôn ngữ KHÔNG gọi mạng.
+    Trả về (lang | None, confidence, source); lang = None nghĩa là không chắc.
+    """
+    t = (text or "").strip()
+    letters = [c for c in t if c.isalpha()]
+    if not letters:
+        return None, 0.0, "local"
+
+    n = len(letters)
+
+    # 1) Chữ viết CJK / Hangul gần như quyết định luôn ngôn ngữ
+    hangul = len(_HANGUL_RE.findall(t))
+    kana = len(_KANA_RE.findall(t))
+    han = len(_HAN_RE.findall(t))
+
+    if hangul and hangul / n >= 0.3:
+        return "ko", 0.99, "script"
+    if kana:
+        return "ja", 0.99, "script"
+    if han and han / n >= 0.3:
+        return "zh", 0.95, "script"
+
+    # 2) Dấu tiếng Việt: phải chiếm đủ tỉ lệ từ, không chỉ vài tên riêng trong câu tiếng nước ngoài
+    words = _WORD_RE.findall(t)
+    vi_words = [w for w in words if any(c in _VI_ONLY_CHARS for c in w.lower())]
+    if vi_words:
+        common = [w for w in vi_words if not (w[0].isupper() and not w.isupper())]
+        if len(common) / len(words) >= LANG_DETECT_VI_WORD_RATIO:
+            return "vi", 0.99, "diacritics"
+
+        # Còn lại: bỏ các từ có dấu Việt (thường là địa danh) rồi để langdetect xét phần còn lại
+        vi_set = set(vi_words)
+        t = " ".join(w for w in words if w not in vi_set)
+        n = len(t.replace(" ", ""))
+
+    # 3) Chữ Latin không dấu Việt: langdetect
+    if detect_langs is None or n < LANG_DETECT_MIN_LETTERS:
+        return None, 0.0, "local"
+
+    try:
+        candidates = detect_langs(t)
+    except Exception:
+        return None, 0.0, "local"
+
+    if not candidates:
+        return None, 0.0, "local"
+
+    top = candidates[0]
+    lang = _LANGDETECT_ALIASES.get(top.lang, top.lang)
+    if lang in SUPPORTED_LANGS:
+        return lang, float(top.prob), "langdetect"
+    return None, float(top.prob), "langdetect"
+
+
+def detect_language_with_source(text: str, lang_llm) -> Tuple[str, str]:
+    """
+    Tầng local trước, chỉ gọi LLM khi độ tin cậy thấp.
+    Trả về (lang, source) với source thuộc: script | diacritics | langdetect | llm.
+    """
+    lang, confidence, source = detect_language_local(text)
+    if lang is not None and confidence >= LANG_DETECT_MIN_CONFIDENCE:
+        _record(source, lang)
+        return lang, source
+
+    lang = detect_language_openai(text, lang_llm)
+    _record("llm", lang)
+    return lang, "llm"
+
+
+def detect_language(text: str, lang_llm) -> str:
+    return detect_language_with_source(text, lang_llm)[0]
+
+
 def detect_language_openai(text: str, lang_llm) -> str:
     try:
         res = lang_llm.invoke([
@@ -18,29 +148,67 @@ def detect_language_openai(text: str, lang_llm) -> str:
         return "vi"
 
 
-def convert_language(text: str, target_lang: str, lang_llm) -> str:
-    lang_mapping = {
-        "vi": "Tiếng Việt",
-        "en": "English",
-        "ko": "Korean",
-        "ja": "Japanese",
-        "zh": "Chinese",
-        "fr": "French",
-        "de": "German",
-        "es": "Spanish",
-        "th": "Thai"
-    }
+# Ngôn ngữ đích hỗ trợ dịch (cũng là danh sách pre-warm translation cache)
+LANG_MAPPING = {
+    "vi": "Tiếng Việt",
+    "en": "English",
+    "ko": "Korean",
+    "ja": "Japanese",
+    "zh": "Chinese",
+    "fr": "French",
+    "de": "German",
+    "es": "Spanish",
+    "th": "Thai"
+}
+
+
+def _translate_llm(text: str, target_lang: str, lang_llm) -> str:
+    target_lang_name = LANG_MAPPING.get(target_lang, target_lang)
+    return lang_llm.invoke([
+        SystemMessage(
+            content="Bạn là một phiên dịch chuyên nghiệp. Chỉ trả về bản dịch."
+        ),
+        HumanMessage(
+            content=f"Dịch nội dung sau sang {target_lang_name}:\n\n{text}"
+        )
+    ]).content.strip()
 
-    target_lang_name = lang_mapping.get(target_lang, target_lang)
+
+def convert_language(text: str, target_lang: str, lang_llm, cache: bool = False) -> str:
+    """
+    Dịch text sang target_lang.
+    cache=True cho các câu cố định (lời chào, thông báo...) -> tra translation cache trước.
+    """
+    translation_cache = get_translation_cache() if cache else None
+    if translation_cache is not None:
+        cached = translation_cache.get(text, target_lang)
+        if cached is not None:
+            return cached
 
     try:
-        return lang_llm.invoke([
-            SystemMessage(
-                content="Bạn là một phiên dịch chuyên nghiệp. Chỉ trả về bản dịch."
-            ),
-            HumanMessage(
-                content=f"Dịch nội dung sau sang {target_lang_name}:\n\n{text}"
-            )
-        ]).content.strip()
+        translated = _translate_llm(text, target_lang, lang_llm)
     except Exception:
+        # Không cache khi lỗi -> lần sau thử dịch lại
         return text
+
+    if translation_cache is not None and translated:
+        translation_cache.put(text, target_lang, translated)
+    return translated
+
+
+def prewarm_translations(texts: Iterable[str], lang_llm, langs: Optional[Iterable[str]] = None) -> int:
+    """
+    Dịch sẵn các câu tiếng Việt cố định sang mọi ngôn ngữ trong LANG_MAPPING.
+    Câu đã có trong cache (RAM/đĩa) không gọi LLM. Trả về số bản dịch đã sẵn sàng.
+    """
+    if get_translation_cache() is None:
+        return 0
+
+    ready = 0
+    for lang in langs or LANG_MAPPING:
+        if lang == "vi":
+            continue
+        for text in texts:
+            if convert_language(text, lang, lang_llm, cache=True) != text:
+                ready += 1
+    return ready
@@ -1,11 +1,15 @@
 # data_processing/pipeline.py
 
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional
 from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage
 import json
 from data_processing.cleaning import clean_question_remove_uris
-from data_processing.language import detect_language_openai, convert_language
+from data_processing.language import detect_language, convert_language, prewarm_translations
 from data_processing.context_builder import build_context_from_hits
+from data_processing.retrieval import invoke_retrievers_parallel
+from msn_2018.vsic_index import get_vsic_index
+from msn_2018.crosswalk import get_vsic_crosswalk
 from system_prompts.pdf_reader_system import PDF_READER_SYS
 from data_processing.intent import is_vsic_code_query, is_flowchart_intent, is_greeting_question
 
@@ -25,6 +29,25 @@ GREETING_VI = (
     "Quý khách vui lòng nhập câu hỏi hoặc mô tả nhu cầu cụ thể để ChatIIP hỗ trợ."
 )
 
+OUT_OF_SCOPE_VI = (
+    "Tôi là chatbot chuyên tư vấn và tra cứu thông tin trong các lĩnh vực: "
+    "pháp luật (luật, nghị định, thông tư, quyết định), "
+    "ngành nghề kinh doanh, mã số thuế và thông tin doanh nghiệp, "
+    "kế toán – thuế, lao động – việc làm, "
+    "cũng như bất động sản công nghiệp "
+    "(khu công nghiệp, cụm công nghiệp, nhà xưởng cho thuê/bán "
+    "và các thủ tục pháp lý liên quan). "
+    "Tôi chỉ hỗ trợ các câu hỏi thuộc những lĩnh vực nêu trên; "
+    "bạn vui lòng đặt câu hỏi phù hợp để tôi có thể hỗ trợ chính xác."
+)
+
+# Các câu cố định được dịch qua translation cache (pre-warm lúc khởi động)
+STATIC_TRANSLATABLE_TEXTS = (GREETING_VI, OUT_OF_SCOPE_VI)
+
+
+def prewarm_static_translations(lang_llm) -> int:
+    return prewarm_translations(STATIC_TRANSLATABLE_TEXTS, lang_llm)
+
 
 # ======================================================
 # NHẬN DIỆN LAO ĐỘNG / VIỆC LÀM / BHXH / DN
@@ -75,6 +98,22 @@ FOLLOWUP_ANCHOR_SYS = (
 )
 
 
+def vsic_context_from_hits(hits: Optional[List], decision: str) -> str:
+    """
+    Context VSIC cho một văn bản (decision = "36/2025/QĐ-TTg" | "27/2018/QĐ-TTg").
+    hits None = retriever lỗi / timeout -> báo không tra cứu được, KHÔNG kết luận
+    "không được quy định"; chỉ [] (tra cứu thành công, không có hit) mới là không có.
+    """
+    if hits is None:
+        return (
+            f"Không tra cứu được dữ liệu theo Quyết định số {decision} (lỗi hệ thống tra cứu). "
+            "Không được kết luận mã ngành không được quy định; hãy nói rõ chưa tra cứu được phần này."
+        )
+    if not hits:
+        return f"Mã ngành này không được quy định theo Quyết định số {decision}."
+    return build_context_from_hits(hits)
+
+
 # Phân loại lịch sử hội thoại: 
 def llm_is_followup(
     clean_question: str,
@@ -136,7 +175,8 @@ def process_pdf_question(
     lang_llm,
     retriever,
     retriever_vsic_2018=None,
-    excel_handler=None
+    excel_handler=None,
+    answer_cache=None
 ) -> str:
 
     # ============================
@@ -147,7 +187,7 @@ def process_pdf_question(
     law_count = i.get("law_count")
 
     clean_question = clean_question_remove_uris(message)
-    user_lang = detect_language_openai(clean_question, lang_llm)
+    user_lang = detect_language(clean_question, lang_llm)
 
     # ============================
     # 0️⃣.1 CHÀO HỎI
@@ -155,7 +195,7 @@ def process_pdf_question(
     if is_greeting_question(clean_question):
         if user_lang == "vi":
             return GREETING_VI
-        return convert_language(GREETING_VI, user_lang, lang_llm)
+        return convert_language(GREETING_VI, user_lang, lang_llm, cache=True)
 
     # ============================
     # 0️⃣.2 FLOWCHART (MERMAID + GIẢI THÍCH)
@@ -304,6 +344,13 @@ Trả lời bằng ngôn ngữ: {user_lang}.
         # ==================================================
         # CASE B: NEW_TOPIC → COI NHƯ CÂU HỎI MỚI, CHẠY RAG
         # ==================================================
+        # Câu hỏi gần giống câu đã trả lời (cùng ngôn ngữ) → trả lại từ answer cache
+        question_vector = answer_cache.embed(clean_question) if answer_cache else None
+        cached_answer = answer_cache.lookup(question_vector, user_lang, clean_question) if answer_cache else None
+        if cached_answer:
+            return cached_answer
+
+        started = time.perf_counter()
         hits = retriever.invoke(clean_question) if retriever else []
         has_context = bool(hits)
         context = build_context_from_hits(hits) if has_context else ""
@@ -327,40 +374,47 @@ YÊU CẦU BẮT BUỘC:
 """
             messages.append(HumanMessage(content=human))
             response = llm.invoke(messages).content
-            return response if user_lang == "vi" else convert_language(response, user_lang, lang_llm)
+            response = response if user_lang == "vi" else convert_language(response, user_lang, lang_llm)
+
+            if answer_cache:
+                answer_cache.store_answer(
+                    question_vector, user_lang, clean_question, response,
+                    cost_seconds=time.perf_counter() - started,
+                )
+            return response
 
         # ==================================================
         # CASE C: KHÔNG CÓ CONTEXT → OUT OF SCOPE
         # ==================================================
-        out_of_scope_vi = (
-            "Tôi là chatbot chuyên tư vấn và tra cứu thông tin trong các lĩnh vực: "
-            "pháp luật (luật, nghị định, thông tư, quyết định), "
-            "ngành nghề kinh doanh, mã số thuế và thông tin doanh nghiệp, "
-            "kế toán – thuế, lao động – việc làm, "
-            "cũng như bất động sản công nghiệp "
-            "(khu công nghiệp, cụm công nghiệp, nhà xưởng cho thuê/bán "
-            "và các thủ tục pháp lý liên quan). "
-            "Tôi chỉ hỗ trợ các câu hỏi thuộc những lĩnh vực nêu trên; "
-            "bạn vui lòng đặt câu hỏi phù hợp để tôi có thể hỗ trợ chính xác."
-        )
-
-        return out_of_scope_vi if user_lang == "vi" else convert_language(out_of_scope_vi, user_lang, lang_llm)
+        return OUT_OF_SCOPE_VI if user_lang == "vi" else convert_language(OUT_OF_SCOPE_VI, user_lang, lang_llm, cache=True)
 
 
     # ============================
     # 5️⃣ VSIC 2025 ↔ 2018
     # ============================
-    hits_2025 = retriever.invoke(clean_question) if retriever else []
-    context_2025 = build_context_from_hits(hits_2025) if hits_2025 else (
-        "Mã ngành này không được quy định theo Quyết định số 36/2025/QĐ-TTg."
-    )
+    # So sánh mã cụ thể 2018 ↔ 2025 -> trả lời thẳng từ bảng crosswalk build sẵn
+    # (nội dung thay đổi theo từng câu hỏi -> không đưa vào translation cache)
+    crosswalk = get_vsic_crosswalk()
+    crosswalk_answer = crosswalk.answer(clean_question) if crosswalk else None
+    if crosswalk_answer:
+        if user_lang == "vi":
+            return crosswalk_answer
+        return convert_language(crosswalk_answer, user_lang, lang_llm)
 
-    context_2018 = ""
-    if retriever_vsic_2018:
-        hits_2018 = retriever_vsic_2018.invoke(clean_question)
-        context_2018 = build_context_from_hits(hits_2018) if hits_2018 else (
-            "Mã ngành này không được quy định theo Quyết định số 27/2018/QĐ-TTg."
-        )
+    # Câu hỏi nêu mã / tiền tố mã cụ thể -> tra dict VSIC, không cần Pinecone
+    code_contexts = get_vsic_index().build_contexts(clean_question) or {}
+
+    # Hệ thống nào dict không tra được (không có mã trong câu hỏi, hoặc nguồn thiếu mã)
+    # -> semantic search cho riêng hệ thống đó; hai index độc lập nên truy vấn song song
+    retrievers = {"2025": retriever, "2018": retriever_vsic_2018}
+    missing = {f"vsic_{system}": r for system, r in retrievers.items() if not code_contexts.get(system)}
+    vsic_hits = invoke_retrievers_parallel(clean_question, missing) if missing else {}
+
+    context_2025 = code_contexts.get("2025") or vsic_context_from_hits(vsic_hits["vsic_2025"], "36/2025/QĐ-TTg")
+
+    context_2018 = code_contexts.get("2018") or ""
+    if not context_2018 and retriever_vsic_2018:
+        context_2018 = vsic_context_from_hits(vsic_hits["vsic_2018"], "27/2018/QĐ-TTg")
 
     system_prompt = PDF_READER_SYS + f"\n\nNgười dùng đang dùng ngôn ngữ: '{user_lang}'."
     messages = [SystemMessage(content=system_prompt)]
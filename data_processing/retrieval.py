@@ -0,0 +1,71 @@
+# data_processing/retrieval.py
+"""
+Chạy nhiều retriever độc lập SONG SONG trên một thread pool dùng chung.
+
+Mỗi retriever.invoke = 1 lần embed + 1 query Pinecone (I/O) -> chạy song song
+thì độ trễ ≈ retriever chậm nhất thay vì tổng các retriever.
+
+ENV (tuỳ chọn):
+  - RETRIEVAL_MAX_WORKERS     : số thread của pool (mặc định 8)
+  - RETRIEVAL_TIMEOUT_SECONDS : thời gian chờ tối đa mỗi retriever (mặc định 15)
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "15"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("RETRIEVAL_MAX_WORKERS", "8")),
+                    thread_name_prefix="retrieval",
+                )
+    return _executor
+
+
+def invoke_retrievers_parallel(
+    query: str,
+    retrievers: Dict[str, Any],
+    timeout: Optional[float] = None,
+) -> Dict[str, Optional[List]]:
+    """
+    Gọi retriever.invoke(query) cho mọi retriever cùng lúc.
+    Trả về {tên: hits}:
+      - list (có thể rỗng) : truy vấn thành công; [] nghĩa là thật sự không có hit
+      - None               : retriever lỗi hoặc quá timeout -> KHÔNG được hiểu là "không có kết quả"
+    Retriever None (không cấu hình) -> [] . Lỗi không làm chết pipeline.
+    """
+    timeout = RETRIEVAL_TIMEOUT_SECONDS if timeout is None else timeout
+    executor = _get_executor()
+
+    futures = {
+        name: executor.submit(retriever.invoke, query)
+        for name, retriever in retrievers.items()
+        if retriever is not None
+    }
+
+    # Deadline chung: các retriever chạy đồng thời nên mỗi cái có trọn `timeout` giây
+    deadline = time.monotonic() + timeout
+    results: Dict[str, Optional[List]] = {name: [] for name in retrievers}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline - time.monotonic())) or []
+        except FutureTimeoutError:
+            future.cancel()
+            results[name] = None
+            print(f"⚠️ Retriever '{name}' quá {timeout}s, bỏ qua kết quả")
+        except Exception as e:
+            results[name] = None
+            print(f"⚠️ Retriever '{name}' lỗi: {e}")
+    return results
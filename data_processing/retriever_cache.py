@@ -0,0 +1,157 @@
+# data_processing/retriever_cache.py
+"""
+Giữ retriever Pinecone (MST, VSIC 2018...) dùng chung cho cả process.
+
+Trước đây mỗi câu hỏi lại tạo PineconeClient mới + gọi list_indexes()
+(và describe_index_stats()) trước khi query. Giờ:
+  - retriever được build MỘT lần, lazy, thread-safe;
+  - việc kiểm tra index còn tồn tại / còn dữ liệu chạy trong thread nền
+    bằng cách build lại định kỳ rồi thay thế, request không phải chờ.
+
+ENV (tuỳ chọn):
+  - PINECONE_HEALTH_CHECK_SECONDS : chu kỳ kiểm tra lại (mặc định 300, 0 = tắt)
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pinecone import Pinecone as PineconeClient
+
+# Build lỗi -> thử lại sớm hơn chu kỳ bình thường
+_RETRY_SECONDS = 30.0
+
+_client: Optional[PineconeClient] = None
+_client_lock = threading.Lock()
+
+
+def get_pinecone_client() -> PineconeClient:
+    """PineconeClient dùng chung (giữ connection pool HTTP giữa các request)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PineconeClient(api_key=os.getenv("PINECONE_API_KEY"))
+    return _client
+
+
+class CachedRetriever:
+    def __init__(self, name: str, build: Callable[[], Any], interval: float = 300.0):
+        self.name = name
+        self._build = build
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._built = False
+        self._value: Any = None
+        self._error: Optional[Exception] = None
+        self._monitor: Optional[threading.Thread] = None
+        self.built_at: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.builds = 0
+
+    def get(self) -> Any:
+        """
+        Trả về retriever đã build. Chưa build được lần nào thì build lại trên
+        đường request, nhưng cách lần thử trước ít nhất _RETRY_SECONDS; trong
+        thời gian chờ thì raise lại lỗi gần nhất.
+        """
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._refresh()
+                    self._built = True
+                    self._start_monitor()
+        elif self._value is None and self._retry_due():
+            with self._lock:
+                if self._value is None and self._retry_due():
+                    self._refresh()
+
+        if self._value is None and self._error is not None:
+            raise self._error
+        return self._value
+
+    def _retry_due(self) -> bool:
+        return self.checked_at is None or time.time() - self.checked_at >= _RETRY_SECONDS
+
+    def _refresh(self) -> bool:
+        try:
+            value = self._build()
+        except Exception as e:
+            # Lỗi tạm thời (mạng...) -> giữ retriever cũ nếu có
+            self._error = e
+            self.checked_at = time.time()
+            print(f"⚠️ Retriever '{self.name}' kiểm tra/build lỗi: {e}")
+            return False
+
+        self._value = value
+        self._error = None
+        self.built_at = self.checked_at = time.time()
+        self.builds += 1
+        return True
+
+    def _start_monitor(self) -> None:
+        if self.interval <= 0 or self._monitor is not None:
+            return
+        self._monitor = threading.Thread(
+            target=self._monitor_loop,
+            name=f"retriever-health-{self.name}",
+            daemon=True,
+        )
+        self._monitor.start()
+
+    def _monitor_loop(self) -> None:
+        while True:
+            failing = self._value is None or self._error is not None
+            time.sleep(min(self.interval, _RETRY_SECONDS) if failing else self.interval)
+            self._refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self._value is not None,
+            "built_at": self.built_at,
+            "checked_at": self.checked_at,
+            "builds": self.builds,
+            "last_error": str(self._error) if self._error else None,
+        }
+
+
+# ==========================================================
+# REGISTRY CHO PROCESS
+# ==========================================================
+_retrievers: Dict[Tuple[str, str], CachedRetriever] = {}
+_registry_lock = threading.Lock()
+
+
+def _embedding_key(embedding) -> str:
+    """
+    Định danh ổn định của embedding: lớp + model. Không dùng id(embedding) vì
+    object tạo lại (hoặc id được tái sử dụng sau khi object cũ bị thu hồi) sẽ
+    sinh retriever mới / trùng nhầm retriever cũ.
+    """
+    cls = type(embedding)
+    model = getattr(embedding, "model", None) or getattr(embedding, "model_name", None)
+    return f"{cls.__module__}.{cls.__qualname__}:{model or ''}"
+
+
+def get_cached_retriever(name: str, embedding, build: Callable[[], Any]) -> Any:
+    """
+    Retriever dùng chung theo (name, embedding). build() chỉ chạy lần đầu
+    và trong thread kiểm tra nền, không chạy lại trên đường request.
+    """
+    key = (name, _embedding_key(embedding))
+    cached = _retrievers.get(key)
+    if cached is None:
+        with _registry_lock:
+            cached = _retrievers.get(key)
+            if cached is None:
+                cached = CachedRetriever(
+                    name,
+                    build,
+                    interval=float(os.getenv("PINECONE_HEALTH_CHECK_SECONDS", "300")),
+                )
+                _retrievers[key] = cached
+    return cached.get()
+
+
+def get_retriever_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cached.stats() for (name, _), cached in list(_retrievers.items())}
@@ -0,0 +1,146 @@
+# data_processing/translation_cache.py
+"""
+Cache bản dịch của convert_language, key = (sha256(text), target_lang).
+
+Dùng cho các câu cố định (lời chào, thông báo ngoài phạm vi...): bản dịch
+không đổi nên chỉ cần gọi LLM một lần cho mỗi ngôn ngữ.
+
+- Tầng 1: LRU trong RAM.
+- Tầng 2: SQLite trên đĩa (stdlib) -> giữ được qua các lần restart.
+
+ENV (tuỳ chọn):
+  - TRANSLATION_CACHE_ENABLED     : 1/0 bật tắt (mặc định 1)
+  - TRANSLATION_CACHE_MAX_ENTRIES : số bản dịch tối đa trong RAM (mặc định 1000)
+  - TRANSLATION_CACHE_PATH        : file SQLite (mặc định <thư mục project>/.cache/translations.sqlite3,
+                                    không phụ thuộc thư mục chạy), để trống = chỉ cache trong RAM
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+Key = Tuple[str, str]  # (sha256(text), target_lang)
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "translations.sqlite3"
+
+
+def translation_key(text: str, target_lang: str) -> Key:
+    digest = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    return digest, (target_lang or "").strip().lower()
+
+
+class TranslationCache:
+    def __init__(self, max_entries: int = 1000, path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[Key, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS translations (
+                        text_hash   TEXT NOT NULL,
+                        target_lang TEXT NOT NULL,
+                        translation TEXT NOT NULL,
+                        PRIMARY KEY (text_hash, target_lang)
+                    )
+                """)
+                self._db.commit()
+            except Exception as e:
+                print(f"⚠️ Không mở được translation cache trên đĩa ({path}), chỉ dùng RAM: {e}")
+                self._db = None
+
+    def _remember(self, key: Key, translation: str) -> None:
+        # Gọi khi đang giữ lock
+        self._data[key] = translation
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, text: str, target_lang: str) -> Optional[str]:
+        key = translation_key(text, target_lang)
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT translation FROM translations WHERE text_hash = ? AND target_lang = ?",
+                        key,
+                    ).fetchone()
+                except Exception as e:
+                    print(f"⚠️ Translation cache đọc đĩa lỗi: {e}")
+                    row = None
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, target_lang: str, translation: str) -> None:
+        key = translation_key(text, target_lang)
+        with self._lock:
+            self._remember(key, translation)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO translations (text_hash, target_lang, translation) VALUES (?, ?, ?)",
+                        (*key, translation),
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    print(f"⚠️ Translation cache ghi đĩa lỗi: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            }
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_cache: Optional[TranslationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_translation_cache() -> Optional[TranslationCache]:
+    """Trả về cache dùng chung, hoặc None nếu tắt bằng TRANSLATION_CACHE_ENABLED=0."""
+    global _cache
+    if os.getenv("TRANSLATION_CACHE_ENABLED", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TranslationCache(
+                    max_entries=int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "1000")),
+                    path=os.getenv("TRANSLATION_CACHE_PATH", str(_DEFAULT_PATH)).strip() or None,
+                )
+    return _cache
+
+
+def get_translation_cache_stats() -> Dict[str, float]:
+    return _cache.stats() if _cache is not None else {}
@@ -0,0 +1,88 @@
+# database/engine.py
+"""
+Engine SQLAlchemy dùng chung cho toàn bộ process (Supabase/Postgres).
+
+Mọi module truy cập DB (user_history, law_db_query) lấy engine qua
+get_engine() thay vì tự create_engine, để cả process chỉ có MỘT pool kết nối.
+
+ENV (tuỳ chọn):
+  - DATABASE_URL           : URL Postgres (bắt buộc)
+  - DB_POOL_SIZE           : số kết nối giữ sẵn trong pool (mặc định 5)
+  - DB_MAX_OVERFLOW        : số kết nối vượt pool_size tối đa (mặc định 10)
+  - DB_POOL_TIMEOUT        : số giây chờ lấy kết nối (mặc định 30)
+  - DB_POOL_RECYCLE        : số giây trước khi tái tạo kết nối (mặc định 1800)
+  - DB_POOL_PRE_PING       : kiểm tra kết nối trước khi dùng (mặc định 1)
+"""
+import os
+import threading
+from typing import Any, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+_engine: Engine | None = None
+_engine_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def get_database_url() -> str:
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        raise RuntimeError("DATABASE_URL is not set")
+    # SQLAlchemy 2.x không nhận scheme "postgres://" (Supabase/Heroku hay dùng)
+    if db_url.startswith("postgres://"):
+        db_url = "postgresql://" + db_url[len("postgres://"):]
+    return db_url
+
+
+def get_engine() -> Engine:
+    """Trả về engine dùng chung, tạo lazy ở lần gọi đầu tiên (thread-safe)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    get_database_url(),
+                    pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+                    pool_size=_env_int("DB_POOL_SIZE", 5),
+                    max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+                    pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+                    pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+                )
+    return _engine
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Thống kê pool cho endpoint /status."""
+    if _engine is None:
+        return {"initialized": False}
+
+    pool = _engine.pool
+    stats: Dict[str, Any] = {"initialized": True, "status": pool.status()}
+    for key in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, key, None)
+        if callable(fn):
+            stats[key] = fn()
+    return stats
+
+
+def dispose_engine() -> None:
+    """Đóng toàn bộ kết nối trong pool (dùng khi shutdown)."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
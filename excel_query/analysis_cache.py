@@ -0,0 +1,188 @@
+# excel_query/analysis_cache.py
+"""
+Cache kết quả phân tích câu hỏi KCN/CCN bằng LLM (_analyze_query_with_llm).
+
+Câu hỏi từ bản đồ (/chatbot) lặp lại rất nhiều ("KCN ở Bình Dương"...):
+key = (phiên bản dữ liệu, câu hỏi đã chuẩn hoá) -> dict phân tích.
+
+- Tầng 1: LRU + TTL trong RAM.
+- Tầng 2: SQLite trên đĩa (stdlib) -> giữ được qua các lần restart.
+
+Phiên bản dữ liệu = sha256 phần tĩnh của prompt (danh sách tỉnh, tên mẫu,
+hướng dẫn): file Excel đổi danh sách tỉnh thì key cũ không còn khớp. Nhiều
+handler (nhiều file Excel) dùng chung cache với các phiên bản khác nhau, nên
+bản ghi chỉ bị dọn theo TTL, không xoá theo phiên bản.
+
+ENV (tuỳ chọn):
+  - KCN_ANALYSIS_CACHE_ENABLED     : 1/0 bật tắt (mặc định 1)
+  - KCN_ANALYSIS_CACHE_MAX_ENTRIES : số câu hỏi tối đa trong RAM (mặc định 2000)
+  - KCN_ANALYSIS_CACHE_TTL_SECONDS : thời gian sống (mặc định 86400, 0 = không hết hạn)
+  - KCN_ANALYSIS_CACHE_PATH        : file SQLite (mặc định <thư mục project>/.cache/kcn_analysis.sqlite3),
+                                     để trống = chỉ cache trong RAM
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+Key = Tuple[str, str]  # (data_version, câu hỏi đã chuẩn hoá)
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "kcn_analysis.sqlite3"
+
+
+def data_version(prompt_prefix: str) -> str:
+    return hashlib.sha256((prompt_prefix or "").encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_question(question: str) -> str:
+    """NFC + lower + gộp khoảng trắng, bỏ dấu câu ở cuối ("KCN ở Bắc Ninh ?" = "kcn ở bắc ninh")."""
+    text = unicodedata.normalize("NFC", question or "").lower()
+    return " ".join(text.split()).rstrip(" ?!.")
+
+
+class QueryAnalysisCache:
+    def __init__(self, max_entries: int = 2000, ttl: float = 86400.0, path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._data: "OrderedDict[Key, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS query_analysis (
+                        data_version TEXT NOT NULL,
+                        question     TEXT NOT NULL,
+                        analysis     TEXT NOT NULL,
+                        created_at   REAL NOT NULL,
+                        PRIMARY KEY (data_version, question)
+                    )
+                """)
+                self._db.commit()
+            except Exception as e:
+                print(f"⚠️ Không mở được KCN analysis cache trên đĩa ({path}), chỉ dùng RAM: {e}")
+                self._db = None
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _remember(self, key: Key, created_at: float, analysis: Dict[str, Any]) -> None:
+        # Gọi khi đang giữ lock
+        self._data[key] = (created_at, analysis)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, version: str, question: str) -> Optional[Dict[str, Any]]:
+        key = (version, normalize_question(question))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._data[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT analysis, created_at FROM query_analysis WHERE data_version = ? AND question = ?",
+                        key,
+                    ).fetchone()
+                except Exception as e:
+                    print(f"⚠️ KCN analysis cache đọc đĩa lỗi: {e}")
+                    row = None
+                if row is not None and not self._expired(row[1]):
+                    analysis = json.loads(row[0])
+                    self._remember(key, row[1], analysis)
+                    self.disk_hits += 1
+                    return dict(analysis)
+
+            self.misses += 1
+            return None
+
+    def put(self, version: str, question: str, analysis: Dict[str, Any]) -> None:
+        key = (version, normalize_question(question))
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, dict(analysis))
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO query_analysis (data_version, question, analysis, created_at) VALUES (?, ?, ?, ?)",
+                        (*key, json.dumps(analysis, ensure_ascii=False), created_at),
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    print(f"⚠️ KCN analysis cache ghi đĩa lỗi: {e}")
+
+    def purge_expired(self) -> None:
+        """
+        Xoá bản ghi quá TTL (một câu DELETE cho cả lô). Không xoá theo phiên bản:
+        phiên bản khác có thể là của handler khác (file Excel khác) đang chạy.
+        """
+        if self.ttl <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for key in [k for k, (created_at, _) in self._data.items() if created_at < cutoff]:
+                del self._data[key]
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM query_analysis WHERE created_at < ?", (cutoff,))
+                    self._db.commit()
+                except Exception as e:
+                    print(f"⚠️ KCN analysis cache xoá bản hết hạn lỗi: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            }
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_cache: Optional[QueryAnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_analysis_cache() -> Optional[QueryAnalysisCache]:
+    """Trả về cache dùng chung, hoặc None nếu tắt bằng KCN_ANALYSIS_CACHE_ENABLED=0."""
+    global _cache
+    if os.getenv("KCN_ANALYSIS_CACHE_ENABLED", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryAnalysisCache(
+                    max_entries=int(os.getenv("KCN_ANALYSIS_CACHE_MAX_ENTRIES", "2000")),
+                    ttl=float(os.getenv("KCN_ANALYSIS_CACHE_TTL_SECONDS", "86400")),
+                    path=os.getenv("KCN_ANALYSIS_CACHE_PATH", str(_DEFAULT_PATH)).strip() or None,
+                )
+    return _cache
+
+
+def get_query_analysis_cache_stats() -> Dict[str, float]:
+    return _cache.stats() if _cache is not None else {}
@@ -0,0 +1,586 @@
+# excel_query/dataset.py
+"""
+Dữ liệu KCN/CCN (IIPMap_FULL_63_COMPLETE.xlsx) dùng chung cho cả process.
+
+main.py, app.py, excel_visualize.handler và excel_visualize.rag_core trước đây
+mỗi nơi tự đọc Excel (openpyxl) và giữ DataFrame / GeoJSON index riêng.
+Giờ mỗi file chỉ được đọc, chuẩn hoá, parse giá / diện tích và ghép tọa độ MỘT lần:
+
+  - get_kcn_dataset(excel_path)              -> KCNDataset: DataFrame + cột chuẩn hoá + inverted index
+  - KCNDataset.geo(geojson_path, threshold)  -> KCNCoordinates: tọa độ đã ghép + data[i] (dict/JSON)
+
+Cột tính thêm vào DataFrame (sau khi nhận diện cột gốc):
+  Loại_norm, Tên_norm (lower + strip), Price_num, Area_num (parse_price / parse_area)
+
+DataFrame, columns_map, index, bản ghi data[i] dùng chung giữa các handler và request:
+KHÔNG sửa tại chỗ (lọc / copy() trước khi thêm cột).
+
+pd.read_excel (openpyxl) là bước chậm nhất lúc start: DataFrame đã chuẩn hoá (kèm cột
+tính thêm và Series chuẩn hoá) được lưu ra đĩa — Feather nếu có pyarrow, không thì
+pickle — key theo mtime + sha256 file Excel. Lần start / worker sau chỉ đọc cache;
+tọa độ đã ghép có cache riêng theo hash Excel + GeoJSON (KCN_COORD_CACHE_PATH).
+
+ENV (tuỳ chọn):
+  - KCN_DATASET_CACHE_PATH : tiền tố file cache DataFrame (mặc định <thư mục project>/.cache/kcn_dataset);
+                             mỗi file Excel một bộ file riêng theo hash đường dẫn:
+                             <tiền tố>_<hash>.json meta + .feather / .pkl; rỗng = không lưu
+  - KCN_COORD_CACHE_PATH : file cache kết quả ghép tọa độ
+                           (mặc định <thư mục project>/.cache/kcn_coordinates.json, rỗng = không lưu)
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# pyarrow (tuỳ chọn): cache DataFrame dạng Feather; không có thì dùng pickle
+try:
+    import pyarrow
+except Exception:
+    pyarrow = None
+
+# RapidFuzz (khuyến nghị). Nếu không có sẽ dùng fallback match cơ bản.
+try:
+    from rapidfuzz import fuzz, process
+except Exception:
+    fuzz = None
+    process = None
+
+# Thư mục project: file cache mặc định không phụ thuộc thư mục chạy process
+_BASE_DIR = Path(__file__).resolve().parent.parent
+_CACHE_DIR = _BASE_DIR / ".cache"
+
+# Bảng bỏ dấu tiếng Việt: build MỘT lần cho cả module
+_VI_INTAB = "àáảãạăắằẳẵặâấầẩẫậèéẻẽẹêếềểễệìíỉĩịòóỏõọôốồổỗộơớờởỡợùúủũụưứừửữựỳýỷỹỵđ"
+_VI_OUTTAB = "aaaaaaaaaaaaaaaaaeeeeeeeeeeeiiiiiooooooooooooooooouuuuuuuuuuuyyyyyd"
+_VI_TRANSTAB = str.maketrans(_VI_INTAB + _VI_INTAB.upper(), _VI_OUTTAB + _VI_OUTTAB.upper())
+
+
+def normalize_text(text: str) -> str:
+    """Bỏ dấu + lower + strip (cùng kết quả với ExcelQueryHandler._normalize_text)."""
+    return str(text).translate(_VI_TRANSTAB).lower().strip()
+
+
+def normalize_series(series: pd.Series) -> pd.Series:
+    """normalize_text cho cả cột, dùng .str (không apply từng dòng)."""
+    return series.astype(str).str.lower().str.translate(_VI_TRANSTAB).str.lower().str.strip()
+
+
+# Cột tính thêm vào DataFrame (add_derived_columns) + Series chuẩn hoá lưu kèm trong cache
+_DERIVED_COLUMNS = ("Loại_norm", "Tên_norm", "Price_num", "Area_num")
+_CACHED_SERIES = ("name_norm", "province_lower", "type_upper")
+_FRAME_CACHE_VERSION = 1  # tăng khi đổi cách chuẩn hoá / parse -> cache cũ bị bỏ qua
+
+
+# ==========================================================
+# PARSE GIÁ / DIỆN TÍCH (text -> số)
+# ==========================================================
+def parse_price(value) -> Optional[float]:
+    """
+    Chuyển đổi giá thuê đất sang số float.
+    VD: "120 USD/m2/năm" -> 120.0
+        "80 - 100 USD" -> 90.0
+    """
+    if pd.isna(value):
+        return None
+
+    s = str(value).lower().strip()
+
+    # Loại bỏ các đơn vị thường gặp
+    for word in ["usd/m²/năm", "usd/m2/năm", "usd", "/m2", "/năm", "m2"]:
+        s = s.replace(word, "")
+    s = s.strip()
+
+    # Khoảng giá (VD: "80-100") -> lấy trung bình
+    if "-" in s:
+        try:
+            parts = s.split("-")
+            return (float(parts[0]) + float(parts[1])) / 2
+        except Exception:
+            return None
+
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+def parse_area(value) -> Optional[float]:
+    """
+    Chuyển đổi diện tích sang số float.
+    VD: "500 ha" -> 500.0, "1,5 ha" -> 1.5
+    """
+    if pd.isna(value):
+        return None
+
+    s = str(value).lower().strip()
+    s = s.replace("ha", "").replace("hecta", "").replace(",", ".").strip()
+
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Thêm Loại_norm / Tên_norm / Price_num / Area_num (tại chỗ) cho excel_visualize."""
+    if df.empty:
+        return df
+
+    df["Loại_norm"] = df["Loại"].astype(str).str.lower().str.strip() if "Loại" in df.columns else "khu công nghiệp"
+    df["Tên_norm"] = df["Tên"].astype(str).str.lower().str.strip() if "Tên" in df.columns else ""
+    df["Price_num"] = df["Giá thuê đất"].apply(parse_price) if "Giá thuê đất" in df.columns else None
+    df["Area_num"] = df["Tổng diện tích"].apply(parse_area) if "Tổng diện tích" in df.columns else None
+    return df
+
+
+# ==========================================================
+# DATASET (một file Excel)
+# ==========================================================
+class KCNDataset:
+    def __init__(self, excel_path: str):
+        self.excel_path = excel_path
+        self.df: Optional[pd.DataFrame] = None
+
+        # Khai báo các cột cần thiết (nhận diện trên cột gốc của file)
+        self.columns_map: Dict[str, Optional[str]] = {
+            "province": None,
+            "type": None,  # Cột Loại (KCN/CCN)
+            "name": None,
+            "address": None,
+            "operation_time": None,
+            "area": None,
+            "rental_price": None,
+            "industry": None
+        }
+
+        # Cột đã chuẩn hoá (cùng index với df)
+        self.name_norm: Optional[pd.Series] = None       # tên bỏ dấu, lower
+        self.province_lower: Optional[pd.Series] = None  # tỉnh lower (giữ dấu)
+        self.type_upper: Optional[pd.Series] = None      # KCN / CCN
+
+        # Inverted index (giá trị chuẩn hoá -> vị trí dòng, tăng dần)
+        self.province_index: Dict[str, List[int]] = {}
+        self.type_index: Dict[str, List[int]] = {}
+        self.name_index: Dict[str, List[int]] = {}
+        self.name_token_index: Dict[str, set] = {}  # token -> các tên chuẩn hoá chứa token
+        self.short_names: List[str] = []             # tên <= 2 token (không lọc được bằng token)
+
+        self.provinces: List[str] = []
+
+        # (geojson_path, match_threshold) -> tọa độ đã ghép
+        self._geo: Dict[Tuple[Optional[str], int], "KCNCoordinates"] = {}
+        self._geo_lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        """Load file Excel (hoặc cache đã chuẩn hoá), nhận diện cột, chuẩn hoá + index + cột số liệu."""
+        try:
+            df = self._read_frame_cache()
+            from_cache = df is not None
+            if df is None:
+                df = pd.read_excel(self.excel_path)
+                df.columns = df.columns.str.strip()
+
+            # Cột chuẩn hoá lưu kèm trong cache ("__name_norm"...) -> tách ra khỏi DataFrame
+            cached_series = {attr: df.pop(f"__{attr}") for attr in _CACHED_SERIES if f"__{attr}" in df.columns}
+            self._detect_columns([c for c in df.columns if c not in _DERIVED_COLUMNS])
+
+            if from_cache:
+                self.df = df
+                for attr, series in cached_series.items():
+                    setattr(self, attr, series)
+                self._build_lookup_indexes()
+            else:
+                # Cột tính thêm: sau khi nhận diện để không lẫn với cột gốc ("Loại_norm"...)
+                self.df = add_derived_columns(df)
+                self._build_normalized_columns()
+                self._write_frame_cache()
+
+            if self.columns_map["province"] is not None:
+                self.provinces = self.df[self.columns_map["province"]].dropna().unique().tolist()
+
+            print(f"✅ Đã load Excel: {len(self.df)} bản ghi" + (" (từ cache)" if from_cache else ""))
+            print("🧭 Cấu trúc cột nhận diện được:")
+            for key, val in self.columns_map.items():
+                print(f"   - {key}: {val}")
+
+        except Exception as e:
+            print(f"❌ Lỗi khi load Excel: {e}")
+            self.df = None
+
+    def _detect_columns(self, columns: List[str]):
+        """Tự động phát hiện các cột quan trọng (theo tên cột gốc của file)."""
+        for col in columns:
+            col_lower = col.lower()
+            if any(k in col_lower for k in ["tỉnh", "thành phố", "province"]):
+                self.columns_map["province"] = col
+            elif any(k in col_lower for k in ["loại", "loai", "type"]):
+                self.columns_map["type"] = col
+            elif any(k in col_lower for k in ["tên", "ten", "kcn", "ccn"]) and "loại" not in col_lower:
+                self.columns_map["name"] = col
+            elif any(k in col_lower for k in ["địa chỉ", "dia chi", "address"]):
+                self.columns_map["address"] = col
+            elif any(k in col_lower for k in ["thời gian", "vận hành", "operation"]):
+                self.columns_map["operation_time"] = col
+            elif any(k in col_lower for k in ["diện tích", "dien tich", "area"]):
+                self.columns_map["area"] = col
+            elif any(k in col_lower for k in ["giá thuê", "gia thue", "rent", "rental"]):
+                self.columns_map["rental_price"] = col
+            elif any(k in col_lower for k in ["ngành nghề", "nganh nghe", "industry"]):
+                self.columns_map["industry"] = col
+
+    # ==========================================================
+    # CACHE DATAFRAME ĐÃ CHUẨN HOÁ TRÊN ĐĨA
+    # ==========================================================
+    def _frame_cache_paths(self) -> Optional[Tuple[Path, Path, Path]]:
+        """
+        (file meta, file Feather, file pickle) riêng cho file Excel này (tên theo hash
+        đường dẫn tuyệt đối, nhiều workbook không ghi đè cache của nhau);
+        None nếu tắt bằng KCN_DATASET_CACHE_PATH rỗng.
+        """
+        prefix = os.getenv("KCN_DATASET_CACHE_PATH", str(_CACHE_DIR / "kcn_dataset")).strip()
+        if not prefix:
+            return None
+        prefix += "_" + hashlib.sha256(_resolve(self.excel_path).encode("utf-8")).hexdigest()[:16]
+        return Path(prefix + ".json"), Path(prefix + ".feather"), Path(prefix + ".pkl")
+
+    def _source_signature(self) -> Dict[str, Any]:
+        st = os.stat(self.excel_path)
+        return {"source": _resolve(self.excel_path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    def _source_sha256(self) -> str:
+        return hashlib.sha256(Path(self.excel_path).read_bytes()).hexdigest()
+
+    def _read_frame_cache(self) -> Optional[pd.DataFrame]:
+        """
+        DataFrame đã chuẩn hoá từ cache nếu còn khớp file Excel:
+        cùng mtime + kích thước, hoặc mtime đổi nhưng nội dung (sha256) vẫn giống.
+        """
+        paths = self._frame_cache_paths()
+        if paths is None or not paths[0].exists():
+            return None
+        meta_path, feather_path, pickle_path = paths
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != _FRAME_CACHE_VERSION:
+                return None
+
+            signature = self._source_signature()
+            if meta.get("source") != signature["source"]:
+                return None
+            same_stat = meta.get("mtime_ns") == signature["mtime_ns"] and meta.get("size") == signature["size"]
+            if not same_stat and meta.get("sha256") != self._source_sha256():
+                return None
+
+            if meta.get("format") == "feather":
+                df = pd.read_feather(feather_path)
+            else:
+                df = pd.read_pickle(pickle_path)
+
+            if not same_stat:
+                # File chỉ được "touch": cập nhật mtime để lần sau không phải hash lại
+                self._write_json_atomic(meta_path, {**meta, **signature})
+            return df
+        except Exception as e:
+            print(f"⚠️ Không đọc được cache dữ liệu KCN/CCN ({meta_path}): {e}")
+            return None
+
+    def _write_frame_cache(self):
+        """Lưu DataFrame + cột chuẩn hoá: Feather nếu có pyarrow, không được thì pickle."""
+        paths = self._frame_cache_paths()
+        if paths is None:
+            return
+        meta_path, feather_path, pickle_path = paths
+
+        frame = self.df.copy()
+        for attr in _CACHED_SERIES:
+            series = getattr(self, attr)
+            if series is not None:
+                frame[f"__{attr}"] = series
+
+        try:
+            meta_path.parent.mkdir(parents=True, exist_ok=True)
+            fmt = None
+            if pyarrow is not None:
+                try:
+                    tmp = feather_path.with_suffix(feather_path.suffix + ".tmp")
+                    frame.reset_index(drop=True).to_feather(tmp)
+                    os.replace(tmp, feather_path)
+                    fmt = "feather"
+                except Exception as e:
+                    # Cột object lẫn kiểu (số + chữ) không chuyển được sang Arrow
+                    print(f"⚠️ Không ghi được Feather, dùng pickle: {e}")
+            if fmt is None:
+                tmp = pickle_path.with_suffix(pickle_path.suffix + ".tmp")
+                frame.to_pickle(tmp)
+                os.replace(tmp, pickle_path)
+                fmt = "pickle"
+
+            meta = {"version": _FRAME_CACHE_VERSION, "format": fmt, "sha256": self._source_sha256(), **self._source_signature()}
+            self._write_json_atomic(meta_path, meta)
+            print(f"✅ Đã lưu cache dữ liệu KCN/CCN ({fmt}): {meta_path}")
+        except Exception as e:
+            print(f"⚠️ Không ghi được cache dữ liệu KCN/CCN ({meta_path}): {e}")
+
+    @staticmethod
+    def _write_json_atomic(path: Path, data: Dict[str, Any]):
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _build_normalized_columns(self):
+        """Chuẩn hoá cột tên / tỉnh / loại một lần để truy vấn không phải apply từng dòng."""
+        cols = self.columns_map
+        if cols["name"] is not None:
+            self.name_norm = normalize_series(self.df[cols["name"]])
+        if cols["province"] is not None:
+            self.province_lower = self.df[cols["province"]].astype(str).str.lower()
+        if cols["type"] is not None:
+            self.type_upper = self.df[cols["type"]].astype(str).str.strip().str.upper()
+        self._build_lookup_indexes()
+
+    def _build_lookup_indexes(self):
+        """province / type / name / token của name -> danh sách vị trí dòng (iloc)."""
+        def positions_by_value(series: Optional[pd.Series]) -> Dict[str, List[int]]:
+            index: Dict[str, List[int]] = {}
+            if series is not None:
+                for pos, value in enumerate(series.tolist()):
+                    index.setdefault(value, []).append(pos)
+            return index
+
+        self.province_index = positions_by_value(self.province_lower)
+        self.type_index = positions_by_value(self.type_upper)
+        self.name_index = positions_by_value(self.name_norm)
+
+        self.name_token_index = {}
+        self.short_names = []
+        for name in self.name_index:
+            tokens = name.split()
+            for token in tokens:
+                self.name_token_index.setdefault(token, set()).add(name)
+            if len(tokens) <= 2:
+                self.short_names.append(name)
+
+    def row_dicts(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Các dòng của df dạng dict, chỉ gồm các cột đã nhận diện trong columns_map."""
+        used = [c for c in dict.fromkeys(self.columns_map.values()) if c is not None and c in df.columns]
+        # Tương đương df[used].to_dict("records") nhưng nhanh hơn nhiều (tolist theo cột rồi zip)
+        return [dict(zip(used, values)) for values in zip(*(df[c].tolist() for c in used))]
+
+    def geo(self, geojson_path: Optional[str] = None, match_threshold: int = 82) -> "KCNCoordinates":
+        """Tọa độ ghép với một file GeoJSON, tính một lần cho mỗi (file, ngưỡng match)."""
+        key = (_resolve(geojson_path) if geojson_path else None, match_threshold)
+        coords = self._geo.get(key)
+        if coords is None:
+            with self._geo_lock:
+                coords = self._geo.get(key)
+                if coords is None:
+                    coords = KCNCoordinates(self, geojson_path, match_threshold)
+                    self._geo[key] = coords
+        return coords
+
+
+# ==========================================================
+# TỌA ĐỘ (Excel <-> industrial_zones.geojson)
+# ==========================================================
+class KCNCoordinates:
+    def __init__(self, dataset: KCNDataset, geojson_path: Optional[str] = None, match_threshold: int = 82):
+        self.dataset = dataset
+        self.geojson_path = geojson_path
+        self.match_threshold = match_threshold
+
+        # Index map toạ độ: name_norm -> [lng, lat]
+        self.iz_name_to_coord: Dict[str, List[float]] = {}
+        self.iz_names_original: List[str] = []
+        self.iz_names_norm: List[str] = []
+
+        # Tên KCN/CCN trong Excel -> tọa độ đã ghép (None = không match được)
+        self.coord_by_name: Dict[str, Optional[List[float]]] = {}
+
+        # Bản ghi "data[i]" của từng dòng (đã gắn tọa độ) + JSON tương ứng
+        self.data_records: Optional[List[Dict[str, Any]]] = None
+        self.data_json: List[str] = []
+
+        self._load_geojson_if_provided()
+        self._join_coordinates()
+        self._build_row_cache()
+
+    def _load_geojson_if_provided(self):
+        """
+        Load GeoJSON nếu có path.
+        Kết quả: map name_norm -> [lng, lat]
+        """
+        if not self.geojson_path:
+            return
+
+        p = Path(self.geojson_path)
+        if not p.exists():
+            print(f"⚠️ GeoJSON không tồn tại: {self.geojson_path} (bỏ qua gắn tọa độ)")
+            return
+
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                gj = json.load(f)
+
+            for fe in gj.get("features", []) or []:
+                props = fe.get("properties", {}) or {}
+                geom = fe.get("geometry", {}) or {}
+                coords = geom.get("coordinates")
+
+                name = str(props.get("name", "")).strip()
+                if not name:
+                    continue
+
+                # Chỉ hỗ trợ Point [lng, lat]
+                if isinstance(coords, list) and len(coords) == 2 and all(isinstance(x, (int, float)) for x in coords):
+                    n = normalize_text(name)
+                    self.iz_name_to_coord[n] = [float(coords[0]), float(coords[1])]
+                    self.iz_names_original.append(name)
+                    self.iz_names_norm.append(n)
+
+            print(f"✅ Đã load GeoJSON IZ: {len(self.iz_name_to_coord)} điểm có tọa độ")
+
+        except Exception as e:
+            print(f"⚠️ Lỗi load GeoJSON: {e}. (bỏ qua gắn tọa độ)")
+
+    def match(self, zone_name: str) -> Optional[List[float]]:
+        """
+        Trả về [lng, lat] nếu match được tên zone trong GeoJSON.
+        """
+        if not zone_name or not self.iz_name_to_coord:
+            return None
+
+        z_norm = normalize_text(zone_name)
+
+        # 1) exact match normalized
+        if z_norm in self.iz_name_to_coord:
+            return self.iz_name_to_coord[z_norm]
+
+        # 2) fuzzy match nếu có rapidfuzz
+        if process is not None and fuzz is not None and self.iz_names_original:
+            result = process.extractOne(zone_name, self.iz_names_original, scorer=fuzz.WRatio)
+            if result and result[1] >= self.match_threshold:
+                return self.iz_name_to_coord.get(normalize_text(result[0]))
+
+        # 3) fallback: contains match normalized (thô)
+        for n, coord in self.iz_name_to_coord.items():
+            if n and (n in z_norm or z_norm in n):
+                return coord
+
+        return None
+
+    def _source_fingerprint(self) -> str:
+        """sha256 nội dung file Excel + GeoJSON (+ cấu hình match): đổi nguồn -> ghép lại."""
+        h = hashlib.sha256()
+        for path in (self.dataset.excel_path, self.geojson_path):
+            if path and Path(path).exists():
+                h.update(Path(path).read_bytes())
+            h.update(b"\0")
+        h.update(f"{self.match_threshold}|{process is not None}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _join_coordinates(self):
+        """
+        Tên từng KCN/CCN -> tọa độ, tính một lần (exact -> fuzzy -> contains như
+        match()) rồi lưu file cache; các lần start sau chỉ đọc lại.
+        """
+        df, name_col = self.dataset.df, self.dataset.columns_map["name"]
+        if df is None or name_col is None:
+            return
+
+        names = list(dict.fromkeys(str(n).strip() for n in df[name_col].tolist()))
+        if not self.iz_name_to_coord:
+            self.coord_by_name = {n: None for n in names}
+            return
+
+        cache_path = os.getenv("KCN_COORD_CACHE_PATH", str(_CACHE_DIR / "kcn_coordinates.json")).strip()
+        fingerprint = self._source_fingerprint() if cache_path else ""
+        if cache_path and Path(cache_path).exists():
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                coords = cached.get("coordinates") or {}
+                if cached.get("fingerprint") == fingerprint and all(n in coords for n in names):
+                    self.coord_by_name = coords
+                    print(f"✅ Đã đọc tọa độ KCN/CCN từ cache: {cache_path}")
+                    return
+            except Exception as e:
+                print(f"⚠️ Không đọc được cache tọa độ {cache_path}: {e}")
+
+        self.coord_by_name = {n: (self.match(n) if n else None) for n in names}
+        matched = sum(1 for c in self.coord_by_name.values() if c is not None)
+        print(f"✅ Đã ghép tọa độ: {matched}/{len(names)} tên KCN/CCN")
+
+        if cache_path:
+            try:
+                path = Path(cache_path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(path.suffix + ".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"fingerprint": fingerprint, "coordinates": self.coord_by_name}, f, ensure_ascii=False)
+                os.replace(tmp, path)
+            except Exception as e:
+                print(f"⚠️ Không ghi được cache tọa độ {cache_path}: {e}")
+
+    def coordinates_for(self, zone_name: str) -> Optional[List[float]]:
+        """Tọa độ [lng, lat] của một KCN/CCN: tra kết quả ghép sẵn, tên lạ mới match lại."""
+        name = str(zone_name).strip() if zone_name else ""
+        if name in self.coord_by_name:
+            return self.coord_by_name[name]
+        return self.match(name)
+
+    def make_data_record(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Một dòng Excel (dict cột -> giá trị) -> phần tử data[i] của JSON trả về."""
+        cols = self.dataset.columns_map
+        name_val = str(row.get(cols["name"], "")).strip()
+        return {
+            "Tỉnh/Thành phố": str(row.get(cols["province"], "")),
+            "Loại": str(row.get(cols["type"], "")),
+            "Tên": name_val,
+            "Địa chỉ": str(row.get(cols["address"], "")),
+            "Thời gian vận hành": str(row.get(cols["operation_time"], "")),
+            "Tổng diện tích": str(row.get(cols["area"], "")),
+            "Giá thuê đất": str(row.get(cols["rental_price"], "")),
+            "Ngành nghề": str(row.get(cols["industry"], "")),
+            # ✅ BỔ SUNG TỌA ĐỘ
+            "coordinates": self.coordinates_for(name_val)
+        }
+
+    def _build_row_cache(self):
+        """Tính sẵn data[i] (kèm tọa độ) và JSON của từng dòng."""
+        if self.dataset.df is None:
+            return
+        self.data_records = [self.make_data_record(row) for row in self.dataset.row_dicts(self.dataset.df)]
+        self.data_json = [json.dumps(r, ensure_ascii=False) for r in self.data_records]
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_datasets: Dict[str, KCNDataset] = {}
+_datasets_lock = threading.Lock()
+
+
+def _resolve(path: str) -> str:
+    return str(Path(path).resolve())
+
+
+def get_kcn_dataset(excel_path: str) -> KCNDataset:
+    """Dataset dùng chung cho một file Excel (đọc file đúng một lần mỗi process)."""
+    key = _resolve(excel_path)
+    dataset = _datasets.get(key)
+    if dataset is None:
+        with _datasets_lock:
+            dataset = _datasets.get(key)
+            if dataset is None:
+                dataset = KCNDataset(excel_path)
+                _datasets[key] = dataset
+    return dataset
@@ -8,14 +8,28 @@ về số lượng hoặc danh sách khu/cụm công nghiệp.
 - Trả JSON có thêm:
     - data[i]["coordinates"] = [lng, lat] (nếu match được)
     - not_found_coordinates: danh sách tên không match được tọa độ
+- Ghép tọa độ Excel <-> GeoJSON MỘT lần khi load (lưu file cache theo hash
+  hai file nguồn); dòng không ghép được xem qua coordinate_diagnostics()
+- Excel / GeoJSON chỉ load một lần cho cả process (excel_query.dataset),
+  mọi ExcelQueryHandler và excel_visualize dùng chung
+
+ENV (tuỳ chọn):
+  - KCN_COORD_CACHE_PATH : file cache kết quả ghép tọa độ (xem excel_query.dataset)
+  - KCN_RULE_ANALYSIS_ENABLED : phân tích câu hỏi rõ ràng bằng luật, không gọi LLM
+                                (mặc định 1)
 """
 
+import os
 import pandas as pd
 import re
 import json
+import threading
 from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 
+from excel_query.analysis_cache import data_version, get_query_analysis_cache
+from excel_query.dataset import get_kcn_dataset, normalize_text
+
 # RapidFuzz (khuyến nghị). Nếu không có sẽ dùng fallback match cơ bản.
 try:
     from rapidfuzz import fuzz, process
@@ -23,6 +37,99 @@ except Exception:
     fuzz = None
     process = None
 
+# Phần hướng dẫn cố định của prompt phân tích câu hỏi KCN/CCN (_analyze_query_with_llm)
+_ANALYSIS_INSTRUCTIONS = """NHIỆM VỤ: Phân tích CÂU HỎI NGƯỜI DÙNG (ở cuối) và trả về JSON với các thông tin sau:
+
+1. "is_industrial_query": true/false
+   - true nếu câu hỏi về khu công nghiệp (KCN) hoặc cụm công nghiệp (CCN)
+   - false nếu không liên quan
+
+2. "search_type": "province" hoặc "specific_name"
+   - "province" nếu người dùng hỏi về KCN/CCN trong một tỉnh/thành phố
+   - "specific_name" nếu người dùng hỏi về một KCN/CCN cụ thể theo tên
+
+3. "province": tên tỉnh/thành phố (chỉ khi search_type = "province")
+   - Trích xuất tên tỉnh từ câu hỏi
+   - Phải khớp CHÍNH XÁC với một trong các tỉnh trong danh sách
+   - Trả về null nếu không tìm thấy hoặc không khớp
+
+4. "specific_name": tên KCN/CCN cụ thể (chỉ khi search_type = "specific_name")
+   - Trích xuất tên KCN/CCN từ câu hỏi
+   - Bao gồm cả từ khóa "KHU CÔNG NGHIỆP" hoặc "CỤM CÔNG NGHIỆP" nếu có
+
+5. "query_type": loại truy vấn - QUAN TRỌNG: PHÂN BIỆT RÕ RÀNG
+   - "KCN" nếu câu hỏi CHỈ NHẮC ĐẾN "khu công nghiệp", "kcn", "khu cn", "khu" (và KHÔNG có "cụm")
+   - "CCN" nếu câu hỏi CHỈ NHẮC ĐẾN "cụm công nghiệp", "ccn", "cụm cn", "cụm" (và KHÔNG có "khu")
+   - null chỉ khi câu hỏi NHẮC ĐẾN CẢ HAI: "khu và cụm", "kcn và ccn", "khu công nghiệp và cụm công nghiệp"
+
+6. "confidence": độ tin cậy (0.0-1.0)
+   - Mức độ chắc chắn về phân tích
+
+7. "reasoning": lý do phân tích
+   - Giải thích ngắn gọn tại sao phân tích như vậy
+
+QUAN TRỌNG - PHÂN BIỆT QUERY_TYPE:
+- Nếu câu hỏi chỉ có "khu" hoặc "kcn" (và KHÔNG có "cụm") → query_type = "KCN"
+- Nếu câu hỏi chỉ có "cụm" hoặc "ccn" (và KHÔNG có "khu") → query_type = "CCN"  
+- Nếu câu hỏi có cả "khu" và "cụm" → query_type = null
+- "công nghiệp" không quyết định loại, chỉ có "khu" vs "cụm" mới quyết định
+- LUÔN LUÔN kiểm tra xem câu hỏi có cả "khu" và "cụm" không trước khi quyết định
+- Ví dụ: "cụm công nghiệp ở Vĩnh Long" → chỉ có "cụm", không có "khu" → query_type = "CCN"
+- Ví dụ: "khu công nghiệp ở Hà Nội" → chỉ có "khu", không có "cụm" → query_type = "KCN"
+
+BƯỚC PHÂN TÍCH QUERY_TYPE:
+1. Tìm từ "khu" hoặc "kcn" trong câu hỏi → has_khu = true/false
+2. Tìm từ "cụm" hoặc "ccn" trong câu hỏi → has_cum = true/false  
+3. Nếu has_khu = true và has_cum = true → query_type = null
+4. Nếu has_khu = true và has_cum = false → query_type = "KCN"
+5. Nếu has_khu = false và has_cum = true → query_type = "CCN"
+6. Nếu has_khu = false và has_cum = false → query_type = null
+
+VÍ DỤ SEARCH_TYPE = "province":
+- "khu công nghiệp ở Hà Nội" → {"query_type": "KCN", "reasoning": "Chỉ hỏi về KHU công nghiệp, không nhắc đến cụm"}
+- "cụm công nghiệp ở Bình Dương" → {"query_type": "CCN", "reasoning": "Chỉ hỏi về CỤM công nghiệp, không nhắc đến khu"}
+- "khu và cụm công nghiệp ở Đà Nẵng" → {"query_type": null, "reasoning": "Hỏi về CẢ HAI khu và cụm"}
+- "danh sách cụm công nghiệp ở Bình Dương" → {"query_type": "CCN", "reasoning": "Chỉ hỏi về CỤM công nghiệp, không nhắc đến khu"}
+- "vẽ biểu đồ cụm công nghiệp ở Hải Phòng" → {"query_type": "CCN", "reasoning": "Chỉ hỏi về CỤM công nghiệp, không nhắc đến khu"}
+
+VÍ DỤ SEARCH_TYPE = "specific_name":
+- "cho tôi thông tin về KHU CÔNG NGHIỆP NGŨ LẠC - VĨNH LONG" → {"query_type": "KCN", "reasoning": "Tìm KCN cụ thể"}
+- "thông tin về cụm công nghiệp ABC" → {"query_type": "CCN", "reasoning": "Tìm CCN cụ thể"}
+"""
+
+
+# ==========================================================
+# ⚡ PHÂN TÍCH CÂU HỎI BẰNG LUẬT (trên text đã bỏ dấu, lower)
+# ==========================================================
+# Tên gọi khác của tỉnh/thành -> tên chuẩn hoá (bỏ dấu, bỏ "tp") của tỉnh trong dữ liệu.
+# Chỉ giữ alias không nhập nhằng (bỏ các viết tắt 2 chữ như "na", "la", "th").
+_PROVINCE_ALIASES = {
+    "ho chi minh": ["hcm", "tphcm", "tp hcm", "sai gon", "saigon"],
+    "ha noi": ["hanoi"],
+    "hai phong": ["haiphong"],
+    "da nang": ["danang"],
+    "can tho": ["cantho"],
+    "ba ria vung tau": ["brvt", "vung tau", "ba ria"],
+    "thua thien hue": ["hue"],
+    "dak lak": ["daklak", "dac lac"],
+}
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+_KHU_RE = re.compile(r"\bkcn\b|\bkhu (?:cong nghiep|cn)\b|\bkhu (?:va|hoac) cum\b")
+_CUM_RE = re.compile(r"\bccn\b|\bcum (?:cong nghiep|cn)\b|\bkhu (?:va|hoac) cum\b")
+# Từ "đệm" của câu hỏi liệt kê theo tỉnh; còn từ khác (tên riêng, "thông tin về"...) -> để LLM
+_LIST_FILLER_WORDS = frozenset(
+    "danh sach liet ke cac nhung o tai trong tren dia ban tinh thanh pho tp co bao nhieu "
+    "cho toi minh xem nao va hoac khu cum cong nghiep kcn ccn cn tat ca so luong hay tim "
+    "cua list gom hien nay la"
+    .split()
+)
+
+
+def _rule_text(text: str) -> str:
+    """Bỏ dấu, lower, thay ký tự không phải chữ/số bằng một khoảng trắng."""
+    return _NON_WORD_RE.sub(" ", normalize_text(text)).strip()
+
 
 class ExcelQueryHandler:
     def __init__(
@@ -51,117 +158,173 @@ class ExcelQueryHandler:
         self.match_threshold = match_threshold
         self.geojson_path = geojson_path
 
-        # Lưu index map toạ độ: name_norm -> [lng, lat]
-        self._iz_name_to_coord: Dict[str, List[float]] = {}
-        self._iz_names_original: List[str] = []
-        self._iz_names_norm: List[str] = []
-
-        # Khai báo các cột cần thiết
-        self.columns_map = {
-            "province": None,
-            "type": None,  # Cột Loại (KCN/CCN)
-            "name": None,
-            "address": None,
-            "operation_time": None,
-            "area": None,
-            "rental_price": None,
-            "industry": None
-        }
+        # Danh sách tỉnh + phần tĩnh của prompt phân tích, build một lần mỗi lần load dữ liệu
+        self._available_provinces: List[str] = []
+        self._analysis_prompt_prefix: str = ""
+
+        # Gazetteer cho phân tích bằng luật: (tên/alias đã chuẩn hoá, tên tỉnh trong dữ liệu),
+        # sắp theo độ dài giảm dần; cùng bộ đếm tỉ lệ bỏ qua LLM
+        self._province_gazetteer: List[Tuple[str, str]] = []
+        self._rule_analysis_enabled = os.getenv("KCN_RULE_ANALYSIS_ENABLED", "1").strip().lower() not in {"0", "false", "no", "off"}
+        self._analysis_counts = {"rule_based": 0, "cached": 0, "llm": 0, "fallback": 0}
+        self._analysis_counts_lock = threading.Lock()
+
+        # Cache kết quả phân tích LLM (dùng chung cả process), key theo phiên bản dữ liệu
+        self._analysis_cache = get_query_analysis_cache()
+        self._analysis_version = ""
+
+        # Excel đã load + chuẩn hoá + tọa độ đã ghép: dùng chung cả process (excel_query.dataset)
+        self._dataset = get_kcn_dataset(excel_path)
+        self._coords = self._dataset.geo(geojson_path, match_threshold)
+        self._attach_dataset()
 
-        self._load_excel()
-        self._load_geojson_if_provided()
+        self._build_analysis_prompt()
 
     # ==========================================================
-    # 🧩 LOAD FILE EXCEL & NHẬN DIỆN CỘT
+    # 🧩 DỮ LIỆU EXCEL + GEOJSON (DÙNG CHUNG CẢ PROCESS)
     # ==========================================================
-    def _load_excel(self):
-        """Load file Excel và tự động phát hiện các cột quan trọng"""
-        try:
-            self.df = pd.read_excel(self.excel_path)
-            self.df.columns = self.df.columns.str.strip()
-
-            for col in self.df.columns:
-                col_lower = col.lower()
-                if any(k in col_lower for k in ["tỉnh", "thành phố", "province"]):
-                    self.columns_map["province"] = col
-                elif any(k in col_lower for k in ["loại", "loai", "type"]):
-                    self.columns_map["type"] = col
-                elif any(k in col_lower for k in ["tên", "ten", "kcn", "ccn"]) and "loại" not in col_lower:
-                    self.columns_map["name"] = col
-                elif any(k in col_lower for k in ["địa chỉ", "dia chi", "address"]):
-                    self.columns_map["address"] = col
-                elif any(k in col_lower for k in ["thời gian", "vận hành", "operation"]):
-                    self.columns_map["operation_time"] = col
-                elif any(k in col_lower for k in ["diện tích", "dien tich", "area"]):
-                    self.columns_map["area"] = col
-                elif any(k in col_lower for k in ["giá thuê", "gia thue", "rent", "rental"]):
-                    self.columns_map["rental_price"] = col
-                elif any(k in col_lower for k in ["ngành nghề", "nganh nghe", "industry"]):
-                    self.columns_map["industry"] = col
-
-            print(f"✅ Đã load Excel: {len(self.df)} bản ghi")
-            print("🧭 Cấu trúc cột nhận diện được:")
-            for key, val in self.columns_map.items():
-                print(f"   - {key}: {val}")
-
-        except Exception as e:
-            print(f"❌ Lỗi khi load Excel: {e}")
-            self.df = None
+    def _attach_dataset(self):
+        """Trỏ các thuộc tính của handler vào dataset dùng chung (không copy, KHÔNG sửa tại chỗ)."""
+        ds, coords = self._dataset, self._coords
+        self.df = ds.df
+        self.columns_map = ds.columns_map
+
+        # Cột đã chuẩn hoá, tính một lần khi load (cùng index với self.df)
+        self._name_norm = ds.name_norm            # tên bỏ dấu, lower
+        self._province_lower = ds.province_lower  # tỉnh lower (giữ dấu)
+        self._type_upper = ds.type_upper          # KCN / CCN
+
+        # Inverted index (giá trị chuẩn hoá -> vị trí dòng, tăng dần) để truy vấn
+        # không phải quét toàn bộ cột
+        self._province_index = ds.province_index
+        self._type_index = ds.type_index
+        self._name_index = ds.name_index
+        self._name_token_index = ds.name_token_index  # token -> các tên chuẩn hoá chứa token
+        self._short_names = ds.short_names            # tên <= 2 token (không lọc được bằng token)
+
+        # Index map toạ độ GeoJSON (name_norm -> [lng, lat]) + tên KCN/CCN -> tọa độ đã ghép
+        self._iz_name_to_coord = coords.iz_name_to_coord
+        self._coord_by_name = coords.coord_by_name
+
+        # Bản ghi "data[i]" của từng dòng (đã gắn tọa độ) + JSON tương ứng.
+        # Dùng chung giữa các request: KHÔNG sửa tại chỗ.
+        self._data_records = coords.data_records
+        self._data_json = coords.data_json
+
+    def _rows(self, positions) -> pd.DataFrame:
+        """DataFrame các dòng theo vị trí, giữ thứ tự gốc của file."""
+        return self.df.iloc[sorted(positions)]
 
     # ==========================================================
-    # 🗺️ LOAD GEOJSON (industrial_zones.geojson) để gắn tọa độ
+    # 🤖 PROMPT-BASED QUERY ANALYSIS
     # ==========================================================
-    def _load_geojson_if_provided(self):
-        """
-        Load GeoJSON nếu có path.
-        Kết quả: map name_norm -> [lng, lat]
-        """
-        if not self.geojson_path:
+    def _build_analysis_prompt(self):
+        """Danh sách tỉnh + tên mẫu + hướng dẫn: phần tĩnh của prompt, tính một lần cho mỗi lần load."""
+        if self.df is None or self.columns_map["province"] is None:
             return
 
-        p = Path(self.geojson_path)
-        if not p.exists():
-            print(f"⚠️ GeoJSON không tồn tại: {self.geojson_path} (bỏ qua gắn tọa độ)")
-            return
+        # Lấy danh sách tỉnh có trong dữ liệu
+        self._available_provinces = self._dataset.provinces
+        available_provinces_str = ", ".join(self._available_provinces)
 
-        try:
-            with open(p, "r", encoding="utf-8") as f:
-                gj = json.load(f)
+        # Lấy một số tên KCN/CCN mẫu để LLM hiểu format
+        sample_names = []
+        if self.columns_map["name"] is not None:
+            sample_names = self.df[self.columns_map["name"]].dropna().head(10).tolist()
+        sample_names_str = ", ".join(sample_names[:5]) if sample_names else "Không có dữ liệu mẫu"
 
-            features = gj.get("features", []) or []
-            name_to_coord: Dict[str, List[float]] = {}
+        self._analysis_prompt_prefix = f"""
+Bạn là chuyên gia phân tích câu hỏi về khu công nghiệp và cụm công nghiệp Việt Nam.
 
-            iz_names_original: List[str] = []
-            iz_names_norm: List[str] = []
+DANH SÁCH TỈNH/THÀNH PHỐ CÓ DỮ LIỆU:
+{available_provinces_str}
 
-            for fe in features:
-                props = fe.get("properties", {}) or {}
-                geom = fe.get("geometry", {}) or {}
-                coords = geom.get("coordinates")
+MỘT SỐ TÊN KCN/CCN MẪU:
+{sample_names_str}
 
-                name = str(props.get("name", "")).strip()
-                if not name:
-                    continue
+{_ANALYSIS_INSTRUCTIONS}"""
+
+        # Danh sách tỉnh / prompt đổi -> key phiên bản mới, phân tích cũ không còn khớp.
+        # Chỉ dọn bản ghi hết hạn: phiên bản khác có thể thuộc handler của file Excel khác.
+        self._analysis_version = data_version(self._analysis_prompt_prefix)
+        if self._analysis_cache is not None:
+            self._analysis_cache.purge_expired()
+
+        self._build_province_gazetteer()
+
+    def _build_province_gazetteer(self):
+        gazetteer: Dict[str, str] = {}
+        for province in self._available_provinces:
+            key = _rule_text(province)
+            gazetteer[key] = province
+            # "TP. Hồ Chí Minh" -> cũng nhận "ho chi minh", "thanh pho ho chi minh"
+            if key.startswith("tp "):
+                gazetteer[key[3:]] = province
+                gazetteer["thanh pho " + key[3:]] = province
+        for canonical, aliases in _PROVINCE_ALIASES.items():
+            province = gazetteer.get(canonical)
+            if province is not None:
+                for alias in aliases:
+                    gazetteer.setdefault(alias, province)
+        self._province_gazetteer = sorted(gazetteer.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+    def _count_analysis(self, kind: str):
+        with self._analysis_counts_lock:
+            self._analysis_counts[kind] += 1
+
+    def analysis_stats(self) -> Dict[str, Any]:
+        """Số lần phân tích theo từng cách + tỉ lệ câu hỏi không phải gọi LLM (luật hoặc cache)."""
+        with self._analysis_counts_lock:
+            counts = dict(self._analysis_counts)
+        bypassed = counts["rule_based"] + counts["cached"]
+        decided = bypassed + counts["llm"]
+        counts["bypass_rate"] = round(bypassed / decided, 4) if decided else 0.0
+        counts["rule_analysis_enabled"] = self._rule_analysis_enabled
+        return counts
+
+    def _rule_based_analysis(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Phân tích tất định cho câu hỏi rõ ràng, trả None nếu còn nhập nhằng (-> LLM):
+          - có khu/cụm, đúng MỘT tỉnh trong dữ liệu, phần còn lại chỉ là từ đệm
+            kiểu "danh sách ... ở ..." -> tìm theo tỉnh
+        Không có chiều ngược lại: câu hỏi không có từ khoá tiếng Việt/Anh (câu hỏi
+        tiếng Pháp, Hàn, Trung...) vẫn có thể là câu hỏi KCN/CCN -> để LLM quyết định.
+        """
+        text = _rule_text(question)
+        if not text:
+            return None
 
-                # Chỉ hỗ trợ Point [lng, lat] như file của bạn đang dùng
-                if isinstance(coords, list) and len(coords) == 2 and all(isinstance(x, (int, float)) for x in coords):
-                    n = self._normalize_text(name)
-                    name_to_coord[n] = [float(coords[0]), float(coords[1])]
-                    iz_names_original.append(name)
-                    iz_names_norm.append(n)
+        has_khu = bool(_KHU_RE.search(text))
+        has_cum = bool(_CUM_RE.search(text))
+        if not has_khu and not has_cum:
+            return None
 
-            self._iz_name_to_coord = name_to_coord
-            self._iz_names_original = iz_names_original
-            self._iz_names_norm = iz_names_norm
+        provinces = set()
+        remaining = f" {text} "
+        for key, province in self._province_gazetteer:
+            if f" {key} " in remaining:
+                provinces.add(province)
+                remaining = remaining.replace(f" {key} ", " ")
+        if len(provinces) != 1:
+            return None
+        if any(word not in _LIST_FILLER_WORDS for word in remaining.split()):
+            return None
 
-            print(f"✅ Đã load GeoJSON IZ: {len(self._iz_name_to_coord)} điểm có tọa độ")
+        if has_khu and has_cum:
+            query_type = None
+        else:
+            query_type = "KCN" if has_khu else "CCN"
 
-        except Exception as e:
-            print(f"⚠️ Lỗi load GeoJSON: {e}. (bỏ qua gắn tọa độ)")
+        return {
+            "is_industrial_query": True,
+            "search_type": "province",
+            "province": provinces.pop(),
+            "specific_name": None,
+            "query_type": query_type,
+            "confidence": 0.95,
+            "reasoning": "Rule-based: một tỉnh + từ khoá khu/cụm rõ ràng"
+        }
 
-    # ==========================================================
-    # 🤖 PROMPT-BASED QUERY ANALYSIS
-    # ==========================================================
     def _analyze_query_with_llm(self, question: str) -> Dict[str, Any]:
         """
         Sử dụng LLM để phân tích toàn bộ câu hỏi và trả về thông tin cần thiết
@@ -177,94 +340,31 @@ class ExcelQueryHandler:
                 "reasoning": str
             }
         """
-        if not self.llm or self.df is None:
+        # Câu hỏi rõ ràng (một tỉnh + khu/cụm) -> không gọi LLM
+        if self._rule_analysis_enabled and self._province_gazetteer:
+            result = self._rule_based_analysis(question)
+            if result is not None:
+                self._count_analysis("rule_based")
+                return result
+
+        if not self.llm or self.df is None or not self._analysis_prompt_prefix:
             # Fallback về keyword nếu không có LLM
+            self._count_analysis("fallback")
             return self._fallback_keyword_analysis(question)
-        
-        # Lấy danh sách tỉnh có trong dữ liệu
-        available_provinces = self.df[self.columns_map["province"]].dropna().unique().tolist()
-        available_provinces_str = ", ".join(available_provinces)
-        
-        # Lấy một số tên KCN/CCN mẫu để LLM hiểu format
-        sample_names = []
-        if self.columns_map["name"] is not None:
-            sample_names = self.df[self.columns_map["name"]].dropna().head(10).tolist()
-        sample_names_str = ", ".join(sample_names[:5]) if sample_names else "Không có dữ liệu mẫu"
-        
-        prompt = f"""
-Bạn là chuyên gia phân tích câu hỏi về khu công nghiệp và cụm công nghiệp Việt Nam.
-
-DANH SÁCH TỈNH/THÀNH PHỐ CÓ DỮ LIỆU:
-{available_provinces_str}
-
-MỘT SỐ TÊN KCN/CCN MẪU:
-{sample_names_str}
-
-CÂU HỎI NGƯỜI DÙNG: "{question}"
-
-NHIỆM VỤ: Phân tích câu hỏi và trả về JSON với các thông tin sau:
-
-1. "is_industrial_query": true/false
-   - true nếu câu hỏi về khu công nghiệp (KCN) hoặc cụm công nghiệp (CCN)
-   - false nếu không liên quan
-
-2. "search_type": "province" hoặc "specific_name"
-   - "province" nếu người dùng hỏi về KCN/CCN trong một tỉnh/thành phố
-   - "specific_name" nếu người dùng hỏi về một KCN/CCN cụ thể theo tên
-
-3. "province": tên tỉnh/thành phố (chỉ khi search_type = "province")
-   - Trích xuất tên tỉnh từ câu hỏi
-   - Phải khớp CHÍNH XÁC với một trong các tỉnh trong danh sách
-   - Trả về null nếu không tìm thấy hoặc không khớp
-
-4. "specific_name": tên KCN/CCN cụ thể (chỉ khi search_type = "specific_name")
-   - Trích xuất tên KCN/CCN từ câu hỏi
-   - Bao gồm cả từ khóa "KHU CÔNG NGHIỆP" hoặc "CỤM CÔNG NGHIỆP" nếu có
-
-5. "query_type": loại truy vấn - QUAN TRỌNG: PHÂN BIỆT RÕ RÀNG
-   - "KCN" nếu câu hỏi CHỈ NHẮC ĐẾN "khu công nghiệp", "kcn", "khu cn", "khu" (và KHÔNG có "cụm")
-   - "CCN" nếu câu hỏi CHỈ NHẮC ĐẾN "cụm công nghiệp", "ccn", "cụm cn", "cụm" (và KHÔNG có "khu")
-   - null chỉ khi câu hỏi NHẮC ĐẾN CẢ HAI: "khu và cụm", "kcn và ccn", "khu công nghiệp và cụm công nghiệp"
-
-6. "confidence": độ tin cậy (0.0-1.0)
-   - Mức độ chắc chắn về phân tích
-
-7. "reasoning": lý do phân tích
-   - Giải thích ngắn gọn tại sao phân tích như vậy
-
-QUAN TRỌNG - PHÂN BIỆT QUERY_TYPE:
-- Nếu câu hỏi chỉ có "khu" hoặc "kcn" (và KHÔNG có "cụm") → query_type = "KCN"
-- Nếu câu hỏi chỉ có "cụm" hoặc "ccn" (và KHÔNG có "khu") → query_type = "CCN"  
-- Nếu câu hỏi có cả "khu" và "cụm" → query_type = null
-- "công nghiệp" không quyết định loại, chỉ có "khu" vs "cụm" mới quyết định
-- LUÔN LUÔN kiểm tra xem câu hỏi có cả "khu" và "cụm" không trước khi quyết định
-- Ví dụ: "cụm công nghiệp ở Vĩnh Long" → chỉ có "cụm", không có "khu" → query_type = "CCN"
-- Ví dụ: "khu công nghiệp ở Hà Nội" → chỉ có "khu", không có "cụm" → query_type = "KCN"
-
-BƯỚC PHÂN TÍCH QUERY_TYPE:
-1. Tìm từ "khu" hoặc "kcn" trong câu hỏi → has_khu = true/false
-2. Tìm từ "cụm" hoặc "ccn" trong câu hỏi → has_cum = true/false  
-3. Nếu has_khu = true và has_cum = true → query_type = null
-4. Nếu has_khu = true và has_cum = false → query_type = "KCN"
-5. Nếu has_khu = false và has_cum = true → query_type = "CCN"
-6. Nếu has_khu = false và has_cum = false → query_type = null
-
-VÍ DỤ SEARCH_TYPE = "province":
-- "khu công nghiệp ở Hà Nội" → {{"query_type": "KCN", "reasoning": "Chỉ hỏi về KHU công nghiệp, không nhắc đến cụm"}}
-- "cụm công nghiệp ở Bình Dương" → {{"query_type": "CCN", "reasoning": "Chỉ hỏi về CỤM công nghiệp, không nhắc đến khu"}}
-- "khu và cụm công nghiệp ở Đà Nẵng" → {{"query_type": null, "reasoning": "Hỏi về CẢ HAI khu và cụm"}}
-- "danh sách cụm công nghiệp ở Bình Dương" → {{"query_type": "CCN", "reasoning": "Chỉ hỏi về CỤM công nghiệp, không nhắc đến khu"}}
-- "vẽ biểu đồ cụm công nghiệp ở Hải Phòng" → {{"query_type": "CCN", "reasoning": "Chỉ hỏi về CỤM công nghiệp, không nhắc đến khu"}}
 
-VÍ DỤ SEARCH_TYPE = "specific_name":
-- "cho tôi thông tin về KHU CÔNG NGHIỆP NGŨ LẠC - VĨNH LONG" → {{"query_type": "KCN", "reasoning": "Tìm KCN cụ thể"}}
-- "thông tin về cụm công nghiệp ABC" → {{"query_type": "CCN", "reasoning": "Tìm CCN cụ thể"}}
+        if self._analysis_cache is not None:
+            cached = self._analysis_cache.get(self._analysis_version, question)
+            if cached is not None:
+                self._count_analysis("cached")
+                return cached
+        
+        prompt_question = f"""CÂU HỎI NGƯỜI DÙNG: "{question}"
 
 CHỈ TRẢ VỀ JSON (không có markdown, không có text thêm):
 """
 
         try:
-            from langchain_core.messages import HumanMessage
+            from langchain_core.messages import HumanMessage, SystemMessage
             
             # Kiểm tra LLM có khả dụng không
             if not hasattr(self.llm, 'invoke'):
@@ -273,7 +373,13 @@ CHỈ TRẢ VỀ JSON (không có markdown, không có text thêm):
             
             # Gọi LLM với error handling
             try:
-                llm_response = self.llm.invoke([HumanMessage(content=prompt)])
+                # Phần tĩnh (danh sách tỉnh + hướng dẫn) đứng trước, giống hệt giữa các
+                # request -> provider cache được prefix; chỉ câu hỏi thay đổi, đặt cuối
+                self._count_analysis("llm")
+                llm_response = self.llm.invoke([
+                    SystemMessage(content=self._analysis_prompt_prefix),
+                    HumanMessage(content=prompt_question)
+                ])
                 if not llm_response or not hasattr(llm_response, 'content'):
                     print("⚠️ LLM returned invalid response object")
                     return self._fallback_keyword_analysis(question)
@@ -356,6 +462,9 @@ CHỈ TRẢ VỀ JSON (không có markdown, không có text thêm):
                 print(f"⚠️ LLM response missing keys: {missing_keys}")
                 return self._fallback_keyword_analysis(question)
             
+            # Chỉ cache kết quả LLM hợp lệ (fallback do lỗi tạm thời thì không)
+            if self._analysis_cache is not None:
+                self._analysis_cache.put(self._analysis_version, question, result)
             return result
                 
         except Exception as e:
@@ -532,7 +641,7 @@ CHỈ TRẢ VỀ JSON (không có markdown, không có text thêm):
         if not self.llm or self.df is None:
             return "❓ Bạn vui lòng nêu rõ tỉnh/thành phố cần tra cứu."
         
-        available_provinces = self.df[self.columns_map["province"]].dropna().unique().tolist()
+        available_provinces = self._available_provinces
         available_provinces_str = ", ".join(available_provinces)
         
         prompt = f"""
@@ -606,7 +715,7 @@ CHỈ TRẢ VỀ THÔNG BÁO BẰNG TIẾNG VIỆT:
             return False, "❌ Không có dữ liệu để tra cứu."
         
         # Lấy danh sách tỉnh có trong dữ liệu
-        available_provinces = self.df[self.columns_map["province"]].dropna().unique().tolist()
+        available_provinces = self._available_provinces
         
         # Kiểm tra exact match trước
         province_normalized = self._normalize_text(extracted_province.lower())
@@ -717,12 +826,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
     # 🔡 CHUẨN HÓA TEXT (BỎ DẤU)
     # ==========================================================
     def _normalize_text(self, text: str) -> str:
-        intab = "àáảãạăắằẳẵặâấầẩẫậèéẻẽẹêếềểễệìíỉĩịòóỏõọôốồổỗộơớờởỡợùúủũụưứừửữựỳýỷỹỵđ"
-        outtab = "aaaaaaaaaaaaaaaaaeeeeeeeeeeeiiiiiooooooooooooooooouuuuuuuuuuuyyyyyd"
-        intab_upper = "ÀÁẢÃẠĂẮẰẲẴẶÂẤẦẨẪẬÈÉẺẼẸÊẾỀỂỄỆÌÍỈĨỊÒÓỎÕỌÔỐỒỔỖỘƠỚỜỞỠỢÙÚỦŨỤƯỨỪỬỮỰỲÝỶỸỴĐ"
-        outtab_upper = "AAAAAAAAAAAAAAAAAEEEEEEEEEEEIIIIIOOOOOOOOOOOOOOOOOUUUUUUUUUUUYYYYYD"
-        transtab = str.maketrans(intab + intab_upper, outtab + outtab_upper)
-        return str(text).translate(transtab).lower().strip()
+        return normalize_text(text)
 
     # ==========================================================
     # 🔍 TRUY VẤN DỮ LIỆU
@@ -735,23 +839,24 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         if self.df is None or self.columns_map["province"] is None:
             return None
 
-        # Lọc theo tỉnh/thành phố
+        # Lọc theo tỉnh/thành phố: so chuỗi con trên ~63 tên tỉnh của index, không quét từng dòng
         if province_name == "TOÀN QUỐC":
-            df_filtered = self.df.copy()
+            positions = None
         else:
-            df_filtered = self.df[
-                self.df[self.columns_map["province"]].astype(str).str.lower().str.contains(
-                    str(province_name).lower(), na=False
-                )
-            ].copy()
+            province_lower = str(province_name).lower()
+            positions = set()
+            for province, rows in self._province_index.items():
+                if province_lower in province:
+                    positions.update(rows)
 
         # Lọc theo loại KCN/CCN dựa vào cột "Loại"
         if query_type and self.columns_map["type"] is not None:
-            df_filtered = df_filtered[
-                df_filtered[self.columns_map["type"]].astype(str).str.strip().str.upper() == query_type
-            ]
+            type_rows = self._type_index.get(query_type, [])
+            positions = set(type_rows) if positions is None else positions.intersection(type_rows)
 
-        return df_filtered
+        if positions is None:
+            return self.df
+        return self._rows(positions)
 
     def query_by_specific_name(self, specific_name: str, query_type: Optional[str]) -> Optional[pd.DataFrame]:
         """
@@ -764,45 +869,57 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         specific_name_norm = self._normalize_text(specific_name.lower())
         
         # Lọc theo loại KCN/CCN trước nếu có
-        df_to_search = self.df.copy()
+        allowed = None
         if query_type and self.columns_map["type"] is not None:
-            df_to_search = df_to_search[
-                df_to_search[self.columns_map["type"]].astype(str).str.strip().str.upper() == query_type
-            ]
+            allowed = set(self._type_index.get(query_type, []))
 
-        # Tìm kiếm exact match trước
-        exact_matches = df_to_search[
-            df_to_search[self.columns_map["name"]].astype(str).apply(
-                lambda x: self._normalize_text(x.lower()) == specific_name_norm
-            )
-        ]
-        
-        if not exact_matches.empty:
-            return exact_matches
+        def matched(rows) -> List[int]:
+            return [r for r in rows if allowed is None or r in allowed]
 
-        # Tìm kiếm partial match (contains)
-        partial_matches = df_to_search[
-            df_to_search[self.columns_map["name"]].astype(str).apply(
-                lambda x: specific_name_norm in self._normalize_text(x.lower()) or 
-                         self._normalize_text(x.lower()) in specific_name_norm
-            )
-        ]
-        
-        if not partial_matches.empty:
-            return partial_matches
+        # Tìm kiếm exact match trước
+        exact = matched(self._name_index.get(specific_name_norm, []))
+        if exact:
+            return self._rows(exact)
+
+        # Tìm kiếm partial match (contains), ứng viên lấy từ index token:
+        # - tên chứa câu hỏi: mọi token ở GIỮA câu hỏi là token nguyên của tên
+        #   (token đầu/cuối có thể bị cắt) -> giao các tập tên theo token đó
+        # - câu hỏi chứa tên (>= 3 token): token giữa của tên là token của câu hỏi
+        #   -> hợp các tập tên theo token câu hỏi; tên ngắn luôn được kiểm tra
+        query_tokens = specific_name_norm.split()
+        if len(query_tokens) >= 3:
+            containing = None
+            for token in query_tokens[1:-1]:
+                names = self._name_token_index.get(token, set())
+                containing = set(names) if containing is None else containing & names
+        else:
+            containing = self._name_index.keys()
+        contained = set(self._short_names)
+        for token in query_tokens:
+            contained.update(self._name_token_index.get(token, ()))
+
+        partial = set()
+        for name in containing:
+            if specific_name_norm in name:
+                partial.update(self._name_index[name])
+        for name in contained:
+            if name in specific_name_norm:
+                partial.update(self._name_index[name])
+        partial = matched(partial)
+        if partial:
+            return self._rows(partial)
 
         # Sử dụng fuzzy matching nếu có rapidfuzz
         if process is not None and fuzz is not None:
-            all_names = df_to_search[self.columns_map["name"]].astype(str).tolist()
+            positions = range(len(self.df)) if allowed is None else sorted(allowed)
+            names = self.df[self.columns_map["name"]].astype(str).iloc[list(positions)]
+            all_names = names.tolist()
             if all_names:
                 # Tìm tên gần nhất
                 result = process.extractOne(specific_name, all_names, scorer=fuzz.WRatio)
                 if result and result[1] >= 70:  # Threshold 70% cho tên KCN/CCN
                     best_match = result[0]
-                    fuzzy_matches = df_to_search[
-                        df_to_search[self.columns_map["name"]].astype(str) == best_match
-                    ]
-                    return fuzzy_matches
+                    return self.df.loc[names.index[(names == best_match).to_numpy()]]
 
         # Không tìm thấy
         return pd.DataFrame()
@@ -814,35 +931,85 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         """
         Trả về [lng, lat] nếu match được tên zone trong GeoJSON.
         """
-        if not zone_name:
+        return self._coords.match(zone_name)
+
+    def coordinates_for(self, zone_name: str) -> Optional[List[float]]:
+        """Tọa độ [lng, lat] của một KCN/CCN: tra kết quả ghép sẵn (dataset), tên lạ mới match lại."""
+        return self._coords.coordinates_for(zone_name)
+
+    def coordinate_diagnostics(self) -> Dict[str, Any]:
+        """Thống kê ghép tọa độ + danh sách dòng Excel không match được GeoJSON."""
+        records = self._data_records or []
+        unmatched = [
+            {"Tên": r["Tên"], "Tỉnh/Thành phố": r["Tỉnh/Thành phố"], "Loại": r["Loại"]}
+            for r in records if r["coordinates"] is None
+        ]
+        return {
+            "geojson_points": len(self._iz_name_to_coord),
+            "rows": len(records),
+            "matched": len(records) - len(unmatched),
+            "unmatched_count": len(unmatched),
+            "unmatched": unmatched,
+        }
+
+    # ==========================================================
+    # 🧾 TRẢ KẾT QUẢ DẠNG JSON (dict hoặc string)
+    # ==========================================================
+    def _make_data_record(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Một dòng Excel (dict cột -> giá trị) -> phần tử data[i] của JSON trả về."""
+        return self._coords.make_data_record(row)
+
+    def _row_positions(self, df: pd.DataFrame) -> Optional[List[int]]:
+        """Vị trí các dòng của df trong self.df; None nếu df không lấy từ self.df (không dùng cache được)."""
+        if self._data_records is None or not self.df.index.is_unique:
             return None
-        if not self._iz_name_to_coord:
+        positions = self.df.index.get_indexer(df.index)
+        if (positions < 0).any():
             return None
+        return positions.tolist()
 
-        z_norm = self._normalize_text(zone_name)
+    def _build_data_records(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Các dòng của df -> (data, not_found_coordinates).
+        Dòng lấy từ self.df dùng bản ghi tính sẵn; còn lại đọc df theo cột một lần
+        (không tạo Series cho từng dòng như iterrows()).
+        """
+        positions = self._row_positions(df)
+        if positions is not None:
+            records = [self._data_records[p] for p in positions]
+        else:
+            records = [self._make_data_record(row) for row in self._row_dicts(df)]
 
-        # 1) exact match normalized
-        if z_norm in self._iz_name_to_coord:
-            return self._iz_name_to_coord[z_norm]
+        not_found = [r["Tên"] for r in records if r["coordinates"] is None and r["Tên"]]
+        return records, not_found
 
-        # 2) fuzzy match nếu có rapidfuzz
-        if process is not None and fuzz is not None and self._iz_names_original:
-            result = process.extractOne(zone_name, self._iz_names_original, scorer=fuzz.WRatio)
-            if result and result[1] >= self.match_threshold:
-                best_name = result[0]
-                best_norm = self._normalize_text(best_name)
-                return self._iz_name_to_coord.get(best_norm)
+    def _dumps_result(self, obj: Dict[str, Any], df: Optional[pd.DataFrame]) -> str:
+        """
+        JSON string (gọn, không indent) của kết quả. data[] được ghép từ JSON tính sẵn
+        của từng dòng thay vì json.dumps lại toàn bộ danh sách.
+        """
+        positions = self._row_positions(df) if df is not None and "data" in obj else None
+        if positions is None:
+            return json.dumps(obj, ensure_ascii=False)
 
-        # 3) fallback: contains match normalized (thô)
-        for n, coord in self._iz_name_to_coord.items():
-            if n and (n in z_norm or z_norm in n):
-                return coord
+        rest = json.dumps({k: v for k, v in obj.items() if k != "data"}, ensure_ascii=False)
+        rows = "[" + ", ".join(self._data_json[p] for p in positions) + "]"
+        return rest[:-1] + (", " if len(rest) > 2 else "") + '"data": ' + rows + "}"
 
-        return None
+    def _json_payload(self, obj: Dict[str, Any], df: Optional[pd.DataFrame], as_string: bool) -> Any:
+        """dict hoặc JSON string tuỳ as_string."""
+        return self._dumps_result(obj, df) if as_string else obj
+
+    def _row_dicts(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Các dòng của df dạng dict, chỉ gồm các cột đã nhận diện trong columns_map."""
+        return self._dataset.row_dicts(df)
+
+    def _count_by_type(self, df: pd.DataFrame) -> Dict[str, int]:
+        """Số dòng theo loại (KCN/CCN...) bằng value_counts thay vì duyệt từng dòng."""
+        if self.columns_map["type"] is None or df.empty:
+            return {}
+        return df[self.columns_map["type"]].astype(str).str.upper().value_counts().to_dict()
 
-    # ==========================================================
-    # 🧾 TRẢ KẾT QUẢ DẠNG JSON (dict hoặc string)
-    # ==========================================================
     def format_json_response(
         self,
         df: pd.DataFrame,
@@ -872,40 +1039,16 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
                 "data": [],
                 "not_found_coordinates": []
             }
-            return json.dumps(obj, ensure_ascii=False, indent=2) if as_string else obj
-
-        cols = self.columns_map
-        records = []
-        not_found = []
-
-        for _, row in df.iterrows():
-            name_val = str(row.get(cols["name"], "")).strip()
-
-            coord = self._match_coordinates(name_val)
-
-            item = {
-                "Tỉnh/Thành phố": str(row.get(cols["province"], "")),
-                "Loại": str(row.get(cols["type"], "")),
-                "Tên": name_val,
-                "Địa chỉ": str(row.get(cols["address"], "")),
-                "Thời gian vận hành": str(row.get(cols["operation_time"], "")),
-                "Tổng diện tích": str(row.get(cols["area"], "")),
-                "Giá thuê đất": str(row.get(cols["rental_price"], "")),
-                "Ngành nghề": str(row.get(cols["industry"], "")),
-                # ✅ BỔ SUNG TỌA ĐỘ
-                "coordinates": coord
-            }
+            return json.dumps(obj, ensure_ascii=False) if as_string else obj
 
-            if coord is None and name_val:
-                not_found.append(name_val)
-
-            records.append(item)
+        records, not_found = self._build_data_records(df)
 
         # Cải thiện thông báo kết quả
         if query_type is None:  # Tất cả loại
             # Đếm số lượng từng loại
-            kcn_count = sum(1 for r in records if r.get("Loại", "").upper() == "KCN")
-            ccn_count = sum(1 for r in records if r.get("Loại", "").upper() == "CCN")
+            type_counts = self._count_by_type(df)
+            kcn_count = type_counts.get("KCN", 0)
+            ccn_count = type_counts.get("CCN", 0)
             
             if kcn_count > 0 and ccn_count > 0:
                 message = f"{province_name} có {kcn_count} khu công nghiệp và {ccn_count} cụm công nghiệp."
@@ -927,7 +1070,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
             "not_found_coordinates": not_found
         }
 
-        return json.dumps(obj, ensure_ascii=False, indent=2) if as_string else obj
+        return self._dumps_result(obj, df) if as_string else obj
 
     def format_json_response_for_specific_name(
         self,
@@ -959,34 +1102,9 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
                 "data": [],
                 "not_found_coordinates": []
             }
-            return json.dumps(obj, ensure_ascii=False, indent=2) if as_string else obj
-
-        cols = self.columns_map
-        records = []
-        not_found = []
-
-        for _, row in df.iterrows():
-            name_val = str(row.get(cols["name"], "")).strip()
-
-            coord = self._match_coordinates(name_val)
-
-            item = {
-                "Tỉnh/Thành phố": str(row.get(cols["province"], "")),
-                "Loại": str(row.get(cols["type"], "")),
-                "Tên": name_val,
-                "Địa chỉ": str(row.get(cols["address"], "")),
-                "Thời gian vận hành": str(row.get(cols["operation_time"], "")),
-                "Tổng diện tích": str(row.get(cols["area"], "")),
-                "Giá thuê đất": str(row.get(cols["rental_price"], "")),
-                "Ngành nghề": str(row.get(cols["industry"], "")),
-                # ✅ BỔ SUNG TỌA ĐỘ
-                "coordinates": coord
-            }
-
-            if coord is None and name_val:
-                not_found.append(name_val)
+            return json.dumps(obj, ensure_ascii=False) if as_string else obj
 
-            records.append(item)
+        records, not_found = self._build_data_records(df)
 
         # Tạo thông báo kết quả cho specific name search
         if len(records) == 1:
@@ -1004,17 +1122,24 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
             "not_found_coordinates": not_found
         }
 
-        return json.dumps(obj, ensure_ascii=False, indent=2) if as_string else obj
+        return self._dumps_result(obj, df) if as_string else obj
 
     # ==========================================================
     # ⚙️ XỬ LÝ TRUY VẤN NGƯỜI DÙNG
     # ==========================================================
-    def process_query(self, question: str, return_json: bool = True, enable_rag: bool = False) -> Tuple[bool, Optional[Any]]:
+    def process_query(
+        self,
+        question: str,
+        return_json: bool = True,
+        enable_rag: bool = False,
+        as_string: bool = True
+    ) -> Tuple[bool, Optional[Any]]:
         """
         Xử lý truy vấn và trả kết quả sử dụng prompt-based analysis.
         Hỗ trợ cả tìm kiếm theo tỉnh và theo tên KCN/CCN cụ thể.
         - return_json=True: trả JSON (mặc định)
-            + trả về STRING JSON (để backward compatible)
+            + as_string=True: trả về STRING JSON gọn (để backward compatible)
+            + as_string=False: trả về dict (API nên dùng, tránh dumps -> loads -> dumps)
         - return_json=False: trả text bảng (như cũ)
         - enable_rag=True: bổ sung RAG analysis
 
@@ -1039,7 +1164,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
             if specific_name is None:
                 error_message = "❓ Vui lòng cung cấp tên KCN/CCN cụ thể cần tìm kiếm."
                 err = {"error": error_message}
-                return True, json.dumps(err, ensure_ascii=False) if return_json else error_message
+                return True, self._json_payload(err, None, as_string) if return_json else error_message
             
             # Truy vấn dữ liệu theo tên cụ thể
             df_result = self.query_by_specific_name(specific_name, query_type)
@@ -1047,7 +1172,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
             if df_result is None or df_result.empty:
                 error_message = f"❌ Không tìm thấy KCN/CCN với tên '{specific_name}'. Vui lòng kiểm tra lại tên hoặc thử tìm theo tỉnh/thành phố."
                 err = {"error": error_message}
-                return True, json.dumps(err, ensure_ascii=False) if return_json else error_message
+                return True, self._json_payload(err, None, as_string) if return_json else error_message
             
             # Trả kết quả cho specific name search
             if return_json:
@@ -1062,7 +1187,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
                     else:
                         result["has_rag"] = False
                 
-                return True, json.dumps(result, ensure_ascii=False, indent=2)
+                return True, self._json_payload(result, df_result, as_string)
             else:
                 return True, self.format_table_response_for_specific_name(df_result, specific_name, query_type)
         
@@ -1072,13 +1197,13 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
             if province is None:
                 error_message = self._generate_smart_error_message(question, province)
                 err = {"error": error_message}
-                return True, json.dumps(err, ensure_ascii=False) if return_json else error_message
+                return True, self._json_payload(err, None, as_string) if return_json else error_message
             
             # Kiểm tra tỉnh có trong dữ liệu không
             is_valid, error_message = self._smart_province_check(question, province)
             if not is_valid:
                 err = {"error": error_message}
-                return True, json.dumps(err, ensure_ascii=False) if return_json else error_message
+                return True, self._json_payload(err, None, as_string) if return_json else error_message
 
             # Truy vấn dữ liệu theo tỉnh
             df_result = self.query_by_province(province, query_type)
@@ -1096,13 +1221,14 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
                     else:
                         result["has_rag"] = False
                 
-                return True, json.dumps(result, ensure_ascii=False, indent=2)
+                return True, self._json_payload(result, df_result, as_string)
             else:
                 return True, self.format_table_response(df_result, province, query_type)
 
     # ==========================================================
     # 🧩 GIỮ LẠI HÀM CŨ (BẢNG TEXT)
     # ==========================================================
+
     def format_table_response(self, df: pd.DataFrame, province_name: str, query_type: Optional[str]) -> str:
         """(Tuỳ chọn) Hiển thị kết quả dạng bảng text"""
         # Cải thiện label hiển thị
@@ -1121,8 +1247,9 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         # Cải thiện thông báo kết quả cho text response
         if query_type is None:  # Tất cả loại
             # Đếm số lượng từng loại
-            kcn_count = sum(1 for _, row in df.iterrows() if str(row.get(cols["type"], "")).upper() == "KCN")
-            ccn_count = sum(1 for _, row in df.iterrows() if str(row.get(cols["type"], "")).upper() == "CCN")
+            type_counts = self._count_by_type(df)
+            kcn_count = type_counts.get("KCN", 0)
+            ccn_count = type_counts.get("CCN", 0)
             
             if kcn_count > 0 and ccn_count > 0:
                 response = f"📊 {province_name} có {kcn_count} khu công nghiệp và {ccn_count} cụm công nghiệp.\n\n"
@@ -1135,7 +1262,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         else:
             response = f"📊 {province_name} có {len(df)} {label} công nghiệp.\n\n"
             
-        for _, row in df.iterrows():
+        for row in self._row_dicts(df):
             loai = str(row.get(cols['type'], '')).upper()
             ten = row.get(cols['name'], 'Không rõ')
             dia_chi = row.get(cols['address'], '')
@@ -1163,7 +1290,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         else:
             response = f"📊 Tìm thấy {len(df)} kết quả phù hợp với '{specific_name}':\n\n"
             
-        for _, row in df.iterrows():
+        for row in self._row_dicts(df):
             loai = str(row.get(cols['type'], '')).upper()
             ten = row.get(cols['name'], 'Không rõ')
             dia_chi = row.get(cols['address'], '')
@@ -1365,7 +1492,7 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         print(f"📋 KCN Info: {kcn_info['Tên']}")
         
         # Tìm tọa độ
-        coordinates = self._match_coordinates(kcn_info["Tên"])
+        coordinates = self.coordinates_for(kcn_info["Tên"])
         print(f"📍 Coordinates: {coordinates}")
         
         # Enhance với RAG
@@ -1451,14 +1578,14 @@ CHỈ TRẢ VỀ MỘT TRONG HAI:
         cols = self.columns_map
         options = []
         
-        for idx, row in df_result.iterrows():
+        for idx, row in zip(df_result.index, self._row_dicts(df_result)):
             kcn_name = str(row.get(cols["name"], ""))
             kcn_province = str(row.get(cols["province"], ""))
             kcn_address = str(row.get(cols["address"], ""))
             kcn_type = str(row.get(cols["type"], ""))
             
             # Tìm tọa độ cho từng option
-            coordinates = self._match_coordinates(kcn_name)
+            coordinates = self.coordinates_for(kcn_name)
             
             option = {
                 "id": idx,  # ID để người dùng chọn
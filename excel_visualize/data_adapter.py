@@ -1,58 +1,14 @@
 # File: excel_visualize/data_adapter.py
 import pandas as pd
-from typing import Optional
+
+from excel_query.dataset import parse_area, parse_price
 
 # ==================================================
 # 1. Các hàm Parse (Chuyển text sang số)
 # ==================================================
-def _parse_price_to_float(value) -> Optional[float]:
-    """
-    Chuyển đổi giá thuê đất sang số float.
-    VD: "120 USD/m2/năm" -> 120.0
-        "80 - 100 USD" -> 90.0
-    """
-    if pd.isna(value):
-        return None
-
-    s = str(value).lower().strip()
-
-    # Loại bỏ các đơn vị thường gặp
-    stop_words = ["usd/m²/năm", "usd/m2/năm", "usd", "/m2", "/năm", "m2"]
-    for word in stop_words:
-        s = s.replace(word, "")
-    s = s.strip()
-
-    # Xử lý trường hợp khoảng giá (VD: "80-100") -> Lấy trung bình
-    if "-" in s:
-        try:
-            parts = s.split("-")
-            return (float(parts[0]) + float(parts[1])) / 2
-        except:
-            return None
-
-    # Xử lý số thông thường
-    try:
-        return float(s)
-    except:
-        return None
-
-def _parse_area_to_float(value) -> Optional[float]:
-    """
-    Chuyển đổi diện tích sang số float.
-    VD: "500 ha" -> 500.0
-    """
-    if pd.isna(value):
-        return None
-
-    s = str(value).lower().strip()
-    
-    # Loại bỏ đơn vị, thay dấu phẩy thành chấm (VD: 1,5 ha -> 1.5)
-    s = s.replace("ha", "").replace("hecta", "").replace(",", ".").strip()
-    
-    try:
-        return float(s)
-    except:
-        return None
+# Dùng chung với excel_query.dataset (đã tính sẵn cột Price_num / Area_num khi load Excel)
+_parse_price_to_float = parse_price
+_parse_area_to_float = parse_area
 
 # ==================================================
 # 2. Hàm Main: Làm sạch DataFrame
@@ -70,7 +26,10 @@ def clean_numeric_data(df: pd.DataFrame, is_price_metric: bool = True) -> pd.Dat
         if "Giá thuê đất" not in df_out.columns:
             return pd.DataFrame() # Trả về rỗng nếu không có cột
         
-        df_out["Giá số"] = df_out["Giá thuê đất"].apply(_parse_price_to_float)
+        if "Price_num" in df_out.columns:
+            df_out["Giá số"] = df_out["Price_num"]
+        else:
+            df_out["Giá số"] = df_out["Giá thuê đất"].apply(_parse_price_to_float)
         # Chỉ giữ lại dòng có giá trị số hợp lệ
         df_out = df_out.dropna(subset=["Giá số"])
         # Loại bỏ giá trị 0 hoặc âm nếu có
@@ -81,7 +40,10 @@ def clean_numeric_data(df: pd.DataFrame, is_price_metric: bool = True) -> pd.Dat
         if "Tổng diện tích" not in df_out.columns:
             return pd.DataFrame()
             
-        df_out["Diện tích số"] = df_out["Tổng diện tích"].apply(_parse_area_to_float)
+        if "Area_num" in df_out.columns:
+            df_out["Diện tích số"] = df_out["Area_num"]
+        else:
+            df_out["Diện tích số"] = df_out["Tổng diện tích"].apply(_parse_area_to_float)
         df_out = df_out.dropna(subset=["Diện tích số"])
         df_out = df_out[df_out["Diện tích số"] > 0]
 
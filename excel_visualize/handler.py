@@ -1,6 +1,6 @@
 import pandas as pd
 from .rag_core import rag_agent
-from .data_adapter import clean_numeric_data, _parse_price_to_float, _parse_area_to_float
+from .data_adapter import clean_numeric_data
 from .chart import (
     plot_price_bar_chart_base64, 
     plot_area_bar_chart_base64, 
@@ -10,8 +10,8 @@ from .chart import (
     plot_line_chart            
 )
 
-# 🗺️ IMPORT EXCEL_QUERY HANDLER ĐỂ SỬ DỤNG COORDINATES MATCHING
-from excel_query.excel_query import ExcelQueryHandler
+# 🗺️ DATASET KCN/CCN DÙNG CHUNG ĐỂ LẤY TỌA ĐỘ
+from excel_query.dataset import get_kcn_dataset
 from pathlib import Path
 import os
 import json
@@ -175,18 +175,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 EXCEL_FILE_PATH = str(BASE_DIR / "data" / "IIPMap_FULL_63_COMPLETE.xlsx")
 GEOJSON_IZ_PATH = str(BASE_DIR / "map_ui" / "industrial_zones.geojson")
 
-# 🎯 GLOBAL EXCEL HANDLER FOR COORDINATES MATCHING
-_excel_handler_for_coords = None
-
+# 🎯 TỌA ĐỘ KCN/CCN: dùng chung dataset với excel_query (không tạo thêm ExcelQueryHandler)
 def _get_excel_handler():
-    """Lazy load excel handler for coordinates matching"""
-    global _excel_handler_for_coords
-    if _excel_handler_for_coords is None:
-        _excel_handler_for_coords = ExcelQueryHandler(
-            excel_path=EXCEL_FILE_PATH,
-            geojson_path=GEOJSON_IZ_PATH
-        )
-    return _excel_handler_for_coords
+    """Tọa độ đã ghép sẵn của Excel + GeoJSON (load một lần cho cả process)"""
+    return get_kcn_dataset(EXCEL_FILE_PATH).geo(GEOJSON_IZ_PATH)
 
 def _add_coordinates_to_data(data_list: list) -> list:
     """
@@ -198,8 +190,8 @@ def _add_coordinates_to_data(data_list: list) -> list:
         for item in data_list:
             kcn_name = item.get('Tên', '')
             if kcn_name:
-                # Tìm coordinates từ GeoJSON using the correct method
-                coordinates = excel_handler._match_coordinates(kcn_name)
+                # Tọa độ đã ghép sẵn khi load (excel_query.coordinates_for)
+                coordinates = excel_handler.coordinates_for(kcn_name)
                 if coordinates and len(coordinates) == 2:
                     item['coordinates'] = coordinates
                 else:
@@ -274,8 +266,8 @@ def handle_excel_visualize(message: str) -> dict:
     data_list = []
     for _, row in df_filtered.iterrows():
         zone_name = row.get("Tên", "")
-        # 🎯 MATCH COORDINATES USING EXCEL_QUERY LOGIC
-        coordinates = excel_handler._match_coordinates(zone_name) if zone_name else None
+        # 🎯 TỌA ĐỘ ĐÃ GHÉP SẴN KHI LOAD (EXCEL_QUERY)
+        coordinates = excel_handler.coordinates_for(zone_name) if zone_name else None
         
         data_list.append({
             "Tên": zone_name,
@@ -291,8 +283,9 @@ def handle_excel_visualize(message: str) -> dict:
     # 1. BIỂU ĐỒ ĐÔI (DUAL)
     if viz_metric == "dual":
         df_dual = df_filtered.copy()
-        df_dual["Giá số"] = df_dual["Giá thuê đất"].apply(_parse_price_to_float)
-        df_dual["Diện tích số"] = df_dual["Tổng diện tích"].apply(_parse_area_to_float)
+        # Price_num / Area_num đã parse sẵn khi load Excel (excel_query.dataset)
+        df_dual["Giá số"] = df_dual["Price_num"]
+        df_dual["Diện tích số"] = df_dual["Area_num"]
         df_dual = df_dual.dropna(subset=["Giá số", "Diện tích số"], how="all")
         
         if df_dual.empty: return _error_response("Không có đủ dữ liệu để vẽ.")
@@ -2,12 +2,14 @@
 import os
 import pandas as pd
 import re
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 
+from excel_query.dataset import add_derived_columns, get_kcn_dataset
+
 # Load environment variables
 load_dotenv()
 EXCEL_PATH = os.getenv("EXCEL_FILE_PATH")
@@ -16,33 +18,10 @@ OPENAI_API_KEY = os.getenv("OPENAI__API_KEY")
 class ExcelQueryAgent:
     def __init__(self):
         self.excel_path = EXCEL_PATH
+        # Excel đọc + chuẩn hoá + parse Giá/Diện tích (Loại_norm, Tên_norm, Price_num,
+        # Area_num) một lần cho cả process, dùng chung với excel_query (KHÔNG sửa tại chỗ)
         self.df = self._load_data()
-        
-        # --- GIA CỐ & CHUẨN HÓA DỮ LIỆU ---
-        if not self.df.empty:
-            # 1. Chuẩn hóa cột Loại
-            if "Loại" in self.df.columns:
-                self.df["Loại_norm"] = self.df["Loại"].astype(str).str.lower().str.strip()
-            else:
-                self.df["Loại_norm"] = "khu công nghiệp"
 
-            # 2. Chuẩn hóa cột Tên
-            if "Tên" in self.df.columns:
-                self.df["Tên_norm"] = self.df["Tên"].astype(str).str.lower().str.strip()
-            else:
-                self.df["Tên_norm"] = ""
-
-            # 3. Tính toán cột số liệu (Giá & Diện tích)
-            if "Giá thuê đất" in self.df.columns:
-                self.df["Price_num"] = self.df["Giá thuê đất"].apply(self._parse_price)
-            else:
-                self.df["Price_num"] = None
-
-            if "Tổng diện tích" in self.df.columns:
-                self.df["Area_num"] = self.df["Tổng diện tích"].apply(self._parse_area)
-            else:
-                self.df["Area_num"] = None
-            
         try:
             self.llm = ChatOpenAI(
                 model="gpt-3.5-turbo", 
@@ -53,44 +32,29 @@ class ExcelQueryAgent:
             print(f"⚠️ Cannot initialize LLM for excel_visualize: {e}")
             self.llm = None
         
-        if not self.df.empty and "Tỉnh/Thành phố" in self.df.columns:
+        if self._dataset is not None:
+            self.provinces_list = self._dataset.provinces
+        elif not self.df.empty and "Tỉnh/Thành phố" in self.df.columns:
             self.provinces_list = self.df["Tỉnh/Thành phố"].dropna().unique().tolist()
         else:
             self.provinces_list = []
 
     def _load_data(self) -> pd.DataFrame:
-        if not self.excel_path or not os.path.exists(self.excel_path):
-            if self.excel_path:
-                alt_path = self.excel_path.replace(".xlsx", ".csv")
-                if os.path.exists(alt_path): return pd.read_csv(alt_path)
-            backup = "data/IIPMap_FULL_63_COMPLETE.xlsx - Sheet1.csv"
-            if os.path.exists(backup): return pd.read_csv(backup)
-            print(f"❌ Lỗi: Không tìm thấy file dữ liệu tại {self.excel_path}")
-            return pd.DataFrame()
-
-        try: return pd.read_excel(self.excel_path, sheet_name=0)
-        except: return pd.read_csv(self.excel_path.replace(".xlsx", ".csv"))
-
-    def _parse_price(self, value) -> Optional[float]:
-        if pd.isna(value): return None
-        s = str(value).lower().strip()
-        for kw in ["usd/m²/năm", "usd/m2/năm", "usd", "/m2", "/năm", "m2"]:
-            s = s.replace(kw, "")
-        s = s.strip()
-        if "-" in s:
-            try:
-                parts = s.split("-")
-                return (float(parts[0]) + float(parts[1])) / 2
-            except: return None
-        try: return float(s)
-        except: return None
+        self._dataset = None
+        if self.excel_path and os.path.exists(self.excel_path):
+            dataset = get_kcn_dataset(self.excel_path)
+            if dataset.df is not None:
+                self._dataset = dataset
+                return dataset.df
 
-    def _parse_area(self, value) -> Optional[float]:
-        if pd.isna(value): return None
-        s = str(value).lower().strip()
-        s = s.replace("ha", "").replace("hecta", "").replace(",", ".").strip()
-        try: return float(s)
-        except: return None
+        # Không có / không đọc được Excel: thử bản CSV
+        if self.excel_path:
+            alt_path = self.excel_path.replace(".xlsx", ".csv")
+            if os.path.exists(alt_path): return add_derived_columns(pd.read_csv(alt_path))
+        backup = "data/IIPMap_FULL_63_COMPLETE.xlsx - Sheet1.csv"
+        if os.path.exists(backup): return add_derived_columns(pd.read_csv(backup))
+        print(f"❌ Lỗi: Không tìm thấy file dữ liệu tại {self.excel_path}")
+        return pd.DataFrame()
 
     def retrieve_filters(self, user_query: str) -> Dict[str, Any]:
         """
@@ -1,34 +1,84 @@
-import psycopg2
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from psycopg2 import errors as pg_errors
+
+from database.engine import get_engine
 
 load_dotenv(override=True)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Server-side prepared statement (PREPARE ... / EXECUTE ...).
+# Tắt bằng LAW_DB_PREPARED_STATEMENTS=0 khi đi qua PgBouncer transaction mode
+# (Supabase pooler port 6543) vì prepared statement không sống qua các transaction.
+USE_PREPARED_STATEMENTS = os.getenv("LAW_DB_PREPARED_STATEMENTS", "1").strip().lower() not in {
+    "0", "false", "no", "off"
+}
 
-def query_article_from_db(law_names, article):
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor()
+_ARTICLE_STMT_NAME = "law_db_query_article"
 
-    sql = """
-    SELECT law_name, law_year, chapter, section, article, text
-    FROM law_articles
-    WHERE law_name = %s AND article = %s
-    ORDER BY law_year DESC
-    LIMIT 1;
+# Một query cho TẤT CẢ biến thể tên luật thay vì lặp từng biến thể
+_ARTICLE_SQL = """
+SELECT law_name, law_year, chapter, section, article, text
+FROM law_articles
+WHERE law_name = ANY({law_names}) AND article = {article}
+ORDER BY law_year DESC
+LIMIT 1
+"""
+
+
+def _get_connection():
+    """
+    Mượn kết nối psycopg2 từ pool chung của process.
+    conn.close() trả kết nối về pool chứ không đóng socket.
     """
+    return get_engine().raw_connection()
 
-    for ln in law_names:
-        cur.execute(sql, (ln, article))
-        row = cur.fetchone()
-        if row:
-            cur.close()
-            conn.close()
-            return row
 
-    cur.close()
-    conn.close()
-    return None
+def _execute_article_prepared(conn, cur, law_names, article):
+    # conn.info sống cùng kết nối DBAPI thật trong pool -> mỗi kết nối chỉ PREPARE một lần
+    if not conn.info.get(_ARTICLE_STMT_NAME):
+        try:
+            cur.execute(
+                f"PREPARE {_ARTICLE_STMT_NAME} AS "
+                + _ARTICLE_SQL.format(law_names="$1", article="$2")
+            )
+        except pg_errors.DuplicatePreparedStatement:
+            # Session đã có statement từ trước (vd. info bị reset) -> dùng lại
+            conn.rollback()
+        conn.info[_ARTICLE_STMT_NAME] = True
+
+    cur.execute(f"EXECUTE {_ARTICLE_STMT_NAME} (%s, %s)", (law_names, article))
+    return cur.fetchone()
+
+
+def query_article_from_db(law_names, article):
+    law_names = list(law_names)
+    if not law_names:
+        return None
+
+    conn = _get_connection()
+    cur = conn.cursor()
+
+    try:
+        if USE_PREPARED_STATEMENTS:
+            try:
+                return _execute_article_prepared(conn, cur, law_names, article)
+            except Exception as e:
+                # Statement bị mất (pooler, reset session...) -> dùng query thường
+                print(f"⚠️ Prepared statement lỗi, dùng query thường: {e}")
+                conn.rollback()
+                conn.info.pop(_ARTICLE_STMT_NAME, None)
+
+        cur.execute(
+            _ARTICLE_SQL.format(law_names="%s", article="%s"),
+            (law_names, article),
+        )
+        return cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
 
 
 # ===================== NEW: COUNT DISTINCT LAWS =====================
@@ -36,7 +86,7 @@ def count_distinct_laws_from_db() -> int:
     """
     Đếm số lượng VĂN BẢN LUẬT (chuẩn PostgreSQL)
     """
-    conn = psycopg2.connect(DATABASE_URL)
+    conn = _get_connection()
     cur = conn.cursor()
 
     sql = """
@@ -47,10 +97,65 @@ def count_distinct_laws_from_db() -> int:
     ) AS t;
     """
 
-    cur.execute(sql)
-    result = cur.fetchone()
-
-    cur.close()
-    conn.close()
+    try:
+        cur.execute(sql)
+        result = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
 
     return result[0] if result else 0
+
+
+# ===================== CACHE: SỐ LƯỢNG LUẬT =====================
+# Số luật chỉ đổi khi ingest thêm văn bản -> không scan law_articles mỗi request.
+# LAW_COUNT_CACHE_TTL (giây, mặc định 3600); 0 = luôn đọc DB.
+LAW_COUNT_CACHE_TTL = float(os.getenv("LAW_COUNT_CACHE_TTL", "3600"))
+
+_law_count_value: int | None = None
+_law_count_expires_at = 0.0
+_law_count_lock = threading.Lock()
+
+
+def get_law_count_cached() -> int:
+    """
+    Trả về số luật từ cache; hết hạn thì đếm lại (chỉ MỘT thread đếm).
+    Nếu DB lỗi mà đã có giá trị cũ thì trả giá trị cũ.
+    """
+    global _law_count_value, _law_count_expires_at
+
+    if _law_count_value is not None and time.monotonic() < _law_count_expires_at:
+        return _law_count_value
+
+    with _law_count_lock:
+        if _law_count_value is not None and time.monotonic() < _law_count_expires_at:
+            return _law_count_value
+
+        try:
+            value = count_distinct_laws_from_db()
+        except Exception as e:
+            if _law_count_value is None:
+                raise
+            print(f"⚠️ Không đếm lại được số luật, dùng giá trị cache: {e}")
+            return _law_count_value
+
+        set_law_count_cache(value)
+        return value
+
+
+def set_law_count_cache(value: int) -> None:
+    """Ghi đè giá trị cache (vd. khi đã tính sẵn từ dữ liệu vừa load)."""
+    global _law_count_value, _law_count_expires_at
+    _law_count_value = int(value)
+    _law_count_expires_at = time.monotonic() + LAW_COUNT_CACHE_TTL
+
+
+def invalidate_law_count_cache() -> None:
+    """
+    Hook cho pipeline ingest: gọi sau khi ghi thêm/xoá văn bản trong law_articles
+    để lần hỏi tiếp theo đếm lại.
+    """
+    global _law_count_value, _law_count_expires_at
+    with _law_count_lock:
+        _law_count_value = None
+        _law_count_expires_at = 0.0
@@ -5,8 +5,9 @@ from law_db_query.intent import (
 from law_db_query.parser import parse_law_query
 from law_db_query.db import (
     query_article_from_db,
-    count_distinct_laws_from_db
+    get_law_count_cached
 )
+from law_db_query.index import get_law_index
 
 
 # ============================
@@ -21,7 +22,15 @@ def handle_law_article_query(message: str) -> str | None:
         return None
 
     law_names, article = parse_law_query(message)
-    result = query_article_from_db(law_names, article)
+
+    # Ưu tiên index trong RAM (nếu bật & đã load); miss thì hỏi DB
+    # phòng trường hợp điều luật vừa ingest sau lần refresh gần nhất.
+    result = None
+    index = get_law_index()
+    if index is not None and index.is_loaded:
+        result = index.lookup(law_names, article)
+    if result is None:
+        result = query_article_from_db(law_names, article)
 
     if not result:
         return "Không tìm thấy điều luật bạn yêu cầu."
@@ -49,7 +58,7 @@ def handle_law_count_query(message: str) -> dict | None:
     if not is_law_count_query(message):
         return None
 
-    total = count_distinct_laws_from_db()
+    total = get_law_count_cached()
 
     return {
         "intent": "law_count",
@@ -0,0 +1,178 @@
+"""
+Index toàn bộ bảng law_articles trong RAM (tuỳ chọn).
+
+Bảng law_articles đủ nhỏ để giữ trong bộ nhớ: load một lần lúc khởi động,
+sau đó handle_law_article_query tra dict thay vì query Postgres.
+Kết quả giống hệt query_article_from_db / count_distinct_laws_from_db:
+  - key (law_name, article) đúng như lưu trong DB (SQL: law_name = ANY(variants)
+    AND article = ...), variants phía câu hỏi vẫn sinh bằng generate_law_name_variants
+  - nhiều bản ghi cùng key -> ORDER BY law_year DESC (NULL đứng đầu như Postgres)
+  - law_count = số cặp DISTINCT (law_name, law_year), kể cả NULL
+
+ENV (tuỳ chọn):
+  - LAW_INDEX_PRELOAD         : 1 để bật (mặc định 0)
+  - LAW_INDEX_REFRESH_SECONDS : chu kỳ refresh nền, 0 = không refresh (mặc định 3600)
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from law_db_query.db import _get_connection, set_law_count_cache
+
+ArticleRow = Tuple  # (law_name, law_year, chapter, section, article, text)
+
+
+def _newer(row: ArticleRow, current: ArticleRow) -> bool:
+    """row đứng trước current theo ORDER BY law_year DESC (Postgres: NULLS FIRST khi DESC)."""
+    if current[1] is None:
+        return False
+    if row[1] is None:
+        return True
+    return row[1] > current[1]
+
+
+class LawArticleIndex:
+    def __init__(self):
+        self._by_key: Dict[Tuple[str, Any], ArticleRow] = {}
+        self._load_lock = threading.Lock()
+        self.loaded_at: float | None = None
+        self.row_count = 0
+        self.law_count = 0
+        self.last_error: str | None = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def load(self) -> int:
+        """Đọc lại toàn bộ law_articles, build index mới rồi thay thế index cũ."""
+        with self._load_lock:
+            conn = _get_connection()
+            cur = conn.cursor()
+            try:
+                cur.execute("""
+                    SELECT law_name, law_year, chapter, section, article, text
+                    FROM law_articles
+                """)
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+                conn.close()
+
+            by_key: Dict[Tuple[str, Any], ArticleRow] = {}
+            laws = set()
+            for row in rows:
+                law_name, law_year, article = row[0], row[1], row[4]
+                # SELECT DISTINCT law_name, law_year: NULL cũng là một giá trị
+                laws.add((law_name, law_year))
+                # law_name / article NULL không bao giờ khớp điều kiện "=" của SQL
+                if law_name is None or article is None:
+                    continue
+
+                key = (law_name, article)
+                current = by_key.get(key)
+                # Giống ORDER BY law_year DESC LIMIT 1
+                if current is None or _newer(row, current):
+                    by_key[key] = tuple(row)
+
+            # Gán một lần -> reader luôn thấy index cũ hoặc index mới, không thấy nửa chừng
+            self._by_key = by_key
+            self.row_count = len(rows)
+            self.law_count = len(laws)
+            self.loaded_at = time.time()
+            self.last_error = None
+
+        set_law_count_cache(self.law_count)
+        print(f"✅ Law index: {self.row_count} điều, {self.law_count} văn bản luật")
+        return self.row_count
+
+    def lookup(self, law_names: Iterable[str], article) -> Optional[ArticleRow]:
+        """Như query_article_from_db(law_names, article)."""
+        if article is None:
+            return None
+
+        by_key = self._by_key
+        best = None
+        for ln in law_names:
+            row = by_key.get((ln, article))
+            if row is not None and (best is None or _newer(row, best)):
+                best = row
+        return best
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.is_loaded,
+            "loaded_at": self.loaded_at,
+            "articles": self.row_count,
+            "laws": self.law_count,
+            "keys": len(self._by_key),
+            "last_error": self.last_error,
+        }
+
+
+# ==========================================================
+# SINGLETON + LOAD/REFRESH NỀN
+# ==========================================================
+_index: LawArticleIndex | None = None
+_index_lock = threading.Lock()
+_refresher: threading.Thread | None = None
+
+
+def is_law_index_enabled() -> bool:
+    return os.getenv("LAW_INDEX_PRELOAD", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _safe_load(index: LawArticleIndex) -> None:
+    try:
+        index.load()
+    except Exception as e:
+        index.last_error = str(e)
+        print(f"⚠️ Không load được law index (dùng DB trực tiếp): {e}")
+
+
+def _refresh_loop(index: LawArticleIndex, interval: float) -> None:
+    _safe_load(index)
+    while interval > 0:
+        time.sleep(interval)
+        _safe_load(index)
+
+
+def get_law_index() -> LawArticleIndex | None:
+    """
+    Trả về index dùng chung nếu LAW_INDEX_PRELOAD bật, None nếu tắt.
+    Lần gọi đầu tiên khởi động thread load + refresh nền; trong lúc chưa
+    load xong index.is_loaded = False và caller dùng DB như cũ.
+    """
+    global _index, _refresher
+    if not is_law_index_enabled():
+        return None
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LawArticleIndex()
+                interval = float(os.getenv("LAW_INDEX_REFRESH_SECONDS", "3600"))
+                _refresher = threading.Thread(
+                    target=_refresh_loop,
+                    args=(_index, interval),
+                    name="law-index-refresh",
+                    daemon=True,
+                )
+                _refresher.start()
+    return _index
+
+
+def refresh_law_index() -> Dict:
+    """Refresh đồng bộ (dùng cho endpoint admin)."""
+    index = get_law_index()
+    if index is None:
+        return {"enabled": False}
+    index.load()
+    return {"enabled": True, **index.stats()}
+
+
+def get_law_index_stats() -> Dict:
+    if _index is None:
+        return {"enabled": is_law_index_enabled(), "loaded": False}
+    return {"enabled": True, **_index.stats()}
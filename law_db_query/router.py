@@ -8,7 +8,8 @@ def route_message(
     lang_llm,
     retriever,
     retriever_vsic_2018=None,   
-    excel_handler=None
+    excel_handler=None,
+    answer_cache=None
 ):
     message = input_dict["message"]
 
@@ -28,5 +29,6 @@ def route_message(
         lang_llm=lang_llm,
         retriever=retriever,                     
         retriever_vsic_2018=retriever_vsic_2018, 
-        excel_handler=excel_handler
+        excel_handler=excel_handler,
+        answer_cache=answer_cache
     )
@@ -14,7 +14,19 @@ from starlette.concurrency import run_in_threadpool
 
 from mst.router import is_mst_query
 from mst.handler import handle_mst_query
+from mst.exact_index import get_mst_index, get_mst_index_stats
+from msn_2018.vsic_index import get_vsic_index, get_vsic_index_stats
 from law_db_query.handler import handle_law_count_query
+from law_db_query.index import get_law_index, refresh_law_index, get_law_index_stats
+from database.engine import get_pool_stats, dispose_engine
+from data_processing.language import get_language_detection_stats
+from data_processing.translation_cache import get_translation_cache_stats
+from data_processing.answer_cache import get_answer_cache_stats
+from data_processing.embedding_cache import get_embedding_cache_stats
+from data_processing.retriever_cache import get_retriever_cache_stats
+from excel_query.analysis_cache import get_query_analysis_cache_stats
+from user_history.write_behind import shutdown_write_behind, get_write_behind_stats
+from user_history.cache import get_history_cache_stats
 
 from excel_visualize import (
     is_excel_visualize_intent,
@@ -157,6 +169,28 @@ if CHATBOT_AVAILABLE and app:
         print(f"⚠️ Lỗi khi cấu hình LLM cho excel_kcn_handler: {e}")
 
 
+# ---------------------------------------
+# 🚀 Startup: preload law index (nếu LAW_INDEX_PRELOAD=1, chạy nền) + mmap MST index + VSIC index
+# ---------------------------------------
+@app_fastapi.on_event("startup")
+def on_startup():
+    get_law_index()
+    get_mst_index()
+    get_vsic_index()
+
+
+# ---------------------------------------
+# 🛑 Shutdown: ghi nốt chat history còn trong hàng đợi rồi đóng pool DB
+# ---------------------------------------
+@app_fastapi.on_event("shutdown")
+def on_shutdown():
+    try:
+        shutdown_write_behind()
+    except Exception as e:
+        print(f"⚠️ Lỗi khi flush chat history: {e}")
+    dispose_engine()
+
+
 # ---------------------------------------
 # 3️⃣ Route kiểm tra hoạt động (GET /)
 # ---------------------------------------
@@ -357,7 +391,8 @@ async def predict(data: Question, request: Request):
             excel_kcn_handler.process_query,
             question,
             True,  # return_json=True
-            True   # enable_rag=True ✅ BẬT RAG
+            True,  # enable_rag=True ✅ BẬT RAG
+            as_string=False  # nhận dict, FastAPI serialize một lần
         )
 
         if handled and excel_payload:
@@ -564,10 +599,28 @@ async def get_status():
         "sheet_id": os.getenv("GOOGLE_SHEET_ID", "Not configured")
     }
 
+    try:
+        db_pool_info = get_pool_stats()
+    except Exception as e:
+        db_pool_info = {"status": "Error", "error": str(e)}
+
     return {
         "chatbot": "Available",
         "vectordb": vectordb_info,
         "google_sheet": sheet_info,
+        "db_pool": db_pool_info,
+        "chat_history_write_behind": get_write_behind_stats(),
+        "chat_history_cache": get_history_cache_stats(),
+        "law_index": get_law_index_stats(),
+        "language_detection": get_language_detection_stats(),
+        "translation_cache": get_translation_cache_stats(),
+        "answer_cache": get_answer_cache_stats(),
+        "embedding_cache": get_embedding_cache_stats(app.emb),
+        "retrievers": get_retriever_cache_stats(),
+        "mst_index": get_mst_index_stats(),
+        "vsic_index": get_vsic_index_stats(),
+        "kcn_query_analysis": excel_kcn_handler.analysis_stats(),
+        "kcn_analysis_cache": get_query_analysis_cache_stats(),
         "trigger_response": CONTACT_TRIGGER_RESPONSE,
         "excel_file": EXCEL_FILE_PATH,
         "geojson_file": GEOJSON_IZ_PATH
@@ -608,6 +661,28 @@ async def get_chat_history(session_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ---------------------------------------
+# 🔧 Route: /diagnostics/kcn-coordinates (GET) - KCN/CCN chưa ghép được tọa độ
+# ---------------------------------------
+@app_fastapi.get("/diagnostics/kcn-coordinates", summary="Các KCN/CCN trong Excel không ghép được tọa độ GeoJSON")
+async def kcn_coordinate_diagnostics():
+    return excel_kcn_handler.coordinate_diagnostics()
+
+# ---------------------------------------
+# 🔧 Route: /admin/law-index/refresh (POST) - Load lại index điều luật
+# ---------------------------------------
+@app_fastapi.post("/admin/law-index/refresh", summary="Load lại index điều luật trong RAM")
+async def admin_refresh_law_index(request: Request):
+    # Chưa cấu hình ADMIN_TOKEN -> đóng endpoint, không mở cho mọi người
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or request.headers.get("X-Admin-Token") != admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    try:
+        return await run_in_threadpool(refresh_law_index)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Không load được law index: {str(e)}")
+
 # ---------------------------------------
 # 🔟 Run server
 # ---------------------------------------
@@ -276,7 +276,8 @@ async def predict(data: Question, request: Request):
         handled, excel_payload = await run_in_threadpool(
             excel_kcn_handler.process_query,
             question,
-            True
+            True,
+            as_string=False  # nhận dict, FastAPI serialize một lần
         )
 
         if handled and excel_payload:
@@ -0,0 +1,161 @@
+# msn_2018/build_crosswalk.py
+"""
+Job offline: build bảng đối chiếu (crosswalk) mã ngành VSIC
+QĐ 27/2018/QĐ-TTg <-> QĐ 36/2025/QĐ-TTg.
+
+Nguồn:
+  - data_msn_2018/ma_nganh_27.json
+  - json/quyet_dinh_36_by_sections_01_99.json
+Kết quả (mặc định data_msn_2018/vsic_crosswalk_2018_2025.json), mỗi mã một trạng thái:
+  - unchanged : cùng mã, cùng tên
+  - renamed   : cùng mã, tên khác
+  - removed   : chỉ có trong 2018 và KHÔNG xuất hiện ở bất kỳ đâu trong văn bản 2025
+                (không tiêu đề, không được nhắc tới, không còn mã con / nhóm, ngành cha)
+                (moved_to nếu cùng tên với một mã mới của 2025)
+  - unverified : không kết luận được do file 2025 (trích từ PDF) thiếu/cắt tiêu đề:
+                  * mã chỉ có trong 2018 nhưng vẫn được nhắc trong văn bản 2025
+                    ("... được phân vào nhóm 05100 (...)" - tiêu đề "051 - 0510 - 05100" bị mất)
+                  * mã chỉ có trong 2018 nhưng một cấp cha (nhóm / ngành cấp 4, 3) hoặc mã con
+                    vẫn có trong 2025
+                  * mã chỉ có trong 2018 thuộc ngành cấp 2 bị mất tiêu đề trong file 2025
+                    (ví dụ 13, 46, 47, 55, 56, 86: còn mã con nhưng không có dòng "46: ...")
+                  * cùng mã, tên một bên là phần đầu của tên bên kia (tiêu đề bị cắt)
+  - added     : chỉ có trong 2025   (moved_from nếu cùng tên với một mã bị bỏ của 2018)
+  - not_covered : mã 2018 thuộc ngành cấp 2 không có trong file 2025 (thiếu dữ liệu nguồn,
+                  KHÔNG kết luận là bị bỏ)
+
+Chạy lại khi một trong hai file nguồn thay đổi:
+    python -m msn_2018.build_crosswalk [--out PATH]
+"""
+import argparse
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Set
+
+from msn_2018.vsic_index import VSICCodeIndex, with_implicit_codes
+
+DEFAULT_OUT = Path(__file__).resolve().parent.parent / "data_msn_2018" / "vsic_crosswalk_2018_2025.json"
+
+# Hai cách bỏ dấu thanh (hoá/hóa, thuỷ/thủy) -> quy về một kiểu trước khi so tên
+_TONE_VARIANTS = {
+    "oá": "óa", "oà": "òa", "oả": "ỏa", "oã": "õa", "oạ": "ọa",
+    "oé": "óe", "oè": "òe", "oẻ": "ỏe", "oẽ": "õe", "oẹ": "ọe",
+    "uý": "úy", "uỳ": "ùy", "uỷ": "ủy", "uỹ": "ũy", "uỵ": "ụy",
+}
+_TONE_RE = re.compile("|".join(_TONE_VARIANTS))
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def normalize_name(name: str) -> str:
+    t = unicodedata.normalize("NFC", name or "").lower()
+    t = _TONE_RE.sub(lambda m: _TONE_VARIANTS[m.group(0)], t)
+    return _NON_WORD_RE.sub(" ", t).strip()
+
+
+def _truncated(name_a: str, name_b: str) -> bool:
+    """Tên này là phần đầu của tên kia -> nhiều khả năng tiêu đề bị cắt khi trích PDF."""
+    a, b = normalize_name(name_a), normalize_name(name_b)
+    return a != b and (a.startswith(b) or b.startswith(a))
+
+
+# Mọi token 2-5 chữ số đứng riêng (không thuộc số thập phân / ngày tháng / số hiệu văn bản)
+_CODE_TOKEN_RE = re.compile(r"(?<![\d/.,])\d{2,5}(?![\d/]|[.,]\d)")
+
+
+def _codes_mentioned(path: Path) -> Set[str]:
+    """Các mã (token số) xuất hiện ở bất kỳ đâu trong văn bản 2025, kể cả trong phần mô tả."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    mentioned: Set[str] = set()
+    for section in (data.get("sections") or {}).values():
+        mentioned.update(_CODE_TOKEN_RE.findall(section.get("text") or ""))
+    return mentioned
+
+
+def build_crosswalk(index: VSICCodeIndex) -> Dict:
+    codes_2018 = with_implicit_codes(index._entries["2018"])
+    codes_2025 = with_implicit_codes(index._entries["2025"])
+    covered = {c[:2] for c in codes_2025}
+    # Mã "còn trong 2025": có tiêu đề, hoặc được nhắc ở đâu đó trong văn bản 2025
+    # (token 5 số luôn là mã ngành cấp 5; token ngắn hơn chỉ tính khi trùng một mã 2018)
+    mentioned = _codes_mentioned(index.path_2025)
+    present_2025 = set(codes_2025) | (mentioned & set(codes_2018)) | {m for m in mentioned if len(m) == 5}
+    prefixes_2025 = {c[:n] for c in present_2025 for n in range(2, len(c) + 1)}
+
+    result: Dict[str, Dict] = {}
+    removed: Dict[str, List[str]] = {}
+    for code, old in codes_2018.items():
+        new = codes_2025.get(code)
+        if new is not None:
+            same = normalize_name(old.name) == normalize_name(new.name)
+            status = "unchanged" if same else "renamed"
+            if _truncated(old.name, new.name):
+                status = "unverified"
+            result[code] = {
+                "status": status,
+                "level": old.level,
+                "name_2018": old.name,
+                "name_2025": new.name,
+            }
+        elif code[:2] not in covered:
+            result[code] = {"status": "not_covered", "level": old.level, "name_2018": old.name}
+        elif (
+            code in prefixes_2025
+            or any(code[:n] in present_2025 for n in range(3, len(code)))
+            or code[:2] not in codes_2025
+        ):
+            # Bản thân mã / mã con / một cấp cha dưới ngành cấp 2 vẫn có hoặc được nhắc
+            # trong văn bản 2025, hoặc ngành cấp 2 mất tiêu đề (trích PDF thiếu)
+            # -> nhiều khả năng chỉ mất tiêu đề, không kết luận là bị bỏ
+            result[code] = {"status": "unverified", "level": old.level, "name_2018": old.name}
+        else:
+            result[code] = {"status": "removed", "level": old.level, "name_2018": old.name}
+            removed.setdefault(normalize_name(old.name), []).append(code)
+
+    for code, new in codes_2025.items():
+        if code in codes_2018:
+            continue
+        entry = {"status": "added", "level": new.level, "name_2025": new.name}
+        # Cùng tên với mã bị bỏ ở CÙNG cấp -> coi là chuyển mã
+        sources = [c for c in removed.get(normalize_name(new.name), []) if len(c) == len(code)]
+        if sources:
+            entry["moved_from"] = sources
+            for old_code in sources:
+                result[old_code].setdefault("moved_to", []).append(code)
+        result[code] = entry
+
+    summary: Dict[str, int] = {}
+    for entry in result.values():
+        summary[entry["status"]] = summary.get(entry["status"], 0) + 1
+    summary["moved"] = sum(1 for e in result.values() if "moved_to" in e)
+
+    return {
+        "source_2018": index.path_2018.name,
+        "source_2025": index.path_2025.name,
+        "not_covered_divisions": sorted({c[:2] for c, e in result.items() if e["status"] == "not_covered"}),
+        "summary": summary,
+        "codes": dict(sorted(result.items())),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build crosswalk VSIC 2018 <-> 2025")
+    parser.add_argument("--out", default=str(DEFAULT_OUT))
+    args = parser.parse_args()
+
+    crosswalk = build_crosswalk(VSICCodeIndex().load())
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(crosswalk, f, ensure_ascii=False, separators=(",", ":"))
+
+    print(f"✅ Crosswalk: {len(crosswalk['codes'])} mã -> {out}")
+    print(f"   {crosswalk['summary']}")
+    if crosswalk["not_covered_divisions"]:
+        print(f"⚠️ File 2025 không có ngành: {', '.join(crosswalk['not_covered_divisions'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# msn_2018/crosswalk.py
+"""
+Trả lời câu hỏi SO SÁNH mã ngành 2018 <-> 2025 từ bảng crosswalk đã build sẵn
+(msn_2018/build_crosswalk.py), không retrieval, không LLM.
+
+Chỉ dùng khi câu hỏi nêu mã cụ thể, có ý so sánh/thay đổi và mọi mã đều có
+trạng thái chắc chắn trong bảng (không phải not_covered / unverified); câu hỏi
+cần giải thích/phân tích vẫn đi qua LLM như cũ.
+
+ENV (tuỳ chọn):
+  - VSIC_CROSSWALK_PATH : file crosswalk (mặc định data_msn_2018/vsic_crosswalk_2018_2025.json)
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from msn_2018.vsic_index import SYSTEM_LABELS, extract_vsic_codes
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data_msn_2018" / "vsic_crosswalk_2018_2025.json"
+
+_COMPARE_KEYWORDS = (
+    "so sánh", "khác nhau", "khác gì", "khác biệt", "thay đổi", "đổi", "còn không", "bị bỏ", "bãi bỏ",
+    "thêm mới", "bổ sung", "chuyển", "mã cũ", "mã mới",
+)
+_NARRATIVE_KEYWORDS = (
+    "giải thích", "tại sao", "vì sao", "phân tích", "chi tiết", "hướng dẫn", "ví dụ",
+)
+
+
+class VSICCrosswalk:
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("VSIC_CROSSWALK_PATH") or _DEFAULT_PATH)
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.codes: Dict[str, Dict] = data.get("codes") or {}
+        self.summary: Dict[str, int] = data.get("summary") or {}
+
+    def get(self, code: str) -> Optional[Dict]:
+        return self.codes.get(code)
+
+    def describe(self, code: str) -> Optional[str]:
+        entry = self.codes.get(code)
+        if entry is None:
+            return None
+
+        old_label, new_label = SYSTEM_LABELS["2018"], SYSTEM_LABELS["2025"]
+        status = entry["status"]
+        name_2018, name_2025 = entry.get("name_2018"), entry.get("name_2025")
+
+        if status == "unchanged":
+            return f"- Mã {code}: giữ nguyên ở cả hai quyết định — {name_2025}."
+        if status == "renamed":
+            return (
+                f"- Mã {code}: giữ mã nhưng đổi tên.\n"
+                f"  + Theo {old_label}: {name_2018}\n"
+                f"  + Theo {new_label}: {name_2025}"
+            )
+        if status == "removed":
+            text = f"- Mã {code} ({name_2018}) theo {old_label} không còn trong {new_label}."
+            if entry.get("moved_to"):
+                text += f" Nội dung tương ứng chuyển sang mã {', '.join(entry['moved_to'])}."
+            return text
+        if status == "added":
+            text = f"- Mã {code} ({name_2025}) là mã mới theo {new_label}, không có trong {old_label}."
+            if entry.get("moved_from"):
+                text += f" Tương ứng mã {', '.join(entry['moved_from'])} theo {old_label}."
+            return text
+        # not_covered / unverified: dữ liệu 2025 thiếu hoặc bị cắt -> để LLM/retrieval xử lý
+        return None
+
+    def answer(self, question: str) -> Optional[str]:
+        """Câu trả lời tiếng Việt, hoặc None nếu câu hỏi không phù hợp để trả lời từ bảng."""
+        q = (question or "").lower()
+        if not any(k in q for k in _COMPARE_KEYWORDS) or any(k in q for k in _NARRATIVE_KEYWORDS):
+            return None
+
+        query = extract_vsic_codes(question)
+        if not query["codes"] or query["prefixes"]:
+            return None
+
+        lines = [self.describe(code) for code in query["codes"]]
+        if any(line is None for line in lines):
+            return None
+
+        return (
+            f"So sánh mã ngành theo {SYSTEM_LABELS['2018']} và {SYSTEM_LABELS['2025']}:\n"
+            + "\n".join(lines)
+        )
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_crosswalk: Optional[VSICCrosswalk] = None
+_crosswalk_loaded = False
+_crosswalk_lock = threading.Lock()
+
+
+def get_vsic_crosswalk() -> Optional[VSICCrosswalk]:
+    """Bảng crosswalk dùng chung, None nếu chưa build file."""
+    global _crosswalk, _crosswalk_loaded
+    if not _crosswalk_loaded:
+        with _crosswalk_lock:
+            if not _crosswalk_loaded:
+                try:
+                    _crosswalk = VSICCrosswalk()
+                except Exception as e:
+                    print(f"⚠️ Không load được VSIC crosswalk (dùng LLM so sánh): {e}")
+                    _crosswalk = None
+                _crosswalk_loaded = True
+    return _crosswalk
@@ -1,20 +1,12 @@
 import os
-from pinecone import Pinecone as PineconeClient
 from langchain_pinecone import Pinecone
 from langchain_openai import OpenAIEmbeddings
 
+from data_processing.retriever_cache import get_cached_retriever, get_pinecone_client
 
-def load_vsic_2018_retriever(embedding: OpenAIEmbeddings):
-    """
-    Load Pinecone retriever cho VSIC 2018
-    """
-    pinecone_api_key = os.getenv("PINECONE_API_KEY")
-    index_name = os.getenv("PINECONE_INDEX_NAME_MSN_2018")
 
-    if not pinecone_api_key or not index_name:
-        raise RuntimeError("Thiếu cấu hình Pinecone cho VSIC 2018")
-
-    pc = PineconeClient(api_key=pinecone_api_key)
+def _build_vsic_2018_retriever(embedding: OpenAIEmbeddings, index_name: str):
+    pc = get_pinecone_client()
 
     if index_name not in pc.list_indexes().names():
         raise RuntimeError(f"Pinecone index VSIC 2018 '{index_name}' không tồn tại")
@@ -33,3 +25,21 @@ def load_vsic_2018_retriever(embedding: OpenAIEmbeddings):
 
     retriever = vectordb.as_retriever(search_kwargs={"k": 10})
     return retriever
+
+
+def load_vsic_2018_retriever(embedding: OpenAIEmbeddings):
+    """
+    Load Pinecone retriever cho VSIC 2018 (build một lần cho process,
+    list_indexes/describe_index_stats chạy lại trong thread nền).
+    """
+    pinecone_api_key = os.getenv("PINECONE_API_KEY")
+    index_name = os.getenv("PINECONE_INDEX_NAME_MSN_2018")
+
+    if not pinecone_api_key or not index_name:
+        raise RuntimeError("Thiếu cấu hình Pinecone cho VSIC 2018")
+
+    return get_cached_retriever(
+        f"vsic_2018:{index_name}",
+        embedding,
+        lambda: _build_vsic_2018_retriever(embedding, index_name),
+    )
@@ -0,0 +1,288 @@
+# msn_2018/vsic_index.py
+"""
+Index mã ngành VSIC trong RAM cho cả hai hệ thống:
+  - 2018 (QĐ 27/2018/QĐ-TTg): data_msn_2018/ma_nganh_27.json (mapping phẳng mã -> tên)
+  - 2025 (QĐ 36/2025/QĐ-TTg): json/quyet_dinh_36_by_sections_01_99.json
+    (tách theo ngành cấp 2; tiêu đề dạng "011: ...", "0111 - 01110: ...", "021 - 0210: ...")
+
+Câu hỏi nêu mã cụ thể ("01110", "mã ngành 0118") hoặc tiền tố ("0111*")
+được trả lời từ dict này thay vì semantic search trên hai index Pinecone;
+retrieval chỉ còn dùng cho câu hỏi ngành nghề dạng văn bản tự do và cho hệ
+thống không tra được mã nào trong dict.
+
+Tra mã: dict. Tra tiền tố: danh sách mã đã sắp xếp + bisect (tương đương
+duyệt nhánh trie, nhưng gọn hơn với ~1000 mã mỗi hệ thống).
+
+Dữ liệu nguồn không đầy đủ nên khi load:
+  - cấp chỉ có một mã con được bổ sung (2018 chỉ ghi "01110", không có "0111");
+  - tiêu đề 2025 bị ngắt dòng trong PDF được nối lại;
+  - mã không có tiêu đề riêng (file 2025 thiếu tiêu đề ngành 46, 47...) nhưng có
+    mã con thì trả về danh sách mã con thay vì coi là không có.
+
+ENV (tuỳ chọn):
+  - VSIC_2018_JSON_PATH
+  - VSIC_2025_JSON_PATH
+"""
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from msn_2018.utils import detect_vsic_level
+
+_BASE_DIR = Path(__file__).resolve().parent.parent
+
+SYSTEMS = ("2025", "2018")
+
+SYSTEM_LABELS = {
+    "2025": "Quyết định số 36/2025/QĐ-TTg",
+    "2018": "Quyết định số 27/2018/QĐ-TTg",
+}
+
+_HEADING_RE = re.compile(r"^(\d{2,5})(?:\s*-\s*(\d{4,5}))?\s*:\s*(.+)$", re.MULTILINE)
+# Tiêu đề dài bị ngắt dòng: phần tiếp theo nằm ở dòng kế, bắt đầu bằng chữ thường
+_HEADING_MAX_CONTINUATION_LINES = 2
+_WS_RE = re.compile(r"\s+")
+
+# Mã 5 số luôn coi là mã ngành; mã 2-4 số chỉ khi đi sau từ khoá hoặc có "*"
+_SUBCLASS_RE = re.compile(r"(?<![\d/.,])(\d{5})(?![\d/*])")
+_PREFIX_RE = re.compile(r"(?<![\d/.,])(\d{1,5})\*")
+_KEYWORD_CODE_RE = re.compile(
+    r"(?:mã ngành|mã|ngành|nhóm|cấp)\s*(?:số\s*)?(?:cấp\s*\d\s*)?(\d{2,4})(?![\d/*])",
+    re.IGNORECASE,
+)
+
+_DESCRIPTION_MAX_CHARS = 1500
+
+
+@dataclass
+class VSICEntry:
+    system: str
+    code: str
+    name: str
+    level: str
+    description: str = ""
+
+
+def _clean(text: str) -> str:
+    return _WS_RE.sub(" ", text or "").strip()
+
+
+def _heading_name(text: str, m: "re.Match") -> Tuple[str, int]:
+    """Tên đầy đủ của tiêu đề (nối các dòng bị ngắt) và vị trí kết thúc tiêu đề."""
+    parts = [m.group(3)]
+    end = m.end()
+    for _ in range(_HEADING_MAX_CONTINUATION_LINES):
+        if not text.startswith("\n", end):
+            break
+        line_end = text.find("\n", end + 1)
+        line_end = len(text) if line_end < 0 else line_end
+        line = text[end + 1:line_end].strip()
+        if not line or not line[0].islower():
+            break
+        parts.append(line)
+        end = line_end
+    return _clean(" ".join(parts)), end
+
+
+def with_implicit_codes(entries: Dict[str, VSICEntry]) -> Dict[str, VSICEntry]:
+    """
+    Nhóm chỉ có một mã con thường chỉ được ghi ở một cấp ("01110" nhưng không có "0111",
+    hoặc "013" nhưng không có "0130"). Bổ sung cấp còn thiếu (cùng tên) để tra được
+    ở mọi cấp và để hai nguồn so được với nhau. Chỉ trả về mã số.
+    """
+    digits = {c: e for c, e in entries.items() if c.isdigit()}
+    out = dict(digits)
+    for code, entry in digits.items():
+        # con duy nhất "xxxx0" -> cha "xxxx"
+        if len(code) >= 4 and code.endswith("0") and code[:-1] not in out:
+            out[code[:-1]] = VSICEntry(entry.system, code[:-1], entry.name, detect_vsic_level(code[:-1]), entry.description)
+        # cha không có con nào ghi ở cấp kế tiếp -> con "xxx0"
+        if 3 <= len(code) <= 4 and code + "0" not in out:
+            has_child = any(c != code and c.startswith(code) for c in digits)
+            has_direct_child = any(len(c) == len(code) + 1 and c.startswith(code) for c in digits)
+            if has_child and not has_direct_child:
+                out[code + "0"] = VSICEntry(entry.system, code + "0", entry.name, detect_vsic_level(code + "0"), entry.description)
+    return out
+
+
+def _load_2018(path: Path) -> Dict[str, VSICEntry]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    entries: Dict[str, VSICEntry] = {}
+    for code, name in data.items():
+        if isinstance(name, str):
+            code = code.strip()
+            entries[code] = VSICEntry("2018", code, _clean(name), detect_vsic_level(code))
+    return entries
+
+
+def _load_2025(path: Path) -> Dict[str, VSICEntry]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    entries: Dict[str, VSICEntry] = {}
+    for section in (data.get("sections") or {}).values():
+        text = section.get("text") or ""
+        headings = list(_HEADING_RE.finditer(text))
+        for i, m in enumerate(headings):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            name, name_end = _heading_name(text, m)
+            description = _clean(text[name_end:end])[:_DESCRIPTION_MAX_CHARS]
+            # "0111 - 01110: Trồng lúa" -> hai cấp liền nhau cùng tên
+            for code in filter(None, (m.group(1), m.group(2))):
+                entries.setdefault(
+                    code, VSICEntry("2025", code, name, detect_vsic_level(code), description)
+                )
+    return entries
+
+
+class VSICCodeIndex:
+    def __init__(self, path_2018: Optional[str] = None, path_2025: Optional[str] = None):
+        self.path_2018 = Path(path_2018 or os.getenv("VSIC_2018_JSON_PATH") or _BASE_DIR / "data_msn_2018" / "ma_nganh_27.json")
+        self.path_2025 = Path(path_2025 or os.getenv("VSIC_2025_JSON_PATH") or _BASE_DIR / "json" / "quyet_dinh_36_by_sections_01_99.json")
+        self._entries: Dict[str, Dict[str, VSICEntry]] = {"2018": {}, "2025": {}}
+        self._sorted: Dict[str, List[str]] = {"2018": [], "2025": []}
+        # Mã cấp 2 (ngành) -> chữ cái ngành cấp 1 (A, B, C...) theo thứ tự file 2018
+        self._section_of: Dict[str, str] = {}
+
+    def load(self) -> "VSICCodeIndex":
+        loaders = {"2018": (_load_2018, self.path_2018), "2025": (_load_2025, self.path_2025)}
+        for system, (loader, path) in loaders.items():
+            try:
+                entries = loader(path)
+                entries.update(with_implicit_codes(entries))
+                self._entries[system] = entries
+            except Exception as e:
+                print(f"⚠️ VSIC index: không đọc được {path}: {e}")
+                self._entries[system] = {}
+            self._sorted[system] = sorted(c for c in self._entries[system] if c.isdigit())
+
+        section = None
+        for code in self._entries["2018"]:
+            if code.isalpha():
+                section = code
+            elif len(code) == 2 and section:
+                self._section_of[code] = section
+        return self
+
+    # ==========================================================
+    # TRA CỨU
+    # ==========================================================
+    def get(self, code: str, system: str) -> Optional[VSICEntry]:
+        return self._entries[system].get(code)
+
+    def lookup(self, code: str) -> Dict[str, Optional[VSICEntry]]:
+        return {system: self.get(code, system) for system in SYSTEMS}
+
+    def prefix(self, prefix: str, system: str, limit: int = 50) -> List[VSICEntry]:
+        codes = self._sorted[system]
+        out: List[VSICEntry] = []
+        for code in codes[bisect_left(codes, prefix):]:
+            if not code.startswith(prefix) or len(out) >= limit:
+                break
+            out.append(self._entries[system][code])
+        return out
+
+    def hierarchy(self, code: str, system: str) -> List[VSICEntry]:
+        """Các cấp cha của code (ngành cấp 1 -> cấp trên liền kề), chỉ gồm mã có trong hệ thống."""
+        chain: List[VSICEntry] = []
+        section = self._section_of.get(code[:2])
+        if section and system == "2018" and section in self._entries["2018"]:
+            chain.append(self._entries["2018"][section])
+        for n in range(2, len(code)):
+            parent = self._entries[system].get(code[:n])
+            if parent is not None:
+                chain.append(parent)
+        return chain
+
+    def stats(self) -> Dict[str, int]:
+        return {f"codes_{system}": len(self._entries[system]) for system in SYSTEMS}
+
+    # ==========================================================
+    # CONTEXT CHO PIPELINE
+    # ==========================================================
+    def _format_entry(self, entry: VSICEntry) -> str:
+        lines = [f"Mã ngành {entry.code} ({entry.level}): {entry.name}"]
+        parents = self.hierarchy(entry.code, entry.system)
+        if parents:
+            lines.append("Thuộc: " + " > ".join(f"{p.code} {p.name}" for p in parents))
+        if entry.description:
+            lines.append(entry.description)
+        return "\n".join(lines)
+
+    def build_contexts(self, text: str) -> Optional[Dict[str, str]]:
+        """
+        Context theo từng hệ thống cho các mã/tiền tố trong câu hỏi.
+        None nếu câu hỏi không có mã nào tra được (-> dùng retrieval).
+        Hệ thống không tra được mã nào có context "" (pipeline tự retrieval riêng
+        cho hệ thống đó, không được hiểu là mã không được quy định).
+        """
+        query = extract_vsic_codes(text)
+        if not query["codes"] and not query["prefixes"]:
+            return None
+
+        contexts: Dict[str, List[str]] = {system: [] for system in SYSTEMS}
+        found = False
+        for system in SYSTEMS:
+            for code in query["codes"]:
+                entry = self.get(code, system)
+                if entry is not None:
+                    contexts[system].append(self._format_entry(entry))
+                    found = True
+                    continue
+                # Không có tiêu đề riêng (nguồn thiếu) nhưng có mã con -> liệt kê mã con
+                children = self.prefix(code, system)
+                if children:
+                    contexts[system].append(
+                        f"Mã {code} không có tiêu đề riêng trong dữ liệu, các mã con:\n"
+                        + "\n".join(f"- {e.code} ({e.level}): {e.name}" for e in children)
+                    )
+                    found = True
+            for prefix in query["prefixes"]:
+                children = self.prefix(prefix, system)
+                if children:
+                    contexts[system].append(
+                        f"Các mã bắt đầu bằng {prefix}:\n"
+                        + "\n".join(f"- {e.code} ({e.level}): {e.name}" for e in children)
+                    )
+                    found = True
+
+        if not found:
+            return None
+        return {system: "\n\n".join(parts) for system, parts in contexts.items()}
+
+
+def extract_vsic_codes(text: str) -> Dict[str, List[str]]:
+    """{'codes': [...], 'prefixes': [...]} theo thứ tự xuất hiện, không trùng."""
+    t = text or ""
+    prefixes = list(dict.fromkeys(_PREFIX_RE.findall(t)))
+    # "mã 2018 và 2025" là năm của hai quyết định, không phải mã ngành
+    keyword_codes = [c for c in _KEYWORD_CODE_RE.findall(t) if c not in SYSTEMS]
+    codes = list(dict.fromkeys(_SUBCLASS_RE.findall(t) + keyword_codes))
+    return {"codes": codes, "prefixes": prefixes}
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_index: Optional[VSICCodeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vsic_index() -> VSICCodeIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VSICCodeIndex().load()
+    return _index
+
+
+def get_vsic_index_stats() -> Dict[str, int]:
+    return _index.stats() if _index is not None else {}
@@ -0,0 +1,244 @@
+# mst/exact_index.py
+"""
+Index tra cứu CHÍNH XÁC mã số thuế -> bản ghi doanh nghiệp, O(1).
+
+Câu hỏi có MST dạng số (10 số, hoặc 13 số / "10 số-3 số" cho chi nhánh)
+không cần semantic search: tra thẳng index này; vector search chỉ còn dùng
+cho câu hỏi theo tên doanh nghiệp.
+
+Index build từ các file Excel/CSV trong MST_SOURCE_DIR và lưu thành một
+file nhị phân gọn, được mmap khi dùng (không load toàn bộ vào RAM):
+
+    header (64 byte)
+      magic "MSTIDX01" | slot_count u32 | record_count u32 | fingerprint 32 byte | padding
+    slots  (slot_count x 16 byte, open addressing, dò tuyến tính)
+      key u64 (MST 13 số dạng số nguyên, 0 = trống) | offset u32 | length u32
+    records
+      JSON UTF-8 của từng dòng (cột -> giá trị)
+
+fingerprint = sha256(tên + kích thước + mtime các file nguồn): file nguồn đổi
+thì index tự build lại ở lần load kế tiếp.
+
+ENV (tuỳ chọn):
+  - MST_SOURCE_DIR : thư mục file mã số thuế (mặc định <thư mục project>/masothue)
+  - MST_INDEX_PATH : file index (mặc định <thư mục project>/.cache/mst_index.bin)
+
+CLI: python -m mst.exact_index   (build lại index)
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_BASE_DIR = Path(__file__).resolve().parent.parent
+
+_MAGIC = b"MSTIDX01"
+_HEADER = struct.Struct("<8sII32s")
+_HEADER_SIZE = 64
+_SLOT = struct.Struct("<QII")
+
+_SOURCE_SUFFIXES = (".xlsx", ".xls", ".csv")
+_MST_COLUMN = "Mã số thuế"
+
+# 10 số, tuỳ chọn "-xxx" chi nhánh; hoặc 13 số liền
+_MST_RE = re.compile(r"(?<!\d)(\d{10})(?:\s*-\s*(\d{3})|(\d{3}))?(?!\d)")
+
+
+def normalize_mst(value) -> Optional[int]:
+    """'0111074800' -> 111074800000, '8787591869-001' -> 8787591869001 (key 13 số)."""
+    digits = re.sub(r"\D", "", str(value or ""))
+    if len(digits) == 10:
+        digits += "000"
+    if len(digits) != 13:
+        return None
+    key = int(digits)
+    return key or None
+
+
+def extract_msts(text: str) -> List[str]:
+    """Các MST xuất hiện trong câu hỏi, theo thứ tự, không trùng."""
+    found: List[str] = []
+    for head, branch_dash, branch in _MST_RE.findall(text or ""):
+        branch = branch_dash or branch
+        mst = f"{head}-{branch}" if branch else head
+        if mst not in found:
+            found.append(mst)
+    return found
+
+
+def _hash(key: int, mask: int) -> int:
+    return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 20 & mask
+
+
+def _source_files(source_dir: str) -> List[Path]:
+    root = Path(source_dir)
+    if not root.is_dir():
+        return []
+    return sorted(p for p in root.iterdir() if p.suffix.lower() in _SOURCE_SUFFIXES)
+
+
+def source_fingerprint(source_dir: str) -> bytes:
+    h = hashlib.sha256()
+    for p in _source_files(source_dir):
+        st = p.stat()
+        h.update(f"{p.name}|{st.st_size}|{int(st.st_mtime)}\n".encode("utf-8"))
+    return h.digest()
+
+
+def _read_records(source_dir: str) -> List[Dict[str, str]]:
+    import pandas as pd
+
+    records: List[Dict[str, str]] = []
+    for path in _source_files(source_dir):
+        try:
+            # dtype=str: giữ số 0 ở đầu MST / số điện thoại
+            if path.suffix.lower() == ".csv":
+                df = pd.read_csv(path, dtype=str)
+            else:
+                df = pd.read_excel(path, dtype=str)
+        except Exception as e:
+            print(f"⚠️ MST index: bỏ qua {path.name}: {e}")
+            continue
+
+        if _MST_COLUMN not in df.columns:
+            print(f"⚠️ MST index: {path.name} không có cột '{_MST_COLUMN}'")
+            continue
+
+        for row in df.to_dict("records"):
+            records.append({
+                str(col).strip(): str(val).strip()
+                for col, val in row.items()
+                if isinstance(val, str) and val.strip()
+            })
+    return records
+
+
+def build_mst_index(source_dir: str, index_path: str) -> int:
+    """Build file index từ source_dir. Trả về số MST đã index."""
+    by_key: Dict[int, bytes] = {}
+    for record in _read_records(source_dir):
+        key = normalize_mst(record.get(_MST_COLUMN))
+        if key is not None and key not in by_key:
+            by_key[key] = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    slot_count = 8
+    while slot_count < len(by_key) * 2:
+        slot_count *= 2
+    mask = slot_count - 1
+
+    slots = bytearray(slot_count * _SLOT.size)
+    data = bytearray()
+    data_start = _HEADER_SIZE + len(slots)
+    for key, payload in by_key.items():
+        i = _hash(key, mask)
+        while _SLOT.unpack_from(slots, i * _SLOT.size)[0]:
+            i = (i + 1) & mask
+        _SLOT.pack_into(slots, i * _SLOT.size, key, data_start + len(data), len(payload))
+        data += payload
+
+    header = _HEADER.pack(_MAGIC, slot_count, len(by_key), source_fingerprint(source_dir))
+    path = Path(index_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header.ljust(_HEADER_SIZE, b"\0"))
+        f.write(slots)
+        f.write(data)
+    # Thay file một lần -> process khác đang mmap file cũ không bị ảnh hưởng
+    os.replace(tmp, path)
+    return len(by_key)
+
+
+class MSTExactIndex:
+    def __init__(self, index_path: str):
+        self._file = open(index_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.slot_count, self.record_count, self.fingerprint = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"File index MST không hợp lệ: {index_path}")
+        self._mask = self.slot_count - 1
+
+    def get(self, mst) -> Optional[Dict[str, str]]:
+        key = normalize_mst(mst)
+        if key is None:
+            return None
+
+        i = _hash(key, self._mask)
+        for _ in range(self.slot_count):
+            slot_key, offset, length = _SLOT.unpack_from(self._mm, _HEADER_SIZE + i * _SLOT.size)
+            if slot_key == 0:
+                return None
+            if slot_key == key:
+                return json.loads(self._mm[offset:offset + length].decode("utf-8"))
+            i = (i + 1) & self._mask
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_index: Optional[MSTExactIndex] = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def _paths():
+    return (
+        os.getenv("MST_SOURCE_DIR", str(_BASE_DIR / "masothue")),
+        os.getenv("MST_INDEX_PATH", str(_BASE_DIR / ".cache" / "mst_index.bin")),
+    )
+
+
+def get_mst_index() -> Optional[MSTExactIndex]:
+    """
+    Index dùng chung (mmap). Chưa có file hoặc file nguồn đã đổi -> build lại.
+    Không có dữ liệu / lỗi -> None (handler dùng vector search như cũ).
+    """
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+
+    with _index_lock:
+        if _index_loaded:
+            return _index
+
+        source_dir, index_path = _paths()
+        try:
+            index = MSTExactIndex(index_path) if Path(index_path).exists() else None
+            if index is None or index.fingerprint != source_fingerprint(source_dir):
+                if index is not None:
+                    index.close()
+                if not _source_files(source_dir):
+                    index = None
+                else:
+                    n = build_mst_index(source_dir, index_path)
+                    print(f"✅ MST index: build {n} mã số thuế -> {index_path}")
+                    index = MSTExactIndex(index_path)
+            _index = index
+        except Exception as e:
+            print(f"⚠️ Không load được MST index (dùng vector search): {e}")
+            _index = None
+
+        _index_loaded = True
+        return _index
+
+
+def get_mst_index_stats() -> Dict:
+    if _index is None:
+        return {"loaded": False}
+    return {"loaded": True, "records": _index.record_count, "slots": _index.slot_count}
+
+
+if __name__ == "__main__":
+    src, out = _paths()
+    print(f"✅ Đã build {build_mst_index(src, out)} mã số thuế -> {out}")
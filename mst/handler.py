@@ -1,8 +1,38 @@
 from langchain_core.messages import SystemMessage, HumanMessage
 from mst.retriever import get_mst_retriever
+from mst.exact_index import extract_msts, get_mst_index
 from system_prompts.mst_system import MST_SYSTEM_PROMPT  
 
+
+def format_mst_record(record: dict) -> str:
+    return "\n".join(f"{col}: {val}" for col, val in record.items())
+
+
+def lookup_mst_exact(message: str):
+    """
+    Câu hỏi có MST dạng số -> tra index chính xác (không embedding, không LLM).
+    Trả về None nếu không có MST nào trong câu hỏi tìm thấy trong index.
+    """
+    msts = extract_msts(message)
+    if not msts:
+        return None
+
+    index = get_mst_index()
+    if index is None:
+        return None
+
+    records = [r for r in (index.get(mst) for mst in msts) if r]
+    if not records:
+        return None
+
+    return "\n\n".join(format_mst_record(r) for r in records)
+
+
 def handle_mst_query(message: str, llm, embedding):
+    exact = lookup_mst_exact(message)
+    if exact:
+        return exact
+
     retriever = get_mst_retriever(embedding)
     if retriever is None:
         return None
@@ -1,20 +1,33 @@
 import os
-from pinecone import Pinecone as PineconeClient
 from langchain_pinecone import Pinecone
 
-def get_mst_retriever(embedding):
-    PINECONE_MST_INDEX = os.getenv("PINECONE_INDEX_NAME_MST")
-    PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+from data_processing.retriever_cache import get_cached_retriever, get_pinecone_client
 
-    if not PINECONE_MST_INDEX:
-        return None
 
-    pc = PineconeClient(api_key=PINECONE_API_KEY)
+def _build_mst_retriever(embedding, index_name: str):
+    pc = get_pinecone_client()
 
-    if PINECONE_MST_INDEX not in pc.list_indexes().names():
+    if index_name not in pc.list_indexes().names():
         return None
 
-    index = pc.Index(PINECONE_MST_INDEX)
+    index = pc.Index(index_name)
     vectordb = Pinecone(index=index, embedding=embedding, text_key="text")
 
     return vectordb.as_retriever(search_kwargs={"k": 5})
+
+
+def get_mst_retriever(embedding):
+    """
+    Retriever MST dùng chung cho process: build lần đầu được gọi,
+    kiểm tra lại index trong thread nền (data_processing.retriever_cache).
+    """
+    PINECONE_MST_INDEX = os.getenv("PINECONE_INDEX_NAME_MST")
+
+    if not PINECONE_MST_INDEX:
+        return None
+
+    return get_cached_retriever(
+        f"mst:{PINECONE_MST_INDEX}",
+        embedding,
+        lambda: _build_mst_retriever(embedding, PINECONE_MST_INDEX),
+    )
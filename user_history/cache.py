@@ -0,0 +1,177 @@
+# user_history/cache.py
+"""
+Cache LRU + TTL trong RAM cho N message gần nhất của từng session.
+
+- messages: hit -> không query Postgres; miss -> generation() + đọc DB rồi put() vào
+  cache (đọc lỗi thì cancel() thay cho put()).
+- add_message: append() ngay vào cache (write-through).
+- clear(): invalidate() session.
+
+Cache nằm trong từng process: nếu chạy nhiều worker, một session được
+phục vụ bởi worker khác có thể thấy dữ liệu cũ tối đa TTL giây.
+
+ENV (tuỳ chọn):
+  - CHAT_HISTORY_CACHE_ENABLED      : 1/0 bật tắt (mặc định 1)
+  - CHAT_HISTORY_CACHE_MAX_SESSIONS : số session tối đa giữ trong RAM (mặc định 2000)
+  - CHAT_HISTORY_CACHE_TTL          : số giây một session được giữ (mặc định 600)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+Row = Tuple[str, str]  # (role, content)
+
+
+@dataclass
+class _Entry:
+    rows: List[Row]
+    limit: int
+    # True nếu rows là TOÀN BỘ lịch sử session (DB trả về ít hơn limit)
+    complete: bool
+    expires_at: float
+
+
+class SessionHistoryCache:
+    def __init__(self, max_sessions: int = 2000, ttl: float = 600.0):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        # session_id -> generation (lấy từ bộ đếm chung _seq), đổi mỗi lần ghi; dùng để bỏ
+        # put() của lần đọc DB đã cũ. CHỈ giữ cho session đang có trong _data hoặc đang có
+        # lần đọc DB dở (_readers) -> dict không lớn theo tổng số session đã từng ghi
+        self._generations: Dict[str, int] = {}
+        # session_id -> số lần đọc DB đã lấy generation() nhưng chưa put()/cancel()
+        self._readers: Dict[str, int] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Các hàm _* dưới đây gọi khi đang giữ lock
+    def _bump(self, session_id: str) -> None:
+        # Session không cache và không ai đang đọc: không có put() nào cần bỏ
+        if session_id in self._generations:
+            self._seq += 1
+            self._generations[session_id] = self._seq
+
+    def _forget_generation(self, session_id: str) -> None:
+        if session_id not in self._data and not self._readers.get(session_id):
+            self._generations.pop(session_id, None)
+
+    def _drop(self, session_id: str) -> None:
+        self._data.pop(session_id, None)
+        self._forget_generation(session_id)
+
+    def _end_read(self, session_id: str) -> None:
+        left = self._readers.get(session_id, 0) - 1
+        if left > 0:
+            self._readers[session_id] = left
+        else:
+            self._readers.pop(session_id, None)
+
+    def get(self, session_id: str, limit: int) -> Optional[List[Row]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is not None and entry.expires_at <= now:
+                self._drop(session_id)
+                entry = None
+
+            if entry is None or (limit > entry.limit and not entry.complete):
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(session_id)
+            self.hits += 1
+            return list(entry.rows[-limit:]) if limit else list(entry.rows)
+
+    def generation(self, session_id: str) -> int:
+        """Gọi TRƯỚC khi đọc DB, truyền lại cho put() (hoặc gọi cancel() nếu đọc lỗi)."""
+        with self._lock:
+            self._readers[session_id] = self._readers.get(session_id, 0) + 1
+            return self._generations.setdefault(session_id, self._seq)
+
+    def cancel(self, session_id: str) -> None:
+        """Lần đọc DB sau generation() không thành công: không put()."""
+        with self._lock:
+            self._end_read(session_id)
+            self._forget_generation(session_id)
+
+    def put(self, session_id: str, rows: List[Row], limit: int, generation: int) -> None:
+        with self._lock:
+            self._end_read(session_id)
+            # Có add_message/clear xen vào trong lúc đọc DB -> rows đã cũ, bỏ qua
+            if self._generations.get(session_id) != generation:
+                self._forget_generation(session_id)
+                return
+
+            self._data[session_id] = _Entry(
+                rows=list(rows[-limit:]) if limit else list(rows),
+                limit=limit,
+                complete=len(rows) < limit,
+                expires_at=time.monotonic() + self.ttl,
+            )
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_sessions:
+                evicted, _ = self._data.popitem(last=False)
+                self._forget_generation(evicted)
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        with self._lock:
+            self._bump(session_id)
+            entry = self._data.get(session_id)
+            if entry is None:
+                return
+
+            entry.rows.append((role, content))
+            if entry.limit and len(entry.rows) > entry.limit:
+                del entry.rows[: len(entry.rows) - entry.limit]
+                entry.complete = False
+            entry.expires_at = time.monotonic() + self.ttl
+            self._data.move_to_end(session_id)
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            # Bump trước: lần đọc dở (nếu có) thấy generation đổi và bỏ put()
+            self._bump(session_id)
+            self._drop(session_id)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "sessions": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_cache: Optional[SessionHistoryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_history_cache() -> Optional[SessionHistoryCache]:
+    """Trả về cache dùng chung, hoặc None nếu tắt bằng CHAT_HISTORY_CACHE_ENABLED=0."""
+    global _cache
+    if os.getenv("CHAT_HISTORY_CACHE_ENABLED", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SessionHistoryCache(
+                    max_sessions=int(os.getenv("CHAT_HISTORY_CACHE_MAX_SESSIONS", "2000")),
+                    ttl=float(os.getenv("CHAT_HISTORY_CACHE_TTL", "600")),
+                )
+    return _cache
+
+
+def get_history_cache_stats() -> Dict[str, float]:
+    return _cache.stats() if _cache is not None else {}
@@ -1,30 +1,11 @@
 # user_history/repository.py
-import os
 from typing import List
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy import text
 
+from database.engine import get_engine
 from user_history.models import ChatMessage
 
-SUPABASE_DB_URL = os.getenv("DATABASE_URL")
-if not SUPABASE_DB_URL:
-    raise RuntimeError("DATABASE_URL is not set")
-
-_engine: Engine | None = None
-
-
-def get_engine() -> Engine:
-    global _engine
-    if _engine is None:
-        _engine = create_engine(
-            SUPABASE_DB_URL,
-            pool_pre_ping=True,
-            pool_size=5,
-            max_overflow=10,
-        )
-    return _engine
-
 
 def insert_message(msg: ChatMessage) -> None:
     sql = text("""
@@ -40,6 +21,41 @@ def insert_message(msg: ChatMessage) -> None:
         })
 
 
+def insert_messages(msgs: List[ChatMessage]) -> None:
+    """
+    Insert nhiều message trong MỘT câu lệnh multi-row
+    `insert ... values (...), (...), ...` và MỘT transaction.
+
+    Nếu mọi message đều có created_at thì ghi luôn cột này: trong cùng một
+    câu lệnh now() trả về cùng một giá trị, nên phải lấy thời điểm phía client
+    để giữ đúng thứ tự human -> ai khi đọc lại (order by created_at).
+    """
+    if not msgs:
+        return
+
+    with_ts = all(m.created_at is not None for m in msgs)
+    columns = "session_id, role, content" + (", created_at" if with_ts else "")
+
+    values = []
+    params = {}
+    for i, m in enumerate(msgs):
+        placeholders = [f":session_id_{i}", f":role_{i}", f":content_{i}"]
+        params[f"session_id_{i}"] = m.session_id
+        params[f"role_{i}"] = m.role
+        params[f"content_{i}"] = m.content
+        if with_ts:
+            placeholders.append(f":created_at_{i}")
+            params[f"created_at_{i}"] = m.created_at
+        values.append("(" + ", ".join(placeholders) + ")")
+
+    sql = text(
+        f"insert into chat_messages ({columns}) values " + ", ".join(values)
+    )
+    engine = get_engine()
+    with engine.begin() as conn:
+        conn.execute(sql, params)
+
+
 def fetch_recent_messages(
     session_id: str,
     limit: int = 20
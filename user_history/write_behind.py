@@ -0,0 +1,359 @@
+# user_history/write_behind.py
+"""
+Hàng đợi ghi trễ (write-behind) cho bảng chat_messages.
+
+add_message chỉ đẩy message vào hàng đợi trong RAM rồi trả về ngay;
+một thread nền gom message của MỌI session thành batch và ghi bằng
+một câu `insert ... values (...), (...)` (user_history.repository.insert_messages).
+
+- Flush khi đủ batch_size message HOẶC message cũ nhất đã chờ flush_interval giây.
+- Message chưa ghi xong vẫn được đọc lại qua read_with_pending().
+- shutdown() ghi hết hàng đợi trước khi process thoát (có đăng ký atexit).
+- Hàng đợi có giới hạn: quá max_queue thì bỏ message mới (enqueue trả về None);
+  batch ghi lỗi được trả lại hàng đợi tối đa max_requeues lần rồi bỏ
+  (có log + stats["dropped"]).
+
+ENV (tuỳ chọn):
+  - CHAT_HISTORY_WRITE_BEHIND      : 1/0 bật tắt (mặc định 1)
+  - CHAT_HISTORY_BATCH_SIZE        : số message tối đa mỗi batch (mặc định 50)
+  - CHAT_HISTORY_FLUSH_INTERVAL_MS : thời gian chờ tối đa trước khi flush (mặc định 200)
+  - CHAT_HISTORY_MAX_QUEUE         : số message tối đa chờ ghi (mặc định 10000)
+  - CHAT_HISTORY_MAX_REQUEUES      : số lần trả batch lỗi về hàng đợi trước khi bỏ (mặc định 5)
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from user_history.models import ChatMessage
+from user_history.repository import insert_messages
+
+
+@dataclass
+class _QueuedMessage:
+    message: ChatMessage
+    # Số lần batch chứa message đã ghi lỗi và bị trả lại hàng đợi
+    requeues: int = 0
+
+
+class ChatMessageWriteBehind:
+    def __init__(
+        self,
+        flush_fn: Callable[[List[ChatMessage]], None] = insert_messages,
+        batch_size: int = 50,
+        flush_interval: float = 0.2,
+        max_retries: int = 3,
+        max_queue: int = 10000,
+        max_requeues: int = 5,
+    ):
+        self._flush_fn = flush_fn
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.max_retries = max(1, max_retries)
+        self.max_queue = max(1, max_queue)
+        self.max_requeues = max(0, max_requeues)
+
+        # Một Condition duy nhất bảo vệ toàn bộ state bên dưới
+        self._cond = threading.Condition()
+        self._queue: Deque[_QueuedMessage] = deque()
+        # session_id -> message đã nhận nhưng chưa commit (kể cả đang ghi)
+        self._pending: Dict[str, List[ChatMessage]] = {}
+        # session_id -> số message đang nằm trong batch đang ghi
+        self._inflight: Dict[str, int] = {}
+        # session_id -> version, đổi mỗi khi pending của session thay đổi do commit/xoá.
+        # Giá trị lấy từ bộ đếm chung _seq; entry bị xoá khi session không còn gì chờ ghi,
+        # session không có entry dùng _pruned_seq (xem _version_of)
+        self._versions: Dict[str, int] = {}
+        self._seq = 0
+        self._pruned_seq = 0
+
+        self._last_ts: Optional[datetime] = None
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "errors": 0,
+            "dropped": 0,
+        }
+
+    # ==========================================================
+    # GHI
+    # ==========================================================
+    def _next_timestamp(self) -> datetime:
+        """created_at tăng nghiêm ngặt theo thứ tự enqueue (gọi khi đang giữ lock)."""
+        now = datetime.now(timezone.utc)
+        if self._last_ts is not None and now <= self._last_ts:
+            now = self._last_ts + timedelta(microseconds=1)
+        self._last_ts = now
+        return now
+
+    def enqueue(self, session_id: str, role: str, content: str) -> Optional[ChatMessage]:
+        """Message đã nhận, hoặc None nếu bị bỏ do hàng đợi đầy (caller không được coi là đã lưu)."""
+        with self._cond:
+            msg = ChatMessage(
+                session_id=session_id,
+                role=role,
+                content=content,
+                created_at=self._next_timestamp(),
+            )
+
+            if self._closed:
+                # Đã shutdown: ghi đồng bộ để không mất message
+                write_now = True
+            elif len(self._queue) >= self.max_queue:
+                # DB lỗi kéo dài: không để hàng đợi phình vô hạn
+                self.stats["dropped"] += 1
+                print(f"❌ Hàng đợi chat history đầy ({self.max_queue}), bỏ message của session {session_id}")
+                return None
+            else:
+                write_now = False
+                self._queue.append(_QueuedMessage(msg))
+                self._pending.setdefault(session_id, []).append(msg)
+                self.stats["enqueued"] += 1
+
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name="chat-history-write-behind",
+                        daemon=True,
+                    )
+                    self._thread.start()
+
+                self._cond.notify_all()
+
+        if write_now:
+            self._flush_fn([msg])
+        return msg
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+
+                if not self._queue and self._closed:
+                    return
+
+                # Chờ batch đầy hoặc hết flush_interval
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._queue) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            if not self._flush_once() and not self._closed:
+                # DB lỗi: nghỉ một nhịp rồi thử lại, tránh vòng lặp nóng
+                time.sleep(max(self.flush_interval, 0.5))
+
+    def _flush_once(self) -> bool:
+        with self._cond:
+            if not self._queue:
+                return True
+            n = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(n)]
+            for item in batch:
+                sid = item.message.session_id
+                self._inflight[sid] = self._inflight.get(sid, 0) + 1
+
+        ok = False
+        for attempt in range(self.max_retries):
+            try:
+                self._flush_fn([item.message for item in batch])
+                ok = True
+                break
+            except Exception as e:
+                with self._cond:
+                    self.stats["errors"] += 1
+                print(f"⚠️ Chat history write-behind lỗi (lần {attempt + 1}): {e}")
+                time.sleep(min(0.1 * (2 ** attempt), 1.0))
+
+        with self._cond:
+            requeue: List[_QueuedMessage] = []
+            given_up: List[_QueuedMessage] = []
+            for item in batch:
+                m = item.message
+                sid = m.session_id
+                left = self._inflight.get(sid, 0) - 1
+                if left > 0:
+                    self._inflight[sid] = left
+                else:
+                    self._inflight.pop(sid, None)
+
+                pending = self._pending.get(sid)
+                still_pending = pending is not None and any(p is m for p in pending)
+
+                if not (ok or self._closed) and still_pending:
+                    if item.requeues < self.max_requeues:
+                        item.requeues += 1
+                        requeue.append(item)
+                        continue
+                    given_up.append(item)
+
+                if still_pending:
+                    pending[:] = [p for p in pending if p is not m]
+                    if not pending:
+                        self._pending.pop(sid, None)
+                self._bump_version(sid)
+
+            if ok:
+                self.stats["flushed"] += len(batch)
+                self.stats["batches"] += 1
+            elif self._closed:
+                self.stats["dropped"] += len(batch)
+                print(f"❌ Bỏ {len(batch)} message chat history do không ghi được khi shutdown")
+            else:
+                # Trả lại đầu hàng đợi, giữ nguyên thứ tự
+                self._queue.extendleft(reversed(requeue))
+                if given_up:
+                    self.stats["dropped"] += len(given_up)
+                    print(f"❌ Bỏ {len(given_up)} message chat history sau {self.max_requeues} lần ghi lỗi")
+
+            for item in batch:
+                self._prune_version(item.message.session_id)
+            self._cond.notify_all()
+
+        return ok
+
+    # ==========================================================
+    # VERSION THEO SESSION (gọi khi đang giữ lock)
+    # ==========================================================
+    def _bump_version(self, session_id: str) -> None:
+        self._seq += 1
+        self._versions[session_id] = self._seq
+
+    def _version_of(self, session_id: str) -> int:
+        return self._versions.get(session_id, self._pruned_seq)
+
+    def _prune_version(self, session_id: str) -> None:
+        """
+        Session không còn message chờ / đang ghi: bỏ entry để dict không lớn theo số session.
+        _pruned_seq >= mọi version đã cấp nên reader đã lấy version cũ vẫn thấy khác và đọc lại.
+        """
+        if session_id in self._versions and not self._pending.get(session_id) and not self._inflight.get(session_id):
+            del self._versions[session_id]
+            self._pruned_seq = self._seq
+
+    # ==========================================================
+    # ĐỌC
+    # ==========================================================
+    def read_with_pending(
+        self,
+        session_id: str,
+        fetch: Callable[[], List[Tuple[str, str]]],
+        retries: int = 3,
+    ) -> List[Tuple[str, str]]:
+        """
+        Đọc DB qua fetch() rồi nối thêm các message chưa commit của session.
+
+        Nếu có batch của session commit xen giữa lúc đọc DB và lúc lấy pending
+        thì message có thể bị trùng/thiếu -> phát hiện qua inflight/version và đọc lại.
+        """
+        rows: List[Tuple[str, str]] = []
+        for _ in range(max(1, retries)):
+            with self._cond:
+                self._cond.wait_for(lambda: not self._inflight.get(session_id), timeout=1.0)
+                version = self._version_of(session_id)
+
+            rows = fetch()
+
+            with self._cond:
+                if not self._inflight.get(session_id) and self._version_of(session_id) == version:
+                    return rows + [(m.role, m.content) for m in self._pending.get(session_id, ())]
+
+        with self._cond:
+            return rows + [(m.role, m.content) for m in self._pending.get(session_id, ())]
+
+    def has_pending(self, session_id: str) -> bool:
+        with self._cond:
+            return bool(self._pending.get(session_id))
+
+    # ==========================================================
+    # XOÁ / SHUTDOWN
+    # ==========================================================
+    def discard_session(self, session_id: str, timeout: float = 5.0) -> None:
+        """Bỏ message chưa ghi của session và chờ batch đang ghi (nếu có) xong."""
+        with self._cond:
+            if any(item.message.session_id == session_id for item in self._queue):
+                self._queue = deque(item for item in self._queue if item.message.session_id != session_id)
+            self._pending.pop(session_id, None)
+            self._bump_version(session_id)
+            self._cond.wait_for(lambda: not self._inflight.get(session_id), timeout=timeout)
+            self._prune_version(session_id)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Chờ đến khi hàng đợi rỗng (dùng cho test/CLI). True nếu đã ghi hết."""
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._queue and not self._inflight,
+                timeout=timeout,
+            )
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join(timeout)
+
+        # Thread chưa từng chạy hoặc join timeout: ghi nốt ngay tại đây
+        while True:
+            with self._cond:
+                if not self._queue:
+                    break
+            self._flush_once()
+
+
+# ==========================================================
+# SINGLETON CHO PROCESS
+# ==========================================================
+_writer: Optional[ChatMessageWriteBehind] = None
+_writer_lock = threading.Lock()
+
+
+def get_write_behind() -> Optional[ChatMessageWriteBehind]:
+    """Trả về writer dùng chung, hoặc None nếu tắt bằng CHAT_HISTORY_WRITE_BEHIND=0."""
+    global _writer
+    if os.getenv("CHAT_HISTORY_WRITE_BEHIND", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ChatMessageWriteBehind(
+                    batch_size=int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "50")),
+                    flush_interval=int(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL_MS", "200")) / 1000.0,
+                    max_queue=int(os.getenv("CHAT_HISTORY_MAX_QUEUE", "10000")),
+                    max_requeues=int(os.getenv("CHAT_HISTORY_MAX_REQUEUES", "5")),
+                )
+                atexit.register(shutdown_write_behind)
+    return _writer
+
+
+def shutdown_write_behind(timeout: float = 10.0) -> None:
+    if _writer is not None:
+        _writer.shutdown(timeout)
+
+
+def get_write_behind_stats() -> Dict[str, int]:
+    if _writer is None:
+        return {}
+    with _writer._cond:
+        return {
+            **_writer.stats,
+            "queued": len(_writer._queue),
+            "inflight": sum(_writer._inflight.values()),
+            "tracked_sessions": len(_writer._versions),
+        }